@@ -164,6 +164,10 @@ def render_selector():
 
 
 def main():
+    # ── プロセス初回だけ参照データを裏で読み込む（modules.preload。描画は待たない） ──
+    from modules.preload import start_preload
+    start_preload()
+
     # ── セッション: 選択済みUIキーを保持（初回は保存済み設定を読み込む） ──
     if "ui_key" not in st.session_state:
         saved = _load_ui_preference()
@@ -224,8 +228,17 @@ def main():
             _save_ui_preference("")   # ← 保存済み設定をクリア
             st.rerun()
 
-    # ── 実際のUIを実行 ──
-    mod.run()
+    # ── 実際のUIを実行（トレースで囲み、?debug=1 なら処理時間を表示） ──
+    from modules.tracing import span, trace
+    from ui.debug_panel import debug_enabled, render_debug_panel
+
+    with trace("request", ui=current_key) as tr:
+        with span("ui.run"):
+            mod.run()
+
+    if debug_enabled():
+        with st.sidebar:
+            render_debug_panel(tr)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,364 @@
+"""
+analysis_pipeline.py
+────────────────────────────────────────────────────────────────────────────
+単一銘柄分析のステージグラフ（modules.pipeline 上の定義）
+
+【ステージ構成】（→ は依存）
+
+  phase "fetch"（ネットワーク。互いに独立なものは並行実行）
+    symbol               : ticker → yfinance 用シンボル
+    price                : symbol → 価格フレーム            （キャッシュ 5分）
+    yf_info              : symbol → yfinance Ticker / info  （キャッシュ 5分、プロセス内のみ）
+    primary_fundamentals : symbol → IRBANK / Alpha Vantage （キャッシュ 1時間）
+    benchmark            : ticker → D スコア用ベンチマーク   （キャッシュ 5分、ベンチマーク銘柄単位）
+    fundamentals         : primary_fundamentals + yf_info → yfinance 補完
+    base                 : price + yf_info + fundamentals → get_price_and_meta 互換 dict
+
+  phase "classify"
+    financial_type       : base + pattern_db → classify_ticker
+    valuation_inputs     : base → PER / PBR / 予想PER（1回だけ組み立て）
+    sector_context       : base + valuation_inputs → セクター相対（1回だけ計算）
+    benchmark_raw        : benchmark → ベンチマークの D 生値  （キャッシュ 5分、ベンチマーク銘柄単位）
+    defense_context      : base + benchmark_raw → D スコア入力
+
+  phase "compute"
+    tech_raw             : compute_indicators
+    tech                 : 仕上げ（セクター V4・D コメント・パネル記録）
+
+pattern_db（Streamlit キャッシュ経由）は呼び出し側がメインスレッドで
+読み込んで初期値として渡す。ステージ関数は st.* を呼ばない。
+
+キャッシュは SHARED_CACHE_PATH 設定時にホストの全プロセスで共有される
+（modules.pipeline.SharedStageCache）。yf_info の出力は Ticker オブジェクトを
+含むので cache_shared=False。
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, Optional
+
+from modules.data_fetch import (
+    _default_benchmark_ticker_for,
+    _download_price_frame,
+    assemble_price_and_meta,
+    convert_ticker,
+    fetch_primary_fundamentals,
+    fetch_yf_info,
+    get_benchmark_data,
+    parse_ticker_for_d,
+    supplement_fundamentals,
+)
+from modules.d_logic import compute_benchmark_raw
+from modules.indicators import compute_indicators
+from modules.pattern_db import calc_sector_relative_scores_from_db, classify_ticker
+from modules.pipeline import Pipeline, Stage, StageCache
+from modules.score_panel import SCORE_PANEL_PATH, panel_row_from_tech, upsert_panel
+from modules.v_logic import build_valuation_inputs
+from d_comment import build_d_comment
+
+
+_log = logging.getLogger(__name__)
+
+PRICE_CACHE_TTL = 300
+FUNDAMENTALS_CACHE_TTL = 3600
+
+ANALYSIS_PHASES = ("fetch", "classify", "compute")
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 補助
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _is_us(ticker: str) -> bool:
+    return not ticker.upper().endswith(".T")
+
+
+def _extract_defense_price_frame(df) -> Optional[Any]:
+    """Dスコア計算用に Close / Low / Volume を標準列名で切り出す。"""
+    if df is None or getattr(df, "empty", True):
+        return None
+
+    def _find_col(prefix: str) -> Optional[str]:
+        for col in df.columns:
+            col_str = str(col)
+            if col_str == prefix or col_str.startswith(prefix):
+                return col
+        return None
+
+    close_col = _find_col("Close")
+    low_col = _find_col("Low")
+    volume_col = _find_col("Volume")
+    if not close_col or not low_col or not volume_col:
+        return None
+
+    price_df = df[[close_col, low_col, volume_col]].copy()
+    price_df.columns = ["Close", "Low", "Volume"]
+    return price_df.dropna(subset=["Close", "Low"])
+
+
+def _record_score_panel(ticker: str, tech: Dict[str, Any]) -> None:
+    """SCORE_PANEL_PATH が設定されていればサブスコアをパネルへ upsert する。"""
+    if not SCORE_PANEL_PATH:
+        return
+    try:
+        upsert_panel([panel_row_from_tech(ticker, tech)], SCORE_PANEL_PATH)
+    except Exception:
+        # 記録は分析結果の表示を妨げない（失敗はログに残す）
+        _log.warning("スコアパネルへの記録に失敗しました: %s (%s)", ticker, SCORE_PANEL_PATH, exc_info=True)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# ステージ関数（入力キー = 引数名、戻り値 = {出力キー: 値}）
+# ═══════════════════════════════════════════════════════════════════════════
+
+def stage_symbol(ticker: str) -> Dict[str, Any]:
+    return {"symbol": convert_ticker(ticker)}
+
+
+def stage_price(symbol: str) -> Dict[str, Any]:
+    return {"price_data": _download_price_frame(symbol)}
+
+
+def stage_yf_info(symbol: str) -> Dict[str, Any]:
+    return {"yf_info": fetch_yf_info(symbol)}
+
+
+def stage_primary_fundamentals(symbol: str) -> Dict[str, Any]:
+    return {"primary_fundamentals": fetch_primary_fundamentals(symbol)}
+
+
+def stage_benchmark(ticker: str) -> Dict[str, Any]:
+    """D スコア用ベンチマーク。失敗時は None（D スコアなしで続行。None はキャッシュされない）。"""
+    try:
+        return {"benchmark": get_benchmark_data(ticker)}
+    except Exception:
+        return {"benchmark": None}
+
+
+def stage_fundamentals(primary_fundamentals: Dict[str, Any], yf_info: Dict[str, Any]) -> Dict[str, Any]:
+    return {"fundamentals": supplement_fundamentals(primary_fundamentals, yf_info)}
+
+
+def stage_base(
+    symbol: str,
+    price_data: Dict[str, Any],
+    yf_info: Dict[str, Any],
+    fundamentals: Dict[str, Any],
+) -> Dict[str, Any]:
+    return {"base": assemble_price_and_meta(symbol, price_data, yf_info, fundamentals)}
+
+
+def stage_financial_type(ticker: str, base: Dict[str, Any], pattern_db) -> Dict[str, Any]:
+    return {"financial_type": classify_ticker(
+        ticker,
+        pattern_db,
+        roe=base.get("roe"),
+        roa=base.get("roa"),
+        equity_ratio=base.get("equity_ratio"),
+        interest_coverage=base.get("interest_coverage"),
+        operating_margin=base.get("operating_margin"),
+    )}
+
+
+def stage_valuation_inputs(base: Dict[str, Any]) -> Dict[str, Any]:
+    """PER / PBR / 予想PER を1回だけ組み立てる（V スコアとセクター相対で共用）。"""
+    return {"valuation_inputs": build_valuation_inputs(
+        price=base.get("close"),
+        eps=base.get("eps"),
+        bps=base.get("bps"),
+        eps_fwd=base.get("eps_fwd"),
+        per_fwd=base.get("per_fwd"),
+    )}
+
+
+def stage_sector_context(base: Dict[str, Any], valuation_inputs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    セクター相対スコアを1回だけ計算する。
+
+    ここで得た sector_v_score がそのまま V4 として v_score に使われ、
+    同じ sector_rel が UI にも表示される。
+    """
+    sector_name = base.get("sector", "")
+    sector_rel = calc_sector_relative_scores_from_db(
+        sector=sector_name,
+        per=valuation_inputs["per"],
+        pbr=valuation_inputs["pbr"],
+        ev_ebitda=base.get("ev_ebitda"),
+    )
+    sector_v_score = (
+        sector_rel.get("sector_v_score")
+        if sector_name and sector_rel.get("sector_matched", False)
+        else None
+    )
+    return {"sector_context": {
+        "sector_name": sector_name,
+        "sector_rel": sector_rel,
+        "sector_v_score": sector_v_score,
+    }}
+
+
+def stage_benchmark_raw(ticker: str, benchmark: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    ベンチマークの D 生値（compute_benchmark_raw）。市場ごとに1回だけ計算してキャッシュする。
+
+    ticker はキャッシュキー（_benchmark_key）用。ベンチマークが無い・計算できないときは None。
+    """
+    if benchmark is None:
+        return {"benchmark_raw": None}
+    try:
+        benchmark_df = _extract_defense_price_frame(benchmark.get("df"))
+        if benchmark_df is None:
+            return {"benchmark_raw": None}
+        return {"benchmark_raw": {
+            "bm_ticker": benchmark.get("ticker"),
+            "bm_company_name": benchmark.get("company_name"),
+            "bm_raw_vals": compute_benchmark_raw(benchmark_df),
+        }}
+    except Exception:
+        return {"benchmark_raw": None}
+
+
+def stage_defense_context(
+    ticker: str,
+    base: Dict[str, Any],
+    benchmark_raw: Optional[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """単一銘柄の Dスコア入力を組み立てる（ベンチマークの生値は benchmark_raw ステージで計算済み）。"""
+    meta = parse_ticker_for_d(ticker)
+    price_df = _extract_defense_price_frame(base.get("df"))
+
+    context: Dict[str, Any] = {
+        "market": meta.get("market", ""),
+        "bm_label": meta.get("bm_label", ""),
+        "bm_ticker": None,
+        "bm_company_name": None,
+        "price_df": price_df,
+        "bm_raw_vals": None,
+    }
+
+    if price_df is not None and benchmark_raw is not None:
+        context.update(benchmark_raw)
+    return {"defense_context": context}
+
+
+def stage_tech_raw(
+    ticker: str,
+    base: Dict[str, Any],
+    financial_type: Dict[str, Any],
+    valuation_inputs: Dict[str, Any],
+    sector_context: Dict[str, Any],
+    defense_context: Dict[str, Any],
+) -> Dict[str, Any]:
+    return {"tech_raw": compute_indicators(
+        base["df"],
+        base["close_col"],
+        base["high_52w"],
+        base["low_52w"],
+        eps=base.get("eps"),
+        bps=base.get("bps"),
+        eps_fwd=base.get("eps_fwd"),
+        per_fwd=base.get("per_fwd"),
+        roe=base.get("roe"),
+        roa=base.get("roa"),
+        equity_ratio=base.get("equity_ratio"),
+        dividend_yield=base.get("dividend_yield"),
+        operating_margin=base.get("operating_margin"),
+        de_ratio=base.get("de_ratio"),
+        interest_coverage=base.get("interest_coverage"),
+        ev_ebitda=base.get("ev_ebitda"),
+        sector_v_score=sector_context["sector_v_score"],
+        sector_rel_scores=sector_context["sector_rel"],
+        financial_type=financial_type,
+        industry=base.get("industry", ""),
+        sector=base.get("sector", ""),
+        is_us=_is_us(ticker),
+        price_df=defense_context.get("price_df"),
+        bm_raw_vals=defense_context.get("bm_raw_vals"),
+        valuation_inputs=valuation_inputs,
+    )}
+
+
+def stage_tech(
+    ticker: str,
+    base: Dict[str, Any],
+    tech_raw: Dict[str, Any],
+    sector_context: Dict[str, Any],
+    defense_context: Dict[str, Any],
+) -> Dict[str, Any]:
+    tech = tech_raw
+    if sector_context["sector_v_score"] is not None:
+        tech["sector_v_score"] = sector_context["sector_v_score"]
+
+    tech["is_us"] = _is_us(ticker)
+    if not tech.get("sector"):
+        tech["sector"] = base.get("sector", "")
+    if not tech.get("industry"):
+        tech["industry"] = base.get("industry", "")
+
+    tech["d_market"] = defense_context.get("market")
+    tech["bm_label"] = defense_context.get("bm_label")
+    tech["bm_ticker"] = defense_context.get("bm_ticker")
+    tech["bm_company_name"] = defense_context.get("bm_company_name")
+    tech["d_price_df"] = defense_context.get("price_df")
+
+    # ── D タブ用コメント生成（tech 確定後）──
+    d_comment = build_d_comment(tech)
+    tech["d_comment_summary"] = d_comment["summary"]
+    tech["d_comment_detail"]  = d_comment["detail"]
+
+    _record_score_panel(ticker, tech)
+    return {"tech": tech}
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# グラフ
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _symbol_key(kwargs: Dict[str, Any]) -> str:
+    return kwargs["symbol"]
+
+
+def _benchmark_key(kwargs: Dict[str, Any]) -> str:
+    # ベンチマークは市場ごとに1本（^N225 / ^GSPC）。銘柄ごとに取り直さない
+    return _default_benchmark_ticker_for(kwargs["ticker"])
+
+
+def build_analysis_pipeline(max_workers: int = 4, cache: Optional[StageCache] = None) -> Pipeline:
+    """単一銘柄分析のステージグラフを返す。cache 省略時は DEFAULT_STAGE_CACHE（SHARED_CACHE_PATH ならホスト共有）。"""
+    return Pipeline([
+        Stage("symbol", stage_symbol, ("ticker",), ("symbol",), phase="fetch"),
+        Stage("price", stage_price, ("symbol",), ("price_data",), phase="fetch",
+              cache_ttl=PRICE_CACHE_TTL, cache_key=_symbol_key),
+        Stage("yf_info", stage_yf_info, ("symbol",), ("yf_info",), phase="fetch",
+              cache_ttl=PRICE_CACHE_TTL, cache_key=_symbol_key, cache_shared=False),
+        Stage("primary_fundamentals", stage_primary_fundamentals, ("symbol",), ("primary_fundamentals",),
+              phase="fetch", cache_ttl=FUNDAMENTALS_CACHE_TTL, cache_key=_symbol_key),
+        Stage("benchmark", stage_benchmark, ("ticker",), ("benchmark",), phase="fetch",
+              cache_ttl=PRICE_CACHE_TTL, cache_key=_benchmark_key),
+        Stage("fundamentals", stage_fundamentals, ("primary_fundamentals", "yf_info"), ("fundamentals",),
+              phase="fetch"),
+        Stage("base", stage_base, ("symbol", "price_data", "yf_info", "fundamentals"), ("base",),
+              phase="fetch"),
+
+        Stage("financial_type", stage_financial_type, ("ticker", "base", "pattern_db"), ("financial_type",),
+              phase="classify"),
+        Stage("valuation_inputs", stage_valuation_inputs, ("base",), ("valuation_inputs",),
+              phase="classify"),
+        Stage("sector_context", stage_sector_context, ("base", "valuation_inputs"), ("sector_context",),
+              phase="classify"),
+        Stage("benchmark_raw", stage_benchmark_raw, ("ticker", "benchmark"), ("benchmark_raw",),
+              phase="classify", cache_ttl=PRICE_CACHE_TTL, cache_key=_benchmark_key),
+        Stage("defense_context", stage_defense_context, ("ticker", "base", "benchmark_raw"), ("defense_context",),
+              phase="classify"),
+
+        Stage("tech_raw", stage_tech_raw,
+              ("ticker", "base", "financial_type", "valuation_inputs", "sector_context", "defense_context"),
+              ("tech_raw",), phase="compute"),
+        Stage("tech", stage_tech,
+              ("ticker", "base", "tech_raw", "sector_context", "defense_context"),
+              ("tech",), phase="compute"),
+    ], max_workers=max_workers, cache=cache)
+
+
+ANALYSIS_PIPELINE = build_analysis_pipeline()
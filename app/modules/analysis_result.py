@@ -0,0 +1,425 @@
+"""
+analysis_result.py
+────────────────────────────────────────────────────────────────────────────
+単一銘柄分析の結果レコードと、UI に渡すコンパクト表現
+
+【背景】
+  compute_indicators の tech には df / df_valid（加工済み価格フレーム全体）、
+  d_price_df、d_detail の Series 群がそのまま入っており、分析結果は
+  Streamlit のセッション（ユーザーごと）に保持される。1件あたり数 MB になる。
+
+【形】
+  TechResult（compute_indicators の返却値）
+    t / q / v / d : TResult / QResult / VResult / DResult（slots の dataclass）
+    qvt_score / sector / industry / is_us など共通項目 + series + extras
+    tech["t_score"] / tech.get("d_grade") / tech["sector"] = ... と従来の
+    dict と同じキーで読み書きできる。どのレコードにも無いキーは extras に入る。
+    pickle は {フィールド名: 値} の dict。共有キャッシュ（modules.shared_cache）に
+    前のデプロイが書いた結果を読んでも、無くなったフィールドは捨て、
+    増えたフィールドは既定値（無ければ None）になる。
+  AnalysisResult（slots の dataclass）
+    ticker / analysis_id / summary / scores / timings / cache_hits
+    base  : スカラーだけの dict（df / price_df などのフレームは持たない）
+    tech  : フレームを外した TechResult。時系列は tech["series"]（SeriesStore）に
+            キー参照で入り、d_detail にはスカラー（n_down / mdd_date / vol_stats）だけ残る
+  SeriesStore
+    共通の日付インデックス1本 + 系列ごとの float32 配列（真偽値は bool 配列）
+
+  result["tech"] / result.get("tech") のように従来の dict と同じ書き方で読める。
+
+【SeriesStore に入る系列】
+  close                    : D スコア用価格フレームの終値（旧 d_price_df["Close"]）
+  d_detail の Series すべて : ma / deviation / drawdown / daily_ret / 52w_low /
+                             vol_ratio / down_mask
+"""
+
+from __future__ import annotations
+
+import pickle
+from dataclasses import MISSING, dataclass, field, fields, replace
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 時系列ストア
+# ═══════════════════════════════════════════════════════════════════════════
+
+class SeriesStore:
+    """共通インデックス + 名前付き配列（float32 / bool）。"""
+
+    __slots__ = ("index", "_arrays")
+
+    def __init__(self, index: pd.Index, arrays: Optional[Dict[str, np.ndarray]] = None):
+        self.index = index
+        self._arrays: Dict[str, np.ndarray] = dict(arrays or {})
+
+    @classmethod
+    def from_series(cls, series: Dict[str, pd.Series]) -> "SeriesStore":
+        """各 Series のインデックスの和集合を共通インデックスにして格納する。"""
+        series = {k: s for k, s in series.items() if s is not None}
+        if not series:
+            return cls(pd.DatetimeIndex([]))
+        index = None
+        for s in series.values():
+            index = s.index if index is None else index.union(s.index)
+        store = cls(index)
+        for name, s in series.items():
+            store.add(name, s)
+        return store
+
+    def add(self, name: str, s: pd.Series) -> None:
+        aligned = s if s.index.equals(self.index) else s.reindex(self.index)
+        if s.dtype == bool:
+            arr = aligned.fillna(False).to_numpy(dtype=bool)
+        else:
+            arr = aligned.to_numpy(dtype=np.float32, na_value=np.nan)
+        self._arrays[name] = arr
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._arrays
+
+    def keys(self) -> List[str]:
+        return list(self._arrays)
+
+    def array(self, name: str) -> np.ndarray:
+        return self._arrays[name]
+
+    def series(self, name: str) -> pd.Series:
+        return pd.Series(self._arrays[name], index=self.index, name=name)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.index.nbytes + sum(a.nbytes for a in self._arrays.values()))
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 結果レコード（T / Q / V / D → TechResult）
+# ═══════════════════════════════════════════════════════════════════════════
+
+class _Record:
+    """slots の dataclass 共通部分。pickle はフィールド名 → 値の dict にする。"""
+
+    __slots__ = ()
+    _FIELDS: Tuple[str, ...] = ()
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self._FIELDS}
+
+    def __setstate__(self, state) -> None:
+        # 位置で詰めた旧形式は、フィールドの増減があると値がずれるので読まない
+        if not isinstance(state, dict):
+            raise pickle.UnpicklingError(f"{type(self).__name__}: 旧形式の pickle です")
+        for f in fields(self):
+            if f.name in state:
+                value = state[f.name]
+            elif f.default is not MISSING:
+                value = f.default
+            elif f.default_factory is not MISSING:
+                value = f.default_factory()
+            else:
+                value = None
+            object.__setattr__(self, f.name, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self._FIELDS}
+
+
+def _record(cls):
+    cls = dataclass(slots=True)(cls)
+    cls._FIELDS = tuple(f.name for f in fields(cls))
+    return cls
+
+
+@_record
+class TResult(_Record):
+    """T（タイミング）: t_logic のスナップショット + compute_t_metrics。"""
+
+    df: Optional[pd.DataFrame] = None
+    df_valid: Optional[pd.DataFrame] = None
+    close: Optional[float] = None
+    ma_25: Optional[float] = None
+    ma_50: Optional[float] = None
+    ma_75: Optional[float] = None
+    slope_25: Optional[float] = None
+    slope_50: Optional[float] = None
+    slope_75: Optional[float] = None
+    arrow_25: Optional[str] = None
+    arrow_50: Optional[str] = None
+    arrow_75: Optional[str] = None
+    bb_plus1: Optional[float] = None
+    bb_plus2: Optional[float] = None
+    bb_minus1: Optional[float] = None
+    bb_minus2: Optional[float] = None
+    rsi: Optional[float] = None
+    high_52w: Optional[float] = None
+    low_52w: Optional[float] = None
+    t_score: Optional[float] = None
+    t_mode: Optional[str] = None
+    timing_label: Optional[str] = None
+    high_price_alert: Any = None
+    bb_text: Optional[str] = None
+    bb_icon: Optional[str] = None
+    bb_strength: Any = None
+    signal_text: Optional[str] = None
+    signal_icon: Optional[str] = None
+    signal_strength: Any = None
+    highprice_score: Optional[float] = None
+    low_score: Optional[float] = None
+    trend_conditions: Any = None
+    trend_comment: Optional[str] = None
+    contrarian_conditions: Any = None
+    contr_comment: Optional[str] = None
+    slope_ok: Optional[bool] = None
+    is_flat_or_gentle_up: Optional[bool] = None
+
+
+@_record
+class QResult(_Record):
+    """Q（質）: 入力ファンダ + q_logic.compute_q_block の payload。"""
+
+    roe: Optional[float] = None
+    roa: Optional[float] = None
+    equity_ratio: Optional[float] = None
+    operating_margin: Optional[float] = None
+    de_ratio: Optional[float] = None
+    interest_coverage: Optional[float] = None
+    q_score: Optional[float] = None
+    q1: Optional[float] = None
+    q3: Optional[float] = None
+    q1_abs: Optional[float] = None
+    q3_abs: Optional[float] = None
+    q1_rel: Optional[float] = None
+    q3_rel: Optional[float] = None
+    q_alpha: Optional[float] = None
+    q_penalty: Optional[float] = None
+    q_warnings: Any = None
+    er_threshold: Optional[float] = None
+    ic_threshold: Optional[float] = None
+    threshold_note: Optional[str] = None
+
+
+@_record
+class VResult(_Record):
+    """V（値札）: 入力ファンダ・PER/PBR + v_logic.compute_v_block の payload。"""
+
+    eps: Optional[float] = None
+    bps: Optional[float] = None
+    eps_fwd: Optional[float] = None
+    per: Optional[float] = None
+    pbr: Optional[float] = None
+    per_fwd: Optional[float] = None
+    dividend_yield: Optional[float] = None
+    ev_ebitda: Optional[float] = None
+    v_score: Optional[float] = None
+    v1: Optional[float] = None
+    v2: Optional[float] = None
+    v3: Optional[float] = None
+    v4: Optional[float] = None
+    has_sector: Optional[bool] = None
+    sector_v_score: Optional[float] = None
+
+
+@_record
+class DResult(_Record):
+    """D（価格耐性）: score_defense の結果 + ベンチマーク情報・コメント。"""
+
+    def1: Optional[float] = None
+    def2: Optional[float] = None
+    def3: Optional[float] = None
+    def4: Optional[float] = None
+    def5: Optional[float] = None
+    def6: Optional[float] = None
+    def1_rank: Optional[str] = None
+    def2_rank: Optional[str] = None
+    def3_rank: Optional[str] = None
+    def4_rank: Optional[str] = None
+    def5_rank: Optional[str] = None
+    def6_rank: Optional[str] = None
+    d_score: Optional[float] = None
+    defensive_score: Optional[float] = None
+    d_grade: Optional[str] = None
+    d_base_rank: Optional[str] = None
+    d_raw: Optional[Dict[str, Any]] = None
+    d_detail: Optional[Dict[str, Any]] = None
+    d_error: Optional[str] = None
+    vp_score: Optional[float] = None
+    vp_rank: Optional[str] = None
+    d_market: Optional[str] = None
+    bm_label: Optional[str] = None
+    bm_ticker: Optional[str] = None
+    bm_company_name: Optional[str] = None
+    d_price_df: Optional[pd.DataFrame] = None
+    d_comment_summary: Optional[str] = None
+    d_comment_detail: Optional[str] = None
+
+
+_PARTS = ("t", "q", "v", "d")
+
+
+@_record
+class TechResult(_Record):
+    """
+    compute_indicators の返却値。T/Q/V/D のレコード + 共通項目。
+
+    従来の tech dict と同じく tech["t_score"] / tech.get("d_grade") /
+    tech["sector"] = ... で読み書きできる（キー → レコードの対応は _KEY_PART）。
+    どのレコードにも無いキーは extras に入る。
+    """
+
+    t: TResult = field(default_factory=TResult)
+    q: QResult = field(default_factory=QResult)
+    v: VResult = field(default_factory=VResult)
+    d: DResult = field(default_factory=DResult)
+    qvt_score: Optional[float] = None
+    sector_rel_scores: Dict[str, Any] = field(default_factory=dict)
+    financial_type: Dict[str, Any] = field(default_factory=dict)
+    sector: str = ""
+    industry: str = ""
+    is_us: bool = False
+    series: Optional[SeriesStore] = None
+    extras: Dict[str, Any] = field(default_factory=dict)
+
+    def _locate(self, key: str):
+        part = _KEY_PART.get(key)
+        if part is None:
+            return None
+        return self if part == "" else getattr(self, part)
+
+    def __getitem__(self, key: str) -> Any:
+        owner = self._locate(key)
+        if owner is not None:
+            return getattr(owner, key)
+        try:
+            return self.extras[key]
+        except KeyError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        owner = self._locate(key)
+        if owner is not None:
+            return getattr(owner, key)
+        return self.extras.get(key, default)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        owner = self._locate(key)
+        if owner is not None:
+            setattr(owner, key, value)
+        else:
+            self.extras[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        return key in _KEY_PART or key in self.extras
+
+    def keys(self) -> List[str]:
+        return [k for k in _KEY_PART if k not in _PARTS + ("extras",)] + list(self.extras)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """従来形式の平坦な dict。"""
+        return dict(self.items())
+
+
+# 平坦なキー → 所属レコード（"" は TechResult 自身）
+_KEY_PART: Dict[str, str] = {
+    **{name: part for part, cls in zip(_PARTS, (TResult, QResult, VResult, DResult)) for name in cls._FIELDS},
+    **{name: "" for name in TechResult._FIELDS if name not in _PARTS + ("extras",)},
+}
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 分析結果
+# ═══════════════════════════════════════════════════════════════════════════
+
+@_record
+class AnalysisResult(_Record):
+    ticker: str
+    base: Dict[str, Any]
+    tech: Optional[TechResult]
+    summary: Dict[str, Any]
+    scores: Optional[Dict[str, float]]
+    timings: Dict[str, float] = field(default_factory=dict)
+    cache_hits: List[str] = field(default_factory=list)
+    analysis_id: Optional[str] = None
+
+    # 従来の dict 出力と同じ読み方（output["tech"] / output.get("tech")）
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__
+
+    def approx_size(self) -> int:
+        """pickle 後のバイト数（セッションに置かれる量の目安）。"""
+        return len(pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _scalars_only(d: Dict[str, Any], drop: Iterable[str] = ()) -> Dict[str, Any]:
+    drop = set(drop)
+    return {
+        k: v for k, v in d.items()
+        if k not in drop and not isinstance(v, (pd.DataFrame, pd.Series))
+    }
+
+
+def compact_tech(tech: TechResult) -> TechResult:
+    """
+    TechResult を UI 用に縮める（元のレコードは変更しない）。
+
+    df / df_valid / d_price_df を外し、終値と d_detail の Series を
+    SeriesStore に移す。d_detail にはスカラーだけ残す。
+    """
+    series: Dict[str, pd.Series] = {}
+    price_df = tech.d.d_price_df
+    if isinstance(price_df, pd.DataFrame) and "Close" in price_df:
+        series["close"] = price_df["Close"]
+
+    detail = tech.d.d_detail
+    if isinstance(detail, dict):
+        series.update({k: v for k, v in detail.items() if isinstance(v, pd.Series)})
+        detail = _scalars_only(detail)
+
+    return replace(
+        tech,
+        t=replace(tech.t, df=None, df_valid=None),
+        d=replace(tech.d, d_price_df=None, d_detail=detail),
+        series=SeriesStore.from_series(series),
+        extras=_scalars_only(tech.extras),
+    )
+
+
+def compact_analysis(
+    ticker: str,
+    base: Dict[str, Any],
+    tech: Optional[TechResult],
+    summary: Dict[str, Any],
+    scores: Optional[Dict[str, float]],
+    timings: Optional[Dict[str, float]] = None,
+    cache_hits: Optional[List[str]] = None,
+) -> AnalysisResult:
+    return AnalysisResult(
+        ticker=ticker,
+        base=_scalars_only(base),
+        tech=compact_tech(tech) if tech is not None else None,
+        summary=summary,
+        scores=scores,
+        timings=dict(timings or {}),
+        cache_hits=list(cache_hits or []),
+    )
@@ -0,0 +1,288 @@
+"""
+av_quota.py
+────────────────────────────────────────────────────────────────────────────
+Alpha Vantage のクォータ管理（トークンバケット + 単一フライト + 日次キャッシュ）
+
+【背景】
+  無料枠は「1分あたり数回・1日あたり数十回」。従来は米国株を分析するたびに
+  OVERVIEW を呼び、上限到達時は黙って失敗 → yfinance 補完に落ちていた。
+
+【仕組み】
+  AV_QUOTA.overview(symbol, api_key, fetch) の順序:
+    ① 日次キャッシュ（OVERVIEW_TTL 秒、ファイル永続）にあればそれを返す
+    ② 同じ銘柄を別スレッドが取得中なら、その結果を待って共有する（単一フライト）
+    ③ API キーごとのトークンバケットから1トークン取れなければ None
+       （呼び出し側は yfinance 補完へ。クォータを消費しない）
+    ④ fetch(symbol, api_key) を呼ぶ。AV のレート制限応答
+       （{"Note": ...} / {"Information": ...}）はバケットを空にして None
+    ⑤ 正常応答をキャッシュして返す
+
+  quota_status() で残トークン・日次使用数・キャッシュヒット等を返す（デバッグパネル用）。
+
+【設定】（環境変数）
+  AV_RATE_PER_MIN   : 1分あたりの補充数（既定 5）
+  AV_DAILY_LIMIT    : 1日あたりの上限（既定 25、0 で無制限）
+  AV_CACHE_DIR      : OVERVIEW キャッシュの保存先（既定 ~/.cache/checksignal/alpha）
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, Callable
+
+
+AV_RATE_PER_MIN = float(os.environ.get("AV_RATE_PER_MIN", 5))
+AV_DAILY_LIMIT = int(os.environ.get("AV_DAILY_LIMIT", 25))
+AV_CACHE_DIR = os.environ.get(
+    "AV_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "checksignal", "alpha")
+)
+OVERVIEW_TTL = 24 * 3600
+
+_RATE_LIMIT_KEYS = ("Note", "Information")
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# トークンバケット
+# ═══════════════════════════════════════════════════════════════════════════
+
+class TokenBucket:
+    """毎分 rate_per_min 個補充、容量 capacity、日次上限 daily_limit（0 で無制限）。"""
+
+    def __init__(self, rate_per_min: float, capacity: Optional[float] = None, daily_limit: int = 0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate_per_min / 60.0
+        self.capacity = float(capacity if capacity is not None else max(rate_per_min, 1))
+        self.daily_limit = daily_limit
+        self._clock = clock
+        self._tokens = self.capacity
+        self._stamp = clock()
+        self._day = _today()
+        self._used_today = 0
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+        today = _today()
+        if today != self._day:
+            self._day, self._used_today = today, 0
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self.daily_limit and self._used_today >= self.daily_limit:
+                return False
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            self._used_today += 1
+            return True
+
+    def drain(self) -> None:
+        """サーバー側でレート制限された場合、手元の残りも 0 にする。"""
+        with self._lock:
+            self._refill()
+            self._tokens = 0.0
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refill()
+            wait = 0.0 if self._tokens >= 1.0 or self.rate <= 0 else (1.0 - self._tokens) / self.rate
+            return {
+                "tokens": round(self._tokens, 2),
+                "capacity": self.capacity,
+                "rate_per_min": round(self.rate * 60.0, 2),
+                "used_today": self._used_today,
+                "daily_limit": self.daily_limit,
+                "daily_remaining": (max(self.daily_limit - self._used_today, 0) if self.daily_limit else None),
+                "next_token_s": round(wait, 1),
+            }
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 日次キャッシュ（ファイル永続）
+# ═══════════════════════════════════════════════════════════════════════════
+
+class OverviewCache:
+    """OVERVIEW 応答を銘柄ごとの JSON として保存する（TTL 付き）。"""
+
+    def __init__(self, directory: str = AV_CACHE_DIR, ttl: float = OVERVIEW_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self._mem: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, symbol: str) -> str:
+        return os.path.join(self.directory, f"{symbol.upper()}.json")
+
+    def get(self, symbol: str) -> Optional[Dict[str, Any]]:
+        key = symbol.upper()
+        with self._lock:
+            entry = self._mem.get(key)
+        if entry is None and self.directory:
+            try:
+                with open(self._path(key), encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                entry = None
+            if entry is not None:
+                with self._lock:
+                    self._mem[key] = entry
+        if entry is None or time.time() - entry.get("fetched_at", 0) > self.ttl:
+            return None
+        return entry.get("data")
+
+    def set(self, symbol: str, data: Dict[str, Any]) -> None:
+        key = symbol.upper()
+        entry = {"fetched_at": time.time(), "data": data}
+        with self._lock:
+            self._mem[key] = entry
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = f"{self._path(key)}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            # 保存に失敗してもメモリ上のキャッシュは有効
+            pass
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# クォータマネージャ
+# ═══════════════════════════════════════════════════════════════════════════
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+
+
+class AlphaVantageQuota:
+    """API キーごとのトークンバケット・単一フライト・日次キャッシュをまとめたもの。"""
+
+    def __init__(
+        self,
+        rate_per_min: float = AV_RATE_PER_MIN,
+        daily_limit: int = AV_DAILY_LIMIT,
+        cache: Optional[OverviewCache] = None,
+    ):
+        self.rate_per_min = rate_per_min
+        self.daily_limit = daily_limit
+        self.cache = cache if cache is not None else OverviewCache()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.counters = {
+            "cache_hits": 0,
+            "calls": 0,
+            "coalesced": 0,
+            "throttled": 0,
+            "rate_limited": 0,
+            "errors": 0,
+        }
+
+    @staticmethod
+    def _key_id(api_key: str) -> str:
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+    def _bucket(self, api_key: str) -> TokenBucket:
+        key_id = self._key_id(api_key)
+        with self._lock:
+            bucket = self._buckets.get(key_id)
+            if bucket is None:
+                bucket = self._buckets[key_id] = TokenBucket(self.rate_per_min, daily_limit=self.daily_limit)
+        return bucket
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def overview(
+        self,
+        symbol: str,
+        api_key: str,
+        fetch: Callable[[str, str], Dict[str, Any]],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        OVERVIEW を返す。クォータ不足・レート制限応答・失敗時は None。
+        fetch の例外は送出せず None にする（呼び出し側は yfinance 補完へ）。
+        """
+        symbol = symbol.upper()
+        cached = self.cache.get(symbol)
+        if cached is not None:
+            self._count("cache_hits")
+            return cached
+
+        with self._lock:
+            flight = self._flights.get(symbol)
+            leader = flight is None
+            if leader:
+                flight = self._flights[symbol] = _Flight()
+        if not leader:
+            self._count("coalesced")
+            flight.event.wait()
+            return flight.result
+
+        try:
+            flight.result = self._fetch(symbol, api_key, fetch)
+            return flight.result
+        finally:
+            with self._lock:
+                self._flights.pop(symbol, None)
+            flight.event.set()
+
+    def _fetch(self, symbol: str, api_key: str, fetch) -> Optional[Dict[str, Any]]:
+        bucket = self._bucket(api_key)
+        if not bucket.try_acquire():
+            self._count("throttled")
+            return None
+
+        self._count("calls")
+        try:
+            data = fetch(symbol, api_key)
+        except Exception:
+            self._count("errors")
+            return None
+
+        if isinstance(data, dict) and any(k in data for k in _RATE_LIMIT_KEYS) and "Symbol" not in data:
+            self._count("rate_limited")
+            bucket.drain()
+            return None
+        if not isinstance(data, dict) or not data:
+            # 空応答（未収録銘柄）もキャッシュして同日の再問い合わせを避ける
+            data = {}
+        self.cache.set(symbol, data)
+        return data
+
+    def status(self, api_key: Optional[str] = None) -> Dict[str, Any]:
+        """残クォータとカウンタ。api_key 省略時は全キー（キーはハッシュで表示）。"""
+        with self._lock:
+            counters = dict(self.counters)
+            buckets = dict(self._buckets)
+        if api_key is not None:
+            key_id = self._key_id(api_key)
+            buckets = {key_id: buckets[key_id]} if key_id in buckets else {}
+        return {
+            "counters": counters,
+            "keys": {k: b.status() for k, b in buckets.items()},
+        }
+
+
+AV_QUOTA = AlphaVantageQuota()
+
+
+def quota_status(api_key: Optional[str] = None) -> Dict[str, Any]:
+    return AV_QUOTA.status(api_key)
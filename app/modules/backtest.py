@@ -0,0 +1,316 @@
+"""
+backtest.py
+────────────────────────────────────────────────────────────────────────────
+QVT バックテストエンジン（保存済み日次履歴のリプレイ）
+
+【処理フロー】
+  ① 日次価格パネル（index=日付, columns=銘柄）を時系列順にチャンク投入
+  ② IncrementalTScorer がチャンクごとに T スコアを時点整合で再計算
+     （直近 T_LOOKBACK_DAYS 日だけを状態として持ち越す）
+  ③ 日付付きファンダスナップショット（Q / V）を as-of 結合
+       各日 × 銘柄に「その日以前で最新のスナップショット」を割り当てる
+  ④ QVT = Q×WEIGHT_Q + V×WEIGHT_V + T×WEIGHT_T（indicators と同じ式）
+  ⑤ 先行リターン（5 / 20 / 60 営業日など）をシグナルバケット別に集計
+
+【設計メモ】
+  - 全処理は日付 × 銘柄の 2次元配列で行い、銘柄ループを持たない
+    → 10年 × 1,000銘柄でも1台で数分以内
+  - スナップショットは long 形式 DataFrame[date, ticker, q_score, v_score]
+  - バケット境界は UI の QVT 目安（50 / 60 / 70）に合わせたデフォルト
+"""
+
+from __future__ import annotations
+
+from typing import Optional, Dict, Any, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from modules.indicators import WEIGHT_Q, WEIGHT_V, WEIGHT_T
+from modules.t_logic import compute_t_score_panel, T_LOOKBACK_DAYS
+
+
+DEFAULT_HORIZONS: List[int] = [5, 20, 60]
+
+# QVT 目安（render_qvt_tab）: 70以上 主力候補 / 60〜 / 50〜 / 50未満
+DEFAULT_BUCKET_EDGES: List[float] = [0.0, 40.0, 50.0, 60.0, 70.0, 100.0]
+
+DEFAULT_CHUNK_DAYS = 252
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 価格パネルの組み立て
+# ═══════════════════════════════════════════════════════════════════════════
+
+def price_panel_from_history(history: pd.DataFrame) -> Dict[str, Optional[pd.DataFrame]]:
+    """
+    long 形式の保存履歴 DataFrame[date, ticker, Close, (High), (Low)] を
+    日付 × 銘柄のパネルへ変換する。
+
+    Returns
+    -------
+    {"close": DataFrame, "high": DataFrame | None, "low": DataFrame | None}
+    """
+    hist = history.copy()
+    hist["date"] = pd.to_datetime(hist["date"])
+    panel: Dict[str, Optional[pd.DataFrame]] = {}
+    for col in ("Close", "High", "Low"):
+        if col in hist.columns:
+            wide = hist.pivot_table(index="date", columns="ticker", values=col, aggfunc="last")
+            panel[col.lower()] = wide.sort_index()
+        else:
+            panel[col.lower()] = None
+    if panel["close"] is None:
+        raise ValueError("履歴に Close 列がありません。")
+    return panel
+
+
+def price_panel_from_frames(price_data: Dict[str, pd.DataFrame]) -> Dict[str, Optional[pd.DataFrame]]:
+    """
+    data_fetch.fetch_all_for_d_index の price_data {label: DataFrame[Close, Low, ...]}
+    をパネルへ変換する。
+    """
+    def _wide(col: str) -> Optional[pd.DataFrame]:
+        cols = {label: df[col] for label, df in price_data.items() if col in df.columns}
+        return pd.DataFrame(cols).sort_index() if cols else None
+
+    panel = {"close": _wide("Close"), "high": _wide("High"), "low": _wide("Low")}
+    if panel["close"] is None:
+        raise ValueError("price_data に Close 列がありません。")
+    return panel
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# T スコア: 増分リプレイ
+# ═══════════════════════════════════════════════════════════════════════════
+
+class IncrementalTScorer:
+    """
+    日次価格チャンクを順に受け取り、各日時点の T スコアを返す。
+
+    直近 T_LOOKBACK_DAYS 日の価格だけを状態として保持するため、
+    履歴全体を一度にメモリへ載せなくても全期間をリプレイできる。
+    新しい日付を追記するだけの日次更新にもそのまま使える。
+    日米混在パネルでは、各銘柄が自分の営業日で T_LOOKBACK_DAYS 日分を
+    保持できるところまで残す。
+    """
+
+    def __init__(self, lookback: int = T_LOOKBACK_DAYS):
+        self.lookback = lookback
+        self._close: Optional[pd.DataFrame] = None
+        self._high: Optional[pd.DataFrame] = None
+        self._low: Optional[pd.DataFrame] = None
+
+    @staticmethod
+    def _tail_start(close: pd.DataFrame, lookback: int) -> int:
+        """
+        どの銘柄も終値のある行を lookback 行以上残せる、最も後ろの開始位置。
+
+        上場廃止などで更新の止まった銘柄に引きずられないよう、残すのは最大 2 * lookback 行。
+        """
+        start = max(len(close) - lookback, 0)
+        for col in close.columns:
+            positions = np.flatnonzero(close[col].notna().to_numpy())
+            if len(positions) > lookback:
+                start = min(start, int(positions[-lookback]))
+            elif len(positions):
+                start = min(start, int(positions[0]))
+        return max(start, len(close) - 2 * lookback, 0)
+
+    @staticmethod
+    def _append(state: Optional[pd.DataFrame], chunk: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+        if chunk is None:
+            return None
+        return chunk if state is None else pd.concat([state, chunk])
+
+    def update(
+        self,
+        close: pd.DataFrame,
+        high: Optional[pd.DataFrame] = None,
+        low: Optional[pd.DataFrame] = None,
+    ) -> pd.DataFrame:
+        """チャンクを追加し、そのチャンク期間の T スコアを返す。"""
+        full_close = self._append(self._close, close)
+        full_high  = self._append(self._high, high)
+        full_low   = self._append(self._low, low)
+
+        t_score = compute_t_score_panel(full_close, full_high, full_low)["t_score"]
+
+        start = self._tail_start(full_close, self.lookback)
+        self._close = full_close.iloc[start:]
+        self._high  = full_high.iloc[start:] if full_high is not None else None
+        self._low   = full_low.iloc[start:] if full_low is not None else None
+        return t_score.iloc[-len(close):]
+
+
+def replay_t_scores(
+    close: pd.DataFrame,
+    high: Optional[pd.DataFrame] = None,
+    low: Optional[pd.DataFrame] = None,
+    chunk_days: int = DEFAULT_CHUNK_DAYS,
+) -> pd.DataFrame:
+    """価格パネル全期間を chunk_days ずつリプレイして T スコアパネルを返す。"""
+    scorer = IncrementalTScorer()
+    parts = []
+    for start in range(0, len(close), chunk_days):
+        stop = start + chunk_days
+        parts.append(scorer.update(
+            close.iloc[start:stop],
+            high.iloc[start:stop] if high is not None else None,
+            low.iloc[start:stop] if low is not None else None,
+        ))
+    if not parts:
+        return close.iloc[0:0].astype(float)
+    return pd.concat(parts)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# Q / V: 日付付きスナップショットの as-of 結合
+# ═══════════════════════════════════════════════════════════════════════════
+
+def asof_join_snapshots(
+    snapshots: pd.DataFrame,
+    column: str,
+    dates: pd.Index,
+    tickers: pd.Index,
+) -> pd.DataFrame:
+    """
+    long 形式スナップショット DataFrame[date, ticker, column] を
+    各日 × 銘柄の「その日以前で最新の値」パネルに展開する（先読みなし）。
+    """
+    snap = snapshots[["date", "ticker", column]].dropna(subset=[column]).copy()
+    snap["date"] = pd.to_datetime(snap["date"])
+    wide = snap.pivot_table(index="date", columns="ticker", values=column, aggfunc="last")
+    wide = wide.reindex(columns=tickers)
+    all_dates = wide.index.union(dates)
+    return wide.reindex(all_dates).sort_index().ffill().reindex(dates)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 先行リターンとバケット集計
+# ═══════════════════════════════════════════════════════════════════════════
+
+def forward_returns(close: pd.DataFrame, horizons: Sequence[int]) -> Dict[int, pd.DataFrame]:
+    """h 営業日後までのリターン {h: DataFrame}。末尾 h 日は NaN。"""
+    return {h: close.shift(-h) / close - 1.0 for h in horizons}
+
+
+def bucket_stats(
+    signal: pd.DataFrame,
+    fwd: Dict[int, pd.DataFrame],
+    edges: Sequence[float] = DEFAULT_BUCKET_EDGES,
+) -> pd.DataFrame:
+    """
+    シグナル値のバケット別に先行リターンを集計する。
+
+    Returns
+    -------
+    pd.DataFrame
+        index = (horizon, bucket)
+        カラム: count, mean, median, std, hit_rate
+    """
+    edges = list(edges)
+    labels = [f"{edges[i]:g}-{edges[i + 1]:g}" for i in range(len(edges) - 1)]
+    sig = signal.to_numpy(dtype=float).ravel()
+    # 右端（100点ちょうど）も最上位バケットに含める
+    bucket = np.clip(np.digitize(sig, edges[1:-1]), 0, len(labels) - 1)
+    in_range = np.isfinite(sig) & (sig >= edges[0]) & (sig <= edges[-1])
+
+    frames = []
+    for h, ret_df in fwd.items():
+        ret = ret_df.reindex_like(signal).to_numpy(dtype=float).ravel()
+        ok = in_range & np.isfinite(ret)
+        long = pd.DataFrame({"bucket": bucket[ok], "ret": ret[ok], "hit": ret[ok] > 0})
+        grouped = long.groupby("bucket")
+        stats = pd.DataFrame({
+            "count":    grouped["ret"].size(),
+            "mean":     grouped["ret"].mean(),
+            "median":   grouped["ret"].median(),
+            "std":      grouped["ret"].std(),
+            "hit_rate": grouped["hit"].mean(),
+        }).reindex(range(len(labels)))
+        stats["count"] = stats["count"].fillna(0).astype(int)
+        stats.index = pd.Index(labels, name="bucket")
+        stats["horizon"] = h
+        frames.append(stats.reset_index())
+
+    out = pd.concat(frames, ignore_index=True)
+    return out.set_index(["horizon", "bucket"])
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# メイン: run_backtest
+# ═══════════════════════════════════════════════════════════════════════════
+
+def run_backtest(
+    close: pd.DataFrame,
+    high: Optional[pd.DataFrame] = None,
+    low: Optional[pd.DataFrame] = None,
+    snapshots: Optional[pd.DataFrame] = None,
+    horizons: Sequence[int] = DEFAULT_HORIZONS,
+    bucket_edges: Sequence[float] = DEFAULT_BUCKET_EDGES,
+    signal: str = "qvt_score",
+    weights: Optional[Dict[str, float]] = None,
+    chunk_days: int = DEFAULT_CHUNK_DAYS,
+) -> Dict[str, Any]:
+    """
+    保存済み日次履歴をリプレイして QVT シグナルのバックテストを行う。
+
+    Parameters
+    ----------
+    close, high, low : pd.DataFrame
+        日付 × 銘柄の価格パネル（price_panel_from_history などで作成）
+    snapshots : pd.DataFrame, optional
+        日付付きファンダスナップショット DataFrame[date, ticker, q_score, v_score]。
+        None の場合は T スコアのみで評価する（signal は "t_score" 扱い）。
+    horizons : 先行リターンの営業日数
+    bucket_edges : シグナルのバケット境界（0〜100）
+    signal : "qvt_score" | "t_score" | "q_score" | "v_score"
+    weights : {"q": ..., "v": ..., "t": ...}  None なら indicators の WEIGHT_*
+
+    Returns
+    -------
+    dict:
+        t_score / q_score / v_score / qvt_score : 日付 × 銘柄パネル
+        forward_returns : {horizon: パネル}
+        bucket_stats    : バケット別集計 DataFrame
+        signal          : 集計に使ったシグナル名
+        weights_used    : QVT 重み
+    """
+    close = close.sort_index()
+    if high is not None:
+        high = high.reindex_like(close)
+    if low is not None:
+        low = low.reindex_like(close)
+
+    w = {"q": WEIGHT_Q, "v": WEIGHT_V, "t": WEIGHT_T, **(weights or {})}
+
+    t_score = replay_t_scores(close, high, low, chunk_days=chunk_days)
+
+    q_score = v_score = qvt_score = None
+    if snapshots is not None:
+        q_score = asof_join_snapshots(snapshots, "q_score", close.index, close.columns)
+        v_score = asof_join_snapshots(snapshots, "v_score", close.index, close.columns)
+        qvt_score = (q_score * w["q"] + v_score * w["v"] + t_score * w["t"]).round(1)
+    elif signal != "t_score":
+        signal = "t_score"
+
+    panels = {
+        "t_score": t_score,
+        "q_score": q_score,
+        "v_score": v_score,
+        "qvt_score": qvt_score,
+    }
+    if panels.get(signal) is None:
+        raise ValueError(f"未対応のシグナルです: {signal}")
+
+    fwd = forward_returns(close, horizons)
+    stats = bucket_stats(panels[signal], fwd, edges=bucket_edges)
+
+    return {
+        **panels,
+        "forward_returns": fwd,
+        "bucket_stats":    stats,
+        "signal":          signal,
+        "weights_used":    w,
+    }
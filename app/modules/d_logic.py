@@ -43,6 +43,8 @@ from typing import Optional, Dict, Any, Tuple, List
 import numpy as np
 import pandas as pd
 
+from modules.tracing import traced
+
 
 # ═══════════════════════════════════════════════════════════════════════════
 # 重み定義
@@ -172,6 +174,59 @@ def calc_volume_pressure(close: pd.Series, volume: pd.Series,
     }
 
 
+def summarize_volume_pressure(vol_ratio: pd.Series, down_mask: pd.Series,
+                              bins: int = 30, clip_quantile: float = 0.99) -> dict:
+    """
+    ⑥ の出来高倍率分布のサマリー（D タブの箱ひげ図・ヒストグラム用）
+
+    上昇・横ばい日 / 下落日 それぞれの四分位・ヒゲ（1.5 IQR）・外れ値位置と、
+    両者共通の階級でのヒストグラム度数を1回で求める。
+    ヒストグラムは clip_quantile 分位点で上側をクリップした値で数える。
+
+    Returns
+    -------
+    dict:
+        values   : 出来高倍率（NaN 除外、np.ndarray）
+        is_down  : values と同じ長さの下落日フラグ
+        groups   : {"up": {...}, "down": {...}}  各 n / q1 / median / q3 / lower / upper /
+                   outliers（values 上の位置）。該当日が無い種別は含まない
+        hist     : {"edges": 階級境界, "up": 度数, "down": 度数, "clip": クリップ値}
+    """
+    vr = vol_ratio.dropna()
+    values = vr.to_numpy(dtype=float)
+    is_down = down_mask.reindex(vr.index).fillna(False).to_numpy(dtype=bool)
+    if values.size == 0:
+        return {"values": values, "is_down": is_down, "groups": {}, "hist": None}
+
+    groups = {}
+    for name, sel in (("up", ~is_down), ("down", is_down)):
+        pos = np.flatnonzero(sel)
+        if pos.size == 0:
+            continue
+        v = values[pos]
+        q1, median, q3 = np.percentile(v, [25, 50, 75])
+        iqr = q3 - q1
+        inside = (v >= q1 - 1.5 * iqr) & (v <= q3 + 1.5 * iqr)
+        groups[name] = {
+            "n": int(pos.size),
+            "q1": float(q1), "median": float(median), "q3": float(q3),
+            "lower": float(v[inside].min()), "upper": float(v[inside].max()),
+            "outliers": pos[~inside],
+        }
+
+    clip = float(np.quantile(values, clip_quantile))
+    clipped = np.minimum(values, clip)
+    edges = np.histogram_bin_edges(clipped, bins=bins)
+    hist = {
+        "edges": edges,
+        "up": np.histogram(clipped[~is_down], bins=edges)[0],
+        "down": np.histogram(clipped[is_down], bins=edges)[0],
+        "clip": clip,
+    }
+    return {"values": values, "is_down": is_down, "groups": groups, "hist": hist}
+
+
+@traced("d_logic.raw_metrics")
 def compute_raw_metrics(df: pd.DataFrame,
                         ma_period: int = 200,
                         vol_ma_window: int = 20) -> Tuple[dict, dict]:
@@ -214,6 +269,7 @@ def compute_raw_metrics(df: pd.DataFrame,
     return raw_vals, detail
 
 
+@traced("d_logic.benchmark_raw")
 def compute_benchmark_raw(
     bm_df: pd.DataFrame,
     ma_period: int = 200,
@@ -428,6 +484,7 @@ def get_plus_minus(score: float, base_rank: str,
 # メイン: score_defense（他の *_logic.py と同じインターフェース）
 # ═══════════════════════════════════════════════════════════════════════════
 
+@traced("d_logic.score_defense")
 def score_defense(
     df: pd.DataFrame,
     bm_raw_vals: Dict[str, float],
@@ -726,3 +783,335 @@ def build_results_list(
         detail_store[label] = result["detail"]
 
     return results, detail_store, bm_raw_store
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 時系列モード: ローリングウィンドウでの D スコア推移
+# ───────────────────────────────────────────────────────────────────────────
+#   各営業日 e について「直近 window 日 [e-window+1, e]」を切り出して
+#   score_defense を呼んだのと同じ値を、全期間まとめて計算する。
+#
+#   ウィンドウ内で MA / 出来高MA が有効になるのは先頭から
+#   ma_period-1 / vol_ma_window-1 日以降なので、全期間で一度だけ計算した
+#   MA 系列に対し「window - ma_period + 1」日のローリング集計を掛ければ
+#   ウィンドウ単位の再計算と一致する。
+#     ① 下回り比率 : rolling sum / 有効日数
+#     ② 最大下方乖離: rolling min
+#     ③ 52w安値/MA : 終端日の値（ウィンドウ ≥ 252 日のとき）
+#     ④ 最大DD     : ウィンドウ起点からの累積最大（チャンク単位で一括）
+#     ⑤ 下方Vol    : 負リターンの rolling std
+#     ⑥ 出来高圧力  : 下落日出来高倍率の rolling mean
+# ═══════════════════════════════════════════════════════════════════════════
+
+DEFAULT_SERIES_WINDOW = 400
+
+# ④ 最大DD をまとめて計算するときのチャンク行数（メモリ ≒ chunk × window × 8B）
+_MDD_CHUNK_ROWS = 512
+
+
+def _rolling_max_drawdown(close: pd.Series, window: int) -> pd.Series:
+    """各終端日について直近 window 日の最大ドローダウン（絶対値）を返す。"""
+    values = close.to_numpy(dtype=float)
+    out = np.full(len(values), np.nan)
+    if len(values) < window:
+        return pd.Series(out, index=close.index)
+
+    views = np.lib.stride_tricks.sliding_window_view(values, window)
+    for start in range(0, len(views), _MDD_CHUNK_ROWS):
+        chunk = views[start:start + _MDD_CHUNK_ROWS]
+        cummax = np.fmax.accumulate(chunk, axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            dd = (chunk - cummax) / cummax
+        dd = np.where(np.isnan(dd), np.inf, dd).min(axis=1)
+        dd = np.where(np.isinf(dd), np.nan, dd)
+        out[window - 1 + start: window - 1 + start + len(chunk)] = np.abs(dd)
+    return pd.Series(out, index=close.index)
+
+
+def compute_rolling_raw_metrics(
+    df: pd.DataFrame,
+    window: int = DEFAULT_SERIES_WINDOW,
+    ma_period: int = 200,
+    vol_ma_window: int = 20,
+    annual_factor: int = 252,
+) -> pd.DataFrame:
+    """
+    DataFrame[Close, Low, Volume] から6指標の生値をローリングで計算する。
+
+    Returns
+    -------
+    pd.DataFrame
+        index = df.index、カラム = METRIC_COLS。
+        各行は「その日を終端とする直近 window 日」に compute_raw_metrics を
+        適用した値と同じ。先頭 window-1 行は NaN。
+    """
+    if window < 2:
+        raise ValueError(f"window は2以上を指定してください: {window}")
+
+    close, low, volume = df["Close"], df["Low"], df["Volume"]
+    n_ma  = window - ma_period + 1       # ウィンドウ内で MA が有効な日数
+    n_vol = window - vol_ma_window + 1   # ウィンドウ内で出来高MAが有効な日数
+
+    ma  = close.rolling(ma_period).mean()
+    out = pd.DataFrame(index=df.index, columns=METRIC_COLS, dtype=float)
+
+    # ── ①② MA 系 ──
+    if n_ma > 0:
+        below = (close < ma).astype(float).where(ma.notna())
+        out["①_below_ma_ratio"] = below.rolling(n_ma, min_periods=n_ma).sum() / n_ma
+        dev = (close - ma) / ma
+        out["②_max_neg_dev"] = dev.rolling(n_ma, min_periods=n_ma).min().abs()
+
+    # ── ③ 52週安値 / MA（終端日の値）──
+    if window >= max(ma_period, 252):
+        low_52w = low.rolling(252).min()
+        out["③_52w_low_vs_ma"] = (1 - low_52w / ma).clip(lower=0)
+
+    # ── ④ 最大ドローダウン ──
+    out["④_max_drawdown"] = _rolling_max_drawdown(close, window)
+
+    # ── ⑤ 下方ボラティリティ ──
+    ret = close.pct_change()
+    neg = ret.where(ret < 0)
+    out["⑤_downside_vol"] = (
+        neg.rolling(window - 1, min_periods=2).std() * np.sqrt(annual_factor)
+    )
+
+    # ── ⑥ 出来高下方圧力 ──
+    if n_vol > 0:
+        vol_ma    = volume.rolling(vol_ma_window).mean()
+        vol_ratio = volume / vol_ma.replace(0, np.nan)
+        down_mask = (volume > 0) & ret.notna() & vol_ma.notna() & (ret < 0)
+        out["⑥_vol_pressure"] = (
+            vol_ratio.where(down_mask).rolling(n_vol, min_periods=1).mean()
+        )
+
+    out.iloc[:window - 1] = np.nan
+    return out
+
+
+def _normalize_raw_frame(
+    raw_df: pd.DataFrame,
+    bm_raw_df: pd.DataFrame,
+    same_market_raw: Optional[Dict[str, pd.DataFrame]] = None,
+) -> pd.DataFrame:
+    """
+    benchmark_normalize の列一括版。
+
+    σ は日付ごとに「同市場銘柄 + BM」（未指定なら対象銘柄 + BM）のプールで推定する。
+    """
+    norm = pd.DataFrame(index=raw_df.index, columns=METRIC_COLS, dtype=float)
+    for col in METRIC_COLS:
+        ticker_val = raw_df[col].to_numpy(dtype=float)
+        bm_val     = bm_raw_df[col].to_numpy(dtype=float)
+
+        if same_market_raw:
+            pool = [rv[col].to_numpy(dtype=float) for rv in same_market_raw.values()]
+        else:
+            pool = [ticker_val]
+        pool = np.column_stack(pool + [bm_val])
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            valid = ~np.isnan(pool)
+            n     = valid.sum(axis=1)
+            mean  = np.where(valid, pool, 0.0).sum(axis=1) / n
+            var   = np.where(valid, (pool - mean[:, None]) ** 2, 0.0).sum(axis=1) / n
+            std   = np.sqrt(var)
+            k     = 0.5 / (3.0 * std)
+            score = np.clip(0.5 + k * (ticker_val - bm_val), 0.0, 1.0)
+
+        flat = np.isnan(std) | (std < 1e-12)
+        norm[col] = np.where(flat, 0.5, score)
+    return norm
+
+
+def _rank_index(scores: np.ndarray, bounds: List[Tuple[str, float, float]]) -> np.ndarray:
+    """スコア配列を bounds のインデックスへ変換する（範囲外・NaN は最後のランク）。"""
+    idx = np.full(scores.shape, len(bounds) - 1, dtype=int)
+    for i, (_, lo, hi) in enumerate(bounds):
+        idx = np.where((scores >= lo) & (scores < hi), i, idx)
+    return idx
+
+
+def grade_defense_series(
+    defensive_score: pd.Series,
+    norm_df: pd.DataFrame,
+) -> Tuple[pd.Series, pd.Series]:
+    """
+    get_base_rank / get_plus_minus の列一括版。
+
+    Returns
+    -------
+    base_rank : pd.Series[str]
+    grade     : pd.Series[str]
+    """
+    score     = defensive_score.to_numpy(dtype=float)
+    rank_arr  = np.array([r for r, _, _ in RANK_BOUNDS])
+    lo_arr    = np.array([lo for _, lo, _ in RANK_BOUNDS])
+    hi_arr    = np.array([hi for _, _, hi in RANK_BOUNDS])
+    mid_arr   = np.array([_get_rank_center(r) for r in rank_arr])
+    last      = len(RANK_BOUNDS) - 1
+
+    cur = _rank_index(score, RANK_BOUNDS)
+    lo, hi = lo_arr[cur], hi_arr[cur]
+
+    near_upper = (hi < 1.01) & (score >= hi - RANK_BOUNDARY_WIDTH)
+    near_lower = (lo > 0.00) & (score < lo + RANK_BOUNDARY_WIDTH)
+
+    # ③ 中央値ルール
+    mid, band = mid_arr[cur], (hi - lo) / 6
+    mid_suffix = np.where(
+        score >= mid + band, np.where(cur != 0, 1, 0),
+        np.where(score <= mid - band, np.where(cur != last, -1, 0), 0),
+    )
+
+    # ④ 境界付近: 6指標の分布
+    def_scores = 1.0 - norm_df[METRIC_COLS].to_numpy(dtype=float)
+    def_scores[:, -1] = norm_df["⑥_vol_pressure"].to_numpy(dtype=float)
+    ms_idx = _rank_index(def_scores, RANK_BOUNDS)
+    upper  = (ms_idx < cur[:, None]).sum(axis=1)
+    lower  = (ms_idx > cur[:, None]).sum(axis=1)
+    near_suffix = np.sign(upper - lower)
+    near_suffix = np.where((cur == 0) & (near_suffix > 0), 0, near_suffix)
+    near_suffix = np.where((cur == last) & (near_suffix < 0), 0, near_suffix)
+
+    suffix = np.where(near_upper | near_lower, near_suffix, mid_suffix)
+    suffix_str = np.select([suffix > 0, suffix < 0], ["+", "-"], "")
+
+    base_rank = rank_arr[cur]
+    grade = np.char.add(base_rank.astype(str), suffix_str.astype(str))
+    index = defensive_score.index
+    return pd.Series(base_rank, index=index), pd.Series(grade, index=index)
+
+
+def score_defense_series(
+    df: pd.DataFrame,
+    bm_df: Optional[pd.DataFrame] = None,
+    bm_raw_series: Optional[pd.DataFrame] = None,
+    same_market_raw: Optional[Dict[str, pd.DataFrame]] = None,
+    raw_series: Optional[pd.DataFrame] = None,
+    window: int = DEFAULT_SERIES_WINDOW,
+    ma_period: int = 200,
+    vol_ma_window: int = 20,
+    weights: Optional[Dict[str, float]] = None,
+) -> pd.DataFrame:
+    """
+    D スコアの時系列（直近 window 日ローリング）を計算する。
+
+    各行は「その日までの直近 window 日」で score_defense を呼んだ結果に相当する。
+    全期間を一度のローリング集計で処理するため、5年分の日次系列でも
+    score_defense 数回分のコストで済む。
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        対象銘柄の価格データ DataFrame[Close, Low, Volume]（全期間）
+    bm_df : pd.DataFrame, optional
+        ベンチマークの価格データ。bm_raw_series 未指定時に使用。
+    bm_raw_series : pd.DataFrame, optional
+        compute_rolling_raw_metrics で計算済みのベンチマーク生値系列
+    same_market_raw : dict, optional
+        {label: compute_rolling_raw_metrics の結果} σ 推定プール用
+    raw_series : pd.DataFrame, optional
+        対象銘柄の compute_rolling_raw_metrics 結果（計算済みなら再利用）
+    window : int
+        ローリングウィンドウ（営業日数、デフォルト 400）
+
+    Returns
+    -------
+    pd.DataFrame
+        index = 日付（ウィンドウが埋まった日以降）
+        カラム:
+            METRIC_COLS（生値）, d1〜d6, def1〜def6,
+            d_score, defensive_score, base_rank, grade, vp_score, vp_rank
+    """
+    if bm_raw_series is None:
+        if bm_df is None:
+            raise ValueError("bm_df か bm_raw_series のどちらかを指定してください。")
+        bm_raw_series = compute_rolling_raw_metrics(
+            bm_df, window=window, ma_period=ma_period, vol_ma_window=vol_ma_window,
+        )
+
+    w = _normalize_d_weights(weights or DEFAULT_D_WEIGHTS)
+
+    if raw_series is None:
+        raw_series = compute_rolling_raw_metrics(
+            df, window=window, ma_period=ma_period, vol_ma_window=vol_ma_window,
+        )
+    raw_df = raw_series.iloc[window - 1:]
+    bm_aligned = bm_raw_series.reindex(raw_df.index).ffill()
+    pool = (
+        {label: rv.reindex(raw_df.index) for label, rv in same_market_raw.items()}
+        if same_market_raw else None
+    )
+
+    norm_df = _normalize_raw_frame(raw_df, bm_aligned, pool)
+
+    d_index = sum(norm_df[col] * w[wk] for col, wk in _COL_WEIGHT_MAP).clip(0.0, 1.0)
+    defensive_score = (1.0 - d_index).round(4)
+    base_rank, grade = grade_defense_series(defensive_score, norm_df)
+
+    out = raw_df.copy()
+    for i, col in enumerate(METRIC_COLS, start=1):
+        out[f"d{i}"] = norm_df[col].round(4)
+    for i, col in enumerate(METRIC_COLS[:-1], start=1):
+        out[f"def{i}"] = (1.0 - norm_df[col]).round(4)
+    out["def6"] = norm_df["⑥_vol_pressure"].round(4)   # ← 非反転（score_defense と同じ）
+
+    out["d_score"]         = d_index.round(4)
+    out["defensive_score"] = defensive_score
+    out["base_rank"]       = base_rank
+    out["grade"]           = grade
+    out["vp_score"]        = out["d6"]
+    vp_idx = _rank_index(out["vp_score"].to_numpy(dtype=float), PRESSURE_RANK_BOUNDS)
+    out["vp_rank"] = np.array([r for r, _, _ in PRESSURE_RANK_BOUNDS])[vp_idx]
+    return out
+
+
+def build_defense_series_store(
+    price_data: Dict[str, pd.DataFrame],
+    ticker_meta: Dict[str, dict],
+    bm_data: Dict[str, pd.DataFrame],
+    window: int = DEFAULT_SERIES_WINDOW,
+    ma_period: int = 200,
+    vol_ma_window: int = 20,
+    weights: Optional[Dict[str, float]] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    build_results_list の時系列版。複数銘柄の D スコア推移をまとめて計算する。
+
+    Returns
+    -------
+    {label: score_defense_series の返却 DataFrame}
+    """
+    kwargs = dict(window=window, ma_period=ma_period, vol_ma_window=vol_ma_window)
+
+    bm_raw_store = {
+        market: compute_rolling_raw_metrics(df, **kwargs)
+        for market, df in bm_data.items()
+    }
+    all_raw = {
+        label: compute_rolling_raw_metrics(df, **kwargs)
+        for label, df in price_data.items()
+    }
+
+    market_groups: Dict[str, Dict[str, pd.DataFrame]] = {}
+    for label, meta in ticker_meta.items():
+        if label in all_raw:
+            market_groups.setdefault(meta["market"], {})[label] = all_raw[label]
+
+    series_store: Dict[str, pd.DataFrame] = {}
+    for label, df in price_data.items():
+        market = ticker_meta[label]["market"]
+        bm_rv  = bm_raw_store.get(market)
+        if bm_rv is None:
+            continue
+        series_store[label] = score_defense_series(
+            df,
+            bm_raw_series   = bm_rv,
+            same_market_raw = market_groups.get(market),
+            raw_series      = all_raw[label],
+            weights         = weights,
+            **kwargs,
+        )
+    return series_store
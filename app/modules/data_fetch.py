@@ -9,22 +9,31 @@ data_fetch.py  (v3)
 取得元:
   日本株 : IRBANK スクレイピング（既存） + yfinance 補完（新規項目）
   米国株 : Alpha Vantage OVERVIEW API + yfinance.info フォールバック
+
+実際の通信は modules.data_sources の取得元（get_source()）経由。
+MARKET_DATA_SOURCE=replay:<dir> で記録済みレスポンスに差し替えられる。
+
+yfinance / BeautifulSoup は使う関数の中で import する（skin の import 時には
+読み込まない）。ティッカー変換は modules.tickers にあり、ここからも import できる。
 """
 
-from typing import Optional, Tuple, Dict
-import os
+from typing import Optional, Tuple, Dict, TYPE_CHECKING
 import re
 from datetime import datetime, timedelta
-import time
 
-import requests
-from bs4 import BeautifulSoup
-import yfinance as yf
 import pandas as pd
 import streamlit as st
 
-IRBANK_BASE = "https://irbank.net/"
-ALPHA_BASE  = "https://www.alphavantage.co/query"
+from modules import ref_data
+from modules.data_sources import IRBANK_BASE, ALPHA_BASE, get_source
+from modules.av_quota import AV_QUOTA
+from modules.http_client import DEFAULT_RETRY
+from modules.tracing import traced
+from modules.tickers import convert_ticker, is_jpx_ticker  # 互換のため再公開
+
+if TYPE_CHECKING:
+    import yfinance as yf
+
 COMPANY_NAME_CACHE: Dict[str, str] = {}
 DEFAULT_BENCHMARK_TICKERS = {
     "jp": "^N225",
@@ -40,24 +49,6 @@ def _get_av_key() -> Optional[str]:
         return None
 
 
-# ─── ティッカー変換 ────────────────────────────────────────────────────────
-
-def convert_ticker(raw: str) -> str:
-    t = raw.strip().upper()
-    if not t:
-        return ""
-    if t.endswith(".T"):
-        return t
-    if t.isdigit() and 4 <= len(t) <= 5:
-        return t + ".T"
-    return t
-
-
-def is_jpx_ticker(ticker: str) -> bool:
-    t = ticker.strip().upper()
-    return t.endswith(".T") or (t.isdigit() and 4 <= len(t) <= 5)
-
-
 # ─── 共通ユーティリティ ────────────────────────────────────────────────────
 
 def _safe_float(x) -> Optional[float]:
@@ -67,7 +58,7 @@ def _safe_float(x) -> Optional[float]:
         return None
 
 
-def _compute_dividend_yield(ticker_obj: yf.Ticker, close: float) -> Optional[float]:
+def _compute_dividend_yield(ticker_obj: "yf.Ticker", close: float) -> Optional[float]:
     divs = ticker_obj.dividends
     if not isinstance(divs, pd.Series) or len(divs) == 0 or close <= 0:
         return None
@@ -95,19 +86,17 @@ def _clean_jpx_company_name(name: str) -> str:
     return name.strip(" 　-|｜")
 
 
+@traced("fetch.yf_info")
 def _safe_get_yf_info(ticker_obj) -> dict:
-    """yfinance .info を取得する。失敗時は1回リトライして {} を返す。"""
-    for attempt in range(2):
-        try:
-            info = ticker_obj.info
-            if isinstance(info, dict) and len(info) > 5:   # 空辞書や最小辞書は除外
-                return info
-        except Exception:
-            pass
-        if attempt == 0:
-            import time as _time
-            _time.sleep(0.5)
-    return {}
+    """yfinance .info を取得する。失敗・空の場合は DEFAULT_RETRY で再試行し、最後は {} を返す。"""
+    def _valid(info) -> bool:
+        return isinstance(info, dict) and len(info) > 5   # 空辞書や最小辞書は除外
+
+    try:
+        info = DEFAULT_RETRY.call(lambda: ticker_obj.info, retry_if=lambda i: not _valid(i))
+    except Exception:
+        return {}
+    return info if _valid(info) else {}
 
 
 def _statement_value(stmt, keys, exact_first: bool = False) -> Optional[float]:
@@ -137,22 +126,23 @@ def _statement_value(stmt, keys, exact_first: bool = False) -> Optional[float]:
     return _extract(match_exact=False)
 
 
+@traced("fetch.yf_download")
 def _download_price_frame(ticker: str, period: str = "400d", interval: str = "1d") -> dict:
     """
     yfinance から価格系列を取得し、主要列情報を共通フォーマットで返す。
     benchmark / 個別銘柄の両方で使う内部ヘルパー。
     """
-    df = None
     last_err = None
-    for _ in range(2):
+
+    def _attempt() -> pd.DataFrame:
+        nonlocal last_err
         try:
-            df = yf.download(ticker, period=period, interval=interval, progress=False)
+            return get_source().download(ticker, period=period, interval=interval, progress=False)
         except Exception as e:
             last_err = e
-            df = pd.DataFrame()
-        if not df.empty and len(df) >= 2:
-            break
-        time.sleep(1)
+            return pd.DataFrame()
+
+    df = DEFAULT_RETRY.call(_attempt, retry_if=lambda d: d.empty or len(d) < 2)
 
     if df is None or df.empty or len(df) < 2:
         msg = f"株価データ取得エラー: {last_err}" if last_err else "株価データが取得できませんでした。"
@@ -200,6 +190,7 @@ def _default_benchmark_ticker_for(ticker: str) -> str:
     return DEFAULT_BENCHMARK_TICKERS["jp"] if is_jpx_ticker(ticker) else DEFAULT_BENCHMARK_TICKERS["us"]
 
 
+@traced("fetch.benchmark")
 def get_benchmark_data(
     ticker: str,
     bm_ticker: Optional[str] = None,
@@ -213,7 +204,7 @@ def get_benchmark_data(
     benchmark_ticker = (bm_ticker or _default_benchmark_ticker_for(ticker)).strip().upper()
     price_data = _download_price_frame(benchmark_ticker, period=period, interval=interval)
 
-    ticker_obj = yf.Ticker(benchmark_ticker)
+    ticker_obj = get_source().ticker(benchmark_ticker)
     info = _safe_get_yf_info(ticker_obj)
     company_name = (
         info.get("shortName")
@@ -264,35 +255,10 @@ def fetch_single_for_d_index(
         "bm_raw_vals": benchmark,
     }
 # ─── TSE マスター（業種情報） ──────────────────────────────────────────────
-_TSE_MASTER: Optional[dict] = None
 
 def _load_tse_master() -> dict:
-    """tse_master_latest.csv を読み込んで {ticker: {sector, industry}} を返す（1回のみ）。"""
-    global _TSE_MASTER
-    if _TSE_MASTER is not None:
-        return _TSE_MASTER
-    candidates = [
-        os.path.join(os.path.dirname(__file__), "..", "data", "tse_master_latest.csv"),
-        "app/data/tse_master_latest.csv",
-        "data/tse_master_latest.csv",
-    ]
-    for path in candidates:
-        if os.path.exists(path):
-            try:
-                df = pd.read_csv(path, encoding="utf-8-sig")
-                _TSE_MASTER = {
-                    str(row["ticker"]).strip().upper(): {
-                        "sector":   str(row.get("sector",   "") or ""),
-                        "industry": str(row.get("industry", "") or ""),
-                    }
-                    for _, row in df.iterrows()
-                    if pd.notna(row.get("ticker"))
-                }
-                return _TSE_MASTER
-            except Exception:
-                pass
-    _TSE_MASTER = {}
-    return _TSE_MASTER
+    """{ticker: {sector, industry}}（modules.ref_data の tse_master。1プロセス1回のみ）。"""
+    return ref_data.get("tse_master")
 
 
 def get_industry_from_master(ticker: str) -> dict:
@@ -335,6 +301,7 @@ def _extract_industry_from_info(info: dict) -> str:
 
 # ─── IRBANK スクレイピング（日本株） ─────────────────────────────────────
 
+@traced("fetch.irbank")
 def get_jpx_fundamentals_irbank(code: str) -> dict:
     """
     Returns dict with keys:
@@ -342,20 +309,19 @@ def get_jpx_fundamentals_irbank(code: str) -> dict:
         operating_margin, interest_coverage
     ※ D/E レシオは IRBANK から直接取れないため yfinance で補完
     """
-    url = f"{IRBANK_BASE}{code}"
-    headers = {"User-Agent": "Mozilla/5.0", "Referer": IRBANK_BASE}
     result = {k: None for k in [
         "eps", "bps", "per_fwd", "roe", "roa", "equity_ratio",
         "operating_margin", "interest_coverage"
     ]}
 
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        resp.raise_for_status()
+        html = get_source().irbank_html(code)
     except Exception:
         return result
 
-    soup = BeautifulSoup(resp.text, "html.parser")
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
 
     # 会社名キャッシュ
     try:
@@ -403,6 +369,7 @@ def get_jpx_fundamentals_irbank(code: str) -> dict:
 
 # ─── Alpha Vantage OVERVIEW（米国株） ─────────────────────────────────────
 
+@traced("fetch.alpha_vantage")
 def get_us_fundamentals_alpha(symbol: str, api_key: str) -> dict:
     """
     Returns dict with keys:
@@ -414,13 +381,9 @@ def get_us_fundamentals_alpha(symbol: str, api_key: str) -> dict:
         "operating_margin", "ev_ebitda"
     ]}
 
-    params = {"function": "OVERVIEW", "symbol": symbol, "apikey": api_key}
-    try:
-        resp = requests.get(ALPHA_BASE, params=params, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-    except Exception:
-        return result
+    # クォータ管理（トークンバケット・単一フライト・日次キャッシュ）経由。
+    # クォータ不足や失敗時は None → 空の result（yfinance 補完に任せる）
+    data = AV_QUOTA.overview(symbol, api_key, get_source().alpha_overview)
 
     if not isinstance(data, dict) or not data:
         return result
@@ -461,6 +424,7 @@ def get_us_fundamentals_alpha(symbol: str, api_key: str) -> dict:
 
 # ─── yfinance から新規項目を補完 ─────────────────────────────────────────
 
+@traced("fetch.yf_statements")
 def _supplement_from_yfinance(info: dict, current: dict, ticker_obj=None) -> dict:
     """
     yfinance.info から未取得項目を補完する。
@@ -645,54 +609,36 @@ def _supplement_from_yfinance(info: dict, current: dict, ticker_obj=None) -> dic
 
 # ─── メイン取得関数 ────────────────────────────────────────────────────────
 
-def get_price_and_meta(ticker: str, period: str = "400d", interval: str = "1d") -> dict:
-    """
-    株価データ + ファンダメンタル指標をまとめて取得して返す。
+_FUNDAMENTAL_KEYS = [
+    "eps", "bps", "per_fwd", "eps_fwd",
+    "roe", "roa", "equity_ratio",
+    "operating_margin", "interest_coverage", "de_ratio",
+    "ev_ebitda",
+]
 
-    返却 dict の主なキー（v3 追加項目に ★）:
-        df, close_col, close, previous_close, high_52w, low_52w
-        company_name, dividend_yield
-        eps, bps, per_fwd, eps_fwd
-        roe, roa, equity_ratio
-        operating_margin ★, interest_coverage ★, de_ratio ★
-        ev_ebitda ★
-    """
-    ticker = convert_ticker(ticker)
-    price_data = _download_price_frame(ticker, period=period, interval=interval)
-    df = price_data["df"]
-    close_col = price_data["close_col"]
-    close = price_data["close"]
-    previous_close = price_data["previous_close"]
-    high_52w = price_data["high_52w"]
-    low_52w = price_data["low_52w"]
 
-    # ── yfinance オブジェクト / info は最初に1回だけ取得 ──
-    ticker_obj = yf.Ticker(ticker)
-    info = _safe_get_yf_info(ticker_obj)
+def fetch_yf_info(ticker: str) -> dict:
+    """yfinance の Ticker オブジェクトと .info を取得する（1回だけ）。"""
+    ticker_obj = get_source().ticker(ticker)
+    return {"ticker_obj": ticker_obj, "info": _safe_get_yf_info(ticker_obj)}
 
-    # ── ファンダメンタル取得 ──
-    fundamentals: dict = {k: None for k in [
-        "eps", "bps", "per_fwd", "eps_fwd",
-        "roe", "roa", "equity_ratio",
-        "operating_margin", "interest_coverage", "de_ratio",
-        "ev_ebitda",
-    ]}
+
+def fetch_primary_fundamentals(ticker: str) -> dict:
+    """
+    一次ソースのファンダメンタルを取得する（yfinance .info には依存しない）。
+      日本株: IRBANK
+      米国株: Alpha Vantage（API キーがある場合のみ）
+    """
+    fundamentals: dict = {k: None for k in _FUNDAMENTAL_KEYS}
 
     if is_jpx_ticker(ticker):
-        # 日本株: IRBANK
         code = ticker.replace(".T", "") if ticker.endswith(".T") else ticker
         irbank = get_jpx_fundamentals_irbank(code)
-
         for k in ("eps", "bps", "per_fwd", "roe", "roa", "equity_ratio",
                   "operating_margin", "interest_coverage"):
             if irbank.get(k) is not None:
                 fundamentals[k] = irbank[k]
-
-        # yfinance で補完
-        fundamentals = _supplement_from_yfinance(info, fundamentals, ticker_obj=ticker_obj)
-
     else:
-        # 米国株: Alpha Vantage → yfinance 補完
         av_key = _get_av_key()
         if av_key:
             av = get_us_fundamentals_alpha(ticker, av_key)
@@ -700,7 +646,29 @@ def get_price_and_meta(ticker: str, period: str = "400d", interval: str = "1d")
                 if v is not None:
                     fundamentals[k] = v
 
-        fundamentals = _supplement_from_yfinance(info, fundamentals, ticker_obj=ticker_obj)
+    return fundamentals
+
+
+def supplement_fundamentals(primary: dict, yf_info: dict) -> dict:
+    """一次ソースの欠損を yfinance で補完する（primary は変更しない）。"""
+    return _supplement_from_yfinance(
+        yf_info["info"], dict(primary), ticker_obj=yf_info["ticker_obj"]
+    )
+
+
+def assemble_price_and_meta(
+    ticker: str,
+    price_data: dict,
+    yf_info: dict,
+    fundamentals: dict,
+) -> dict:
+    """
+    取得済みの価格・info・ファンダメンタルから get_price_and_meta と同じ dict を組み立てる。
+    """
+    info = yf_info["info"]
+    ticker_obj = yf_info["ticker_obj"]
+    close = price_data["close"]
+    fundamentals = dict(fundamentals)
 
     # 予想 EPS（forward PER が取得できた場合のみ）
     if fundamentals["per_fwd"] not in (None, 0) and close > 0:
@@ -727,12 +695,12 @@ def get_price_and_meta(ticker: str, period: str = "400d", interval: str = "1d")
         sector = info.get("sector", "") if isinstance(info, dict) else ""
 
     return {
-        "df": df,
-        "close_col": close_col,
+        "df": price_data["df"],
+        "close_col": price_data["close_col"],
         "close": close,
-        "previous_close": previous_close,
-        "high_52w": high_52w,
-        "low_52w": low_52w,
+        "previous_close": price_data["previous_close"],
+        "high_52w": price_data["high_52w"],
+        "low_52w": price_data["low_52w"],
         "company_name": company_name,
         "dividend_yield": dividend_yield,
         "industry": industry,
@@ -741,6 +709,28 @@ def get_price_and_meta(ticker: str, period: str = "400d", interval: str = "1d")
     }
 
 
+def get_price_and_meta(ticker: str, period: str = "400d", interval: str = "1d") -> dict:
+    """
+    株価データ + ファンダメンタル指標をまとめて取得して返す。
+
+    返却 dict の主なキー（v3 追加項目に ★）:
+        df, close_col, close, previous_close, high_52w, low_52w
+        company_name, dividend_yield
+        eps, bps, per_fwd, eps_fwd
+        roe, roa, equity_ratio
+        operating_margin ★, interest_coverage ★, de_ratio ★
+        ev_ebitda ★
+
+    取得（fetch_*）と組み立て（assemble_price_and_meta）は分離してあり、
+    modules.pipeline ではそれぞれを独立したステージとして並行実行する。
+    """
+    ticker = convert_ticker(ticker)
+    price_data = _download_price_frame(ticker, period=period, interval=interval)
+    yf_info = fetch_yf_info(ticker)
+    fundamentals = supplement_fundamentals(fetch_primary_fundamentals(ticker), yf_info)
+    return assemble_price_and_meta(ticker, price_data, yf_info, fundamentals)
+
+
 # ═══════════════════════════════════════════════════════════════════════════
 # D指数用データ取得（セル3統合）
 # ─ 既存の convert_ticker / is_jpx_ticker を再利用
@@ -815,25 +805,22 @@ def fetch_ohlcv_for_d(yf_symbol: str, start: str, end: str,
                       label: str = None) -> Optional[pd.DataFrame]:
     """
     D指数用に Close（調整後）・Low・Volume を取得する。
-    失敗時は None。リトライ1回付き。
+    失敗時は None。再試行は DEFAULT_RETRY（指数バックオフ + ジッター）。
     """
-    disp = label or yf_symbol
-    for attempt in range(2):
+    def _attempt() -> Optional[pd.DataFrame]:
         try:
-            raw = yf.download(yf_symbol, start=start, end=end,
-                              auto_adjust=True, progress=False)
+            raw = get_source().download(yf_symbol, start=start, end=end,
+                                        auto_adjust=True, progress=False)
             if isinstance(raw.columns, pd.MultiIndex):
                 raw.columns = raw.columns.get_level_values(0)
             df = raw[["Close", "Low", "Volume"]].copy()
             df.index = pd.to_datetime(df.index)
             df.dropna(subset=["Close"], inplace=True)
-            if len(df) > 0:
-                return df
+            return df if len(df) > 0 else None
         except Exception:
-            pass
-        if attempt == 0:
-            time.sleep(1)
-    return None
+            return None
+
+    return DEFAULT_RETRY.call(_attempt, retry_if=lambda df: df is None)
 
 
 def fetch_benchmark_for_d(market: str, start: str,
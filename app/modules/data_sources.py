@@ -0,0 +1,411 @@
+"""
+data_sources.py
+────────────────────────────────────────────────────────────────────────────
+市場データの取得元（data_fetch の下のプラグイン層）
+
+【取得元】
+  LiveSource      : yfinance / IRBANK / Alpha Vantage（本番）。HTTP は
+                    modules.http_client の共有セッション（プール・リトライ）経由
+  ReplaySource    : 記録済みレスポンスをローカルファイルから返す。
+                    遅延（latency_ms ± jitter_ms）と失敗注入（failure_rate）を設定でき、
+                    オフラインの負荷試験・キャッシュ戦略の比較に使う
+  RecordingSource : 別の取得元をそのまま呼び、レスポンスを ReplaySource 形式で保存する
+
+【data_fetch から使う操作】
+  download(symbol, period=..., interval=..., start=..., end=..., auto_adjust=...)
+                                     → 価格 DataFrame（yf.download 相当）
+  ticker(symbol)                     → .info / .dividends / .financials / .balance_sheet /
+                                       .cashflow / .fast_info を持つオブジェクト
+  irbank_html(code)                  → IRBANK 銘柄ページの HTML
+  alpha_overview(symbol, api_key)    → Alpha Vantage OVERVIEW の JSON dict
+
+【選択】
+  環境変数 MARKET_DATA_SOURCE:
+    live（既定） / replay:<dir> / record:<dir>
+  replay の遅延・失敗注入:
+    MARKET_DATA_LATENCY_MS, MARKET_DATA_JITTER_MS, MARKET_DATA_FAILURE_RATE
+  コードから差し替える場合は set_source() / use_source()。
+  取得元はプロセス全体で共有する（パイプラインのワーカースレッドからも同じものが見える）。
+
+【記録ディレクトリの構成】
+  price/<symbol>.csv                 Date, Open, High, Low, Close, Volume
+  info/<symbol>.json
+  fast_info/<symbol>.json
+  dividends/<symbol>.csv
+  statements/<symbol>/{financials,balance_sheet,cashflow}.csv
+  irbank/<code>.html
+  alpha/<symbol>.json
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Optional, Dict, Any, Iterator
+
+import pandas as pd
+
+from modules.http_client import http_get
+
+
+IRBANK_BASE = "https://irbank.net/"
+ALPHA_BASE  = "https://www.alphavantage.co/query"
+
+STATEMENT_ATTRS = ("financials", "balance_sheet", "cashflow")
+
+
+class DataSourceError(ConnectionError):
+    """取得元の失敗（記録なし・失敗注入を含む）。呼び出し側はネットワーク失敗と同様に扱う。"""
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 本番
+# ═══════════════════════════════════════════════════════════════════════════
+
+class LiveSource:
+    name = "live"
+
+    def download(self, symbol: str, **kwargs) -> pd.DataFrame:
+        import yfinance as yf
+        kwargs.setdefault("progress", False)
+        return yf.download(symbol, **kwargs)
+
+    def ticker(self, symbol: str):
+        import yfinance as yf
+        return yf.Ticker(symbol)
+
+    def irbank_html(self, code: str) -> str:
+        resp = http_get(f"{IRBANK_BASE}{code}", headers={"Referer": IRBANK_BASE})
+        return resp.text
+
+    def alpha_overview(self, symbol: str, api_key: str) -> Dict[str, Any]:
+        resp = http_get(ALPHA_BASE, params={"function": "OVERVIEW", "symbol": symbol, "apikey": api_key})
+        return resp.json()
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# リプレイ
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _file_key(symbol: str) -> str:
+    return re.sub(r"[^0-9A-Za-z._-]", "_", symbol.upper())
+
+
+def _flatten_price_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """yfinance の (Price, Ticker) MultiIndex 列を Price だけにする。"""
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+    return df
+
+
+def _period_start(last: pd.Timestamp, period: Optional[str]) -> Optional[pd.Timestamp]:
+    """yfinance の period（"400d" / "6mo" / "5y" / "max"）を開始日に変換する。"""
+    if not period or period == "max":
+        return None
+    m = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if not m:
+        return None
+    n, unit = int(m.group(1)), m.group(2)
+    if unit == "d":
+        return last - timedelta(days=n)
+    if unit == "wk":
+        return last - timedelta(weeks=n)
+    if unit == "mo":
+        return last - pd.DateOffset(months=n)
+    return last - pd.DateOffset(years=n)
+
+
+class ReplayTicker:
+    """yf.Ticker の代わりに記録済みの info / 財務諸表を返す。"""
+
+    def __init__(self, source: "ReplaySource", symbol: str):
+        self._source = source
+        self._key = _file_key(symbol)
+
+    def _json(self, kind: str) -> Dict[str, Any]:
+        path = os.path.join(self._source.root, kind, f"{self._key}.json")
+        self._source._simulate(kind)
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    @property
+    def info(self) -> Dict[str, Any]:
+        return self._json("info")
+
+    @property
+    def fast_info(self) -> Dict[str, Any]:
+        return self._json("fast_info")
+
+    @property
+    def dividends(self) -> pd.Series:
+        self._source._simulate("dividends")
+        path = os.path.join(self._source.root, "dividends", f"{self._key}.csv")
+        if not os.path.exists(path):
+            return pd.Series(dtype=float)
+        s = pd.read_csv(path, index_col=0, parse_dates=[0]).iloc[:, 0]
+        return s.astype(float)
+
+    def _statement(self, name: str) -> pd.DataFrame:
+        self._source._simulate(name)
+        path = os.path.join(self._source.root, "statements", self._key, f"{name}.csv")
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        df = pd.read_csv(path, index_col=0)
+        df.columns = pd.to_datetime(df.columns, errors="coerce")
+        return df
+
+    @property
+    def financials(self) -> pd.DataFrame:
+        return self._statement("financials")
+
+    @property
+    def balance_sheet(self) -> pd.DataFrame:
+        return self._statement("balance_sheet")
+
+    @property
+    def cashflow(self) -> pd.DataFrame:
+        return self._statement("cashflow")
+
+
+class ReplaySource:
+    """
+    記録済みレスポンスを返す取得元。
+
+    latency_ms ± jitter_ms だけ待ってから返し、failure_rate の確率で
+    DataSourceError を送出する（seed 指定で再現可能）。
+    記録がない価格・IRBANK・Alpha Vantage は DataSourceError。
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        root: str,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.root = root
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._price_cache: Dict[str, pd.DataFrame] = {}
+        self.calls: Dict[str, int] = {}
+
+    def _simulate(self, kind: str) -> None:
+        with self._rng_lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+            fail = self.failure_rate > 0 and self._rng.random() < self.failure_rate
+        delay = max(self.latency_ms + jitter, 0.0) / 1000.0
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise DataSourceError(f"injected failure ({kind})")
+
+    def _price_frame(self, symbol: str) -> pd.DataFrame:
+        key = _file_key(symbol)
+        df = self._price_cache.get(key)
+        if df is None:
+            path = os.path.join(self.root, "price", f"{key}.csv")
+            if not os.path.exists(path):
+                raise DataSourceError(f"price not recorded: {symbol}")
+            df = pd.read_csv(path, index_col=0, parse_dates=[0])
+            df.index.name = "Date"
+            self._price_cache[key] = df
+        return df
+
+    def download(self, symbol: str, period: Optional[str] = None, interval: str = "1d",
+                 start=None, end=None, **_ignored) -> pd.DataFrame:
+        self._simulate("download")
+        df = self._price_frame(symbol)
+        if start is not None:
+            df = df[df.index >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df.index < pd.Timestamp(end)]
+        if start is None and end is None and len(df):
+            since = _period_start(df.index[-1], period)
+            if since is not None:
+                df = df[df.index > since]
+        return df.copy()
+
+    def ticker(self, symbol: str) -> ReplayTicker:
+        return ReplayTicker(self, symbol)
+
+    def irbank_html(self, code: str) -> str:
+        self._simulate("irbank")
+        path = os.path.join(self.root, "irbank", f"{_file_key(code)}.html")
+        if not os.path.exists(path):
+            raise DataSourceError(f"IRBANK page not recorded: {code}")
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def alpha_overview(self, symbol: str, api_key: str) -> Dict[str, Any]:
+        self._simulate("alpha")
+        path = os.path.join(self.root, "alpha", f"{_file_key(symbol)}.json")
+        if not os.path.exists(path):
+            raise DataSourceError(f"Alpha Vantage OVERVIEW not recorded: {symbol}")
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 記録
+# ═══════════════════════════════════════════════════════════════════════════
+
+class RecordingTicker:
+    """属性アクセスのたびに内側の Ticker の値を保存してから返す。"""
+
+    def __init__(self, source: "RecordingSource", symbol: str):
+        self._source = source
+        self._inner = source.inner.ticker(symbol)
+        self._key = _file_key(symbol)
+
+    def _write_json(self, kind: str, data: Any) -> None:
+        if isinstance(data, dict) or hasattr(data, "items"):
+            self._source._write(os.path.join(kind, f"{self._key}.json"),
+                                json.dumps(dict(data.items()), ensure_ascii=False, default=str))
+
+    @property
+    def info(self):
+        data = self._inner.info
+        self._write_json("info", data)
+        return data
+
+    @property
+    def fast_info(self):
+        data = self._inner.fast_info
+        try:
+            self._write_json("fast_info", {"market_cap": getattr(data, "market_cap", None)})
+        except Exception:
+            pass
+        return data
+
+    @property
+    def dividends(self):
+        data = self._inner.dividends
+        if isinstance(data, pd.Series):
+            path = self._source._path(os.path.join("dividends", f"{self._key}.csv"))
+            data.to_csv(path)
+        return data
+
+    def _statement(self, name: str):
+        data = getattr(self._inner, name)
+        if isinstance(data, pd.DataFrame):
+            path = self._source._path(os.path.join("statements", self._key, f"{name}.csv"))
+            data.to_csv(path)
+        return data
+
+    @property
+    def financials(self):
+        return self._statement("financials")
+
+    @property
+    def balance_sheet(self):
+        return self._statement("balance_sheet")
+
+    @property
+    def cashflow(self):
+        return self._statement("cashflow")
+
+
+class RecordingSource:
+    """inner（既定は LiveSource）を呼び、レスポンスを root へ保存する。"""
+
+    name = "record"
+
+    def __init__(self, root: str, inner=None):
+        self.root = root
+        self.inner = inner if inner is not None else LiveSource()
+        self._lock = threading.Lock()
+
+    def _path(self, rel: str) -> str:
+        path = os.path.join(self.root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def _write(self, rel: str, text: str) -> None:
+        with open(self._path(rel), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def download(self, symbol: str, **kwargs) -> pd.DataFrame:
+        df = self.inner.download(symbol, **kwargs)
+        if isinstance(df, pd.DataFrame) and not df.empty:
+            flat = _flatten_price_columns(df)
+            path = self._path(os.path.join("price", f"{_file_key(symbol)}.csv"))
+            with self._lock:
+                if os.path.exists(path):
+                    old = pd.read_csv(path, index_col=0, parse_dates=[0])
+                    flat = flat.combine_first(old)
+                flat.sort_index().to_csv(path, index_label="Date")
+        return df
+
+    def ticker(self, symbol: str) -> RecordingTicker:
+        return RecordingTicker(self, symbol)
+
+    def irbank_html(self, code: str) -> str:
+        text = self.inner.irbank_html(code)
+        self._write(os.path.join("irbank", f"{_file_key(code)}.html"), text)
+        return text
+
+    def alpha_overview(self, symbol: str, api_key: str) -> Dict[str, Any]:
+        data = self.inner.alpha_overview(symbol, api_key)
+        self._write(os.path.join("alpha", f"{_file_key(symbol)}.json"),
+                    json.dumps(data, ensure_ascii=False))
+        return data
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 選択
+# ═══════════════════════════════════════════════════════════════════════════
+
+def source_from_env(env: Optional[Dict[str, str]] = None):
+    """MARKET_DATA_SOURCE などの環境変数から取得元を作る。"""
+    env = os.environ if env is None else env
+    spec = env.get("MARKET_DATA_SOURCE", "live").strip()
+    kind, _, path = spec.partition(":")
+    if kind == "replay" and path:
+        return ReplaySource(
+            path,
+            latency_ms=float(env.get("MARKET_DATA_LATENCY_MS", 0) or 0),
+            jitter_ms=float(env.get("MARKET_DATA_JITTER_MS", 0) or 0),
+            failure_rate=float(env.get("MARKET_DATA_FAILURE_RATE", 0) or 0),
+        )
+    if kind == "record" and path:
+        return RecordingSource(path)
+    return LiveSource()
+
+
+_SOURCE = source_from_env()
+
+
+def get_source():
+    return _SOURCE
+
+
+def set_source(source) -> None:
+    global _SOURCE
+    _SOURCE = source
+
+
+@contextmanager
+def use_source(source) -> Iterator[Any]:
+    """with の間だけ取得元を差し替える（負荷試験・ベンチマーク用）。"""
+    previous = get_source()
+    set_source(source)
+    try:
+        yield source
+    finally:
+        set_source(previous)
@@ -0,0 +1,152 @@
+"""
+downsample.py
+────────────────────────────────────────────────────────────────────────────
+時系列チャートの間引き（サーバー側）
+
+【背景】
+  チャートのデータは Vega-Lite spec に埋め込まれてブラウザへ送られる。
+  D スコアの履歴を 5〜10 年に延ばすと日次の行数に比例して spec が膨らみ、
+  モバイル（iPhone）での描画が極端に遅くなる。
+
+【方式】
+  lttb   : Largest-Triangle-Three-Buckets。形状（山・谷）を保ったまま点数を減らす
+  minmax : バケットごとに最小・最大の2点を残す（振れ幅を確実に保つ）
+  none   : 間引かない
+
+  どちらの方式でも、呼び出し側が keep に渡した位置（最大DD日・MA交差など）と
+  両端は必ず残す。そのため結果の点数は budget をわずかに超えることがある。
+
+【設定】（環境変数）
+  CHART_POINT_BUDGET : 1系列あたりの目標点数（既定 600、0 で間引きなし）
+  CHART_DOWNSAMPLE   : lttb / minmax / none（既定 lttb）
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Iterable, Optional
+
+import numpy as np
+
+
+CHART_POINT_BUDGET = int(os.environ.get("CHART_POINT_BUDGET", 600))
+CHART_DOWNSAMPLE = os.environ.get("CHART_DOWNSAMPLE", "lttb").lower()
+
+METHODS = ("lttb", "minmax", "none")
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 間引き本体（残す位置のインデックスを返す）
+# ═══════════════════════════════════════════════════════════════════════════
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    LTTB で n_out 点を選ぶ。先頭・末尾は必ず含む。
+
+    x は単調増加（日付なら int64 の ns などに変換して渡す）。y の NaN は
+    三角形の面積が 0 になる（選ばれにくい）だけで、エラーにはしない。
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float), nan=0.0)
+
+    # 先頭・末尾を除いた n-2 点を n_out-2 個のバケットに分ける
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        # 次のバケットの平均点（最後のバケットは末尾の点）
+        nlo, nhi = edges[i + 1], (edges[i + 2] if i + 2 < len(edges) else n)
+        if nhi <= nlo:
+            nlo, nhi = n - 1, n
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+
+        ax, ay = x[a], y[a]
+        bx, by = x[lo:hi], y[lo:hi]
+        area = np.abs((ax - cx) * (by - ay) - (ax - bx) * (cy - ay))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """n_out // 2 個のバケットそれぞれで最小・最大の位置を残す。先頭・末尾も含む。"""
+    n = len(y)
+    buckets = n_out // 2
+    if n_out >= n or buckets < 1:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    picks = [0, n - 1]
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi <= lo:
+            continue
+        seg = y[lo:hi]
+        if np.isnan(seg).all():
+            picks.append(lo)
+            continue
+        picks.append(lo + int(np.nanargmin(seg)))
+        picks.append(lo + int(np.nanargmax(seg)))
+    return np.unique(picks)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 目印（必ず残す点）
+# ═══════════════════════════════════════════════════════════════════════════
+
+def crossing_indices(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """a と b の大小が入れ替わる位置（入れ替わりの前後2点）。"""
+    diff = np.sign(np.asarray(a, dtype=float) - np.asarray(b, dtype=float))
+    flips = np.flatnonzero(diff[1:] * diff[:-1] < 0)
+    return np.unique(np.concatenate([flips, flips + 1]))
+
+
+def extreme_indices(*series: np.ndarray) -> np.ndarray:
+    """各系列の最小・最大の位置。"""
+    picks = []
+    for s in series:
+        s = np.asarray(s, dtype=float)
+        if s.size and not np.isnan(s).all():
+            picks.extend([int(np.nanargmin(s)), int(np.nanargmax(s))])
+    return np.asarray(picks, dtype=np.int64)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# まとめ
+# ═══════════════════════════════════════════════════════════════════════════
+
+def downsample_indices(
+    x: np.ndarray,
+    y: np.ndarray,
+    budget: Optional[int] = None,
+    method: Optional[str] = None,
+    keep: Iterable[int] = (),
+) -> np.ndarray:
+    """
+    y（代表系列）を budget 点に間引いたときに残す位置（昇順・重複なし）。
+
+    keep の位置と両端は必ず含める。budget / method を省略すると
+    CHART_POINT_BUDGET / CHART_DOWNSAMPLE を使う。
+    """
+    n = len(y)
+    budget = CHART_POINT_BUDGET if budget is None else budget
+    method = CHART_DOWNSAMPLE if method is None else method
+    if method not in METHODS:
+        raise ValueError(f"未知の間引き方式です: {method}")
+    if method == "none" or budget <= 0 or n <= budget:
+        return np.arange(n)
+
+    if method == "lttb":
+        picked = lttb_indices(x, y, budget)
+    else:
+        picked = minmax_indices(y, budget)
+
+    extra = np.asarray([i for i in keep if 0 <= i < n], dtype=np.int64)
+    return np.unique(np.concatenate([picked, extra, [0, n - 1]]))
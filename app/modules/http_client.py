@@ -0,0 +1,182 @@
+"""
+http_client.py
+────────────────────────────────────────────────────────────────────────────
+共有 HTTP セッションとリトライポリシー
+
+【方針】
+  - requests.Session をプロセスで1つ共有する（コネクションプール + keep-alive）。
+    IRBANK / Alpha Vantage など同じホストへの連続アクセスで TCP/TLS を張り直さない
+  - Accept-Encoding: gzip, deflate を明示
+  - ホストごとの同時接続数を HOST_CONCURRENCY で制限する（BoundedSemaphore）
+  - リトライは RetryPolicy（指数バックオフ + フルジッター）に一本化。
+    yfinance の download / .info の再試行も同じポリシーを使う
+
+【リトライ対象】
+  http_get   : 接続エラー・タイムアウト・429・5xx（Retry-After があればそれに従う）
+  RetryPolicy.call : 任意の関数。例外または retry_if(result) が True のとき再試行
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Callable, Tuple, Type
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+DEFAULT_TIMEOUT = 10
+POOL_CONNECTIONS = 8           # プールするホスト数
+POOL_MAXSIZE = 8               # ホストあたりの保持コネクション数
+HOST_CONCURRENCY = 4           # ホストあたりの同時リクエスト数
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# リトライポリシー
+# ═══════════════════════════════════════════════════════════════════════════
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    指数バックオフ + フルジッター。
+
+    k 回目の失敗後の待ち時間 = uniform(0, min(max_delay, base_delay × multiplier^k))
+    """
+
+    attempts: int = 3
+    base_delay: float = 0.5
+    multiplier: float = 2.0
+    max_delay: float = 8.0
+
+    def backoff(self, failure_index: int, rng: Optional[random.Random] = None) -> float:
+        cap = min(self.max_delay, self.base_delay * (self.multiplier ** failure_index))
+        return (rng or random).uniform(0.0, cap)
+
+    def call(
+        self,
+        fn: Callable[[], Any],
+        retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+        retry_if: Optional[Callable[[Any], bool]] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> Any:
+        """
+        fn() を最大 attempts 回呼ぶ。
+
+        retry_on の例外 → 再試行（最後は送出）。
+        retry_if(result) が True → 再試行（最後はその結果を返す）。
+        """
+        for i in range(max(self.attempts, 1)):
+            last = i == self.attempts - 1
+            try:
+                result = fn()
+            except retry_on:
+                if last:
+                    raise
+                sleep(self.backoff(i))
+                continue
+            if retry_if is not None and retry_if(result) and not last:
+                sleep(self.backoff(i))
+                continue
+            return result
+        return None
+
+
+DEFAULT_RETRY = RetryPolicy()
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# セッション
+# ═══════════════════════════════════════════════════════════════════════════
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_host_limits: Dict[str, threading.BoundedSemaphore] = {}
+_host_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """プロセス共有の requests.Session（初回のみ作成）。"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                _session = session
+    return _session
+
+
+def _host_slot(url: str) -> threading.BoundedSemaphore:
+    host = urlsplit(url).netloc
+    with _host_lock:
+        sem = _host_limits.get(host)
+        if sem is None:
+            sem = _host_limits[host] = threading.BoundedSemaphore(HOST_CONCURRENCY)
+    return sem
+
+
+class RetryableHTTPError(requests.HTTPError):
+    """429 / 5xx。Retry-After（秒）があれば retry_after に入る。"""
+
+    def __init__(self, *args, retry_after: Optional[float] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.retry_after = retry_after
+
+
+def _retry_after(resp: requests.Response) -> Optional[float]:
+    value = resp.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def http_get(
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: float = DEFAULT_TIMEOUT,
+    policy: RetryPolicy = DEFAULT_RETRY,
+    sleep: Callable[[float], None] = time.sleep,
+) -> requests.Response:
+    """
+    共有セッションで GET する。2xx 以外は例外。
+
+    接続エラー・タイムアウト・429・5xx は policy に従って再試行する。
+    4xx（429 以外）は即座に送出する。
+    """
+    session = get_session()
+    slot = _host_slot(url)
+
+    for i in range(max(policy.attempts, 1)):
+        last = i == policy.attempts - 1
+        try:
+            with slot:
+                resp = session.get(url, params=params, headers=headers, timeout=timeout)
+            if resp.status_code in RETRY_STATUS:
+                raise RetryableHTTPError(
+                    f"{resp.status_code} for {url}", response=resp, retry_after=_retry_after(resp)
+                )
+            resp.raise_for_status()
+            return resp
+        except (requests.ConnectionError, requests.Timeout, RetryableHTTPError) as exc:
+            if last:
+                raise
+            wait = policy.backoff(i)
+            if isinstance(exc, RetryableHTTPError) and exc.retry_after is not None:
+                wait = min(exc.retry_after, policy.max_delay)
+            sleep(wait)
+    raise RuntimeError("unreachable")
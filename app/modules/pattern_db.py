@@ -35,18 +35,13 @@ pattern_db.py  (v3.2)
 from __future__ import annotations
 
 import math
-import os
 from typing import Optional, Dict, Any, List
 
+import numpy as np
 import pandas as pd
-import streamlit as st
 
+from modules import ref_data
 
-# ─── CSV パス ──────────────────────────────────────────────────────────────
-_DEFAULT_CSV_PATH = os.path.join(
-    os.path.dirname(__file__), "..", "data", "pattern_db_latest.csv"
-)
-PATTERN_DB_PATH = os.environ.get("PATTERN_DB_PATH", _DEFAULT_CSV_PATH)
 
 # 動的推定の距離閾値（これを超えたらUNK扱い）
 _DISTANCE_THRESHOLD = 3.5
@@ -57,27 +52,27 @@ _CONF_DOWNGRADE = {"HIGH": "MID", "MID": "LOW", "LOW": "NONE", "NONE": "NONE"}
 
 # ─── DB ロード ─────────────────────────────────────────────────────────────
 
-@st.cache_data(show_spinner=False)
 def load_pattern_db() -> pd.DataFrame:
-    """CSVを読み込んでDataFrameで返す（起動時1回のみ）。"""
-    path = PATTERN_DB_PATH
-    if not os.path.exists(path):
-        for candidate in [
-            "pattern_db_latest.csv",
-            "data/pattern_db_latest.csv",
-            "app/data/pattern_db_latest.csv",
-        ]:
-            if os.path.exists(candidate):
-                path = candidate
-                break
-        else:
-            return pd.DataFrame()
+    """
+    財務タイプ DB（modules.ref_data の pattern_db。1プロセス1回だけ読み込む）。
+
+    全呼び出しで同じ DataFrame を返すので変更しないこと。CSV が無ければ空。
+    """
+    db = ref_data.get("pattern_db")
+    return db if db is not None else pd.DataFrame()
 
-    df = pd.read_csv(path, encoding="utf-8-sig")
-    df["_ticker_set"] = df["ticker_list"].apply(
-        lambda x: set(str(x).replace('"', "").split(",")) if pd.notna(x) else set()
-    )
-    return df
+
+def _ticker_type_position(db: pd.DataFrame, candidates: set) -> Optional[int]:
+    """candidates のどれかを収録している最初の行（CSV 順）の位置。"""
+    if db is ref_data.get("pattern_db"):
+        index = ref_data.get("ticker_types")
+        hits = [index[c] for c in candidates if c in index]
+        return min(hits) if hits else None
+    # 呼び出し側が独自の DB を渡した場合は従来どおり走査する
+    for pos, tickers in enumerate(db["_ticker_set"].tolist()):
+        if tickers & candidates:
+            return pos
+    return None
 
 
 # ─── 内部ヘルパー ──────────────────────────────────────────────────────────
@@ -267,10 +262,11 @@ def classify_ticker(
     else:
         candidates.add(t_norm + ".T")
 
-    # ① 完全一致
-    for _, row in db.iterrows():
-        if row["_ticker_set"] & candidates:
-            return _build_type_dict(row, matched=True, confidence=str(row["confidence"]))
+    # ① 完全一致（既定の DB は ticker → 行番号の索引を引く）
+    pos = _ticker_type_position(db, candidates)
+    if pos is not None:
+        row = db.iloc[pos]
+        return _build_type_dict(row, matched=True, confidence=str(row["confidence"]))
 
     # ② 動的推定
     return _estimate_type(db, roe, roa, equity_ratio, interest_coverage, operating_margin)
@@ -436,39 +432,194 @@ def get_all_types_for_display(db: Optional[pd.DataFrame] = None) -> List[Dict[st
 # ══════════════════════════════════════════════════════════════════════════════
 
 import functools
-from pathlib import Path as _Path
 
 
 @functools.lru_cache(maxsize=1)
 def load_sector_db(path: str = None) -> "pd.DataFrame":
     """
-    sector_db_latest.csv を読み込んでキャッシュする（1プロセス1回のみI/O）。
-
-    探索順:
-      1. 引数 path が指定されていればそれを使う
-      2. このファイルの2階層上の data/ ディレクトリ
-      3. このファイルと同じディレクトリ
-      4. カレントディレクトリの data/
-      5. カレントディレクトリ直下
+    セクター DB。path 省略時は modules.ref_data の sector_db（1プロセス1回のみ）。
+
+    path を指定した場合はその CSV を読む。
+    """
+    if path is not None:
+        return pd.read_csv(path, encoding="utf-8-sig")
+    db = ref_data.get("sector_db")
+    if db is None:
+        raise FileNotFoundError(
+            "sector_db_latest.csv が見つかりません。\n"
+            "app/data/sector_db_latest.csv に配置するか、\n"
+            "load_sector_db(path='...') でパスを指定してください。"
+        )
+    return db
+
+
+# ─── セクター中央値テーブル ────────────────────────────────────────────────
+#
+# sector_db を呼び出しのたびにブールマスクで絞り込む代わりに、
+# ロード時に1回だけ「正規化セクター名 → 行番号」の索引と中央値配列を作る。
+# マッチング規則は従来どおり「完全一致 → 大文字小文字無視」で、
+# どちらも CSV 上で最初に現れた行を採用する。
+
+_SECTOR_MEDIAN_COLS = ("per_median", "pbr_median", "ev_ebitda_median")
+
+# V4 = PER/PBR を重視（各 40%）、EV/EBITDA は補助（20%）
+_SECTOR_V4_WEIGHTS = (0.40, 0.40, 0.20)
+
+_SECTOR_UNMATCHED_RESULT: Dict[str, Any] = {
+    "per_rel_score":       None,
+    "pbr_rel_score":       None,
+    "ev_ebitda_rel_score": None,
+    "per_vs_median":       "—",
+    "pbr_vs_median":       "—",
+    "ev_ebitda_vs_median": "—",
+    "sector_v_score":      50.0,
+    "sector_matched":      False,
+}
+
+
+def build_sector_median_table(sector_db: "pd.DataFrame") -> Dict[str, Any]:
     """
-    if path is None:
-        candidates = [
-            _Path(__file__).resolve().parent.parent / "data" / "sector_db_latest.csv",
-            _Path(__file__).resolve().parent / "sector_db_latest.csv",
-            _Path("data") / "sector_db_latest.csv",
-            _Path("sector_db_latest.csv"),
-        ]
-        for p in candidates:
-            if p.exists():
-                path = str(p)
-                break
-        if path is None:
-            raise FileNotFoundError(
-                "sector_db_latest.csv が見つかりません。\n"
-                "app/data/sector_db_latest.csv に配置するか、\n"
-                "load_sector_db(path='...') でパスを指定してください。"
-            )
-    return pd.read_csv(path, encoding="utf-8-sig")
+    sector_db からセクター中央値テーブルを作る。
+
+    Returns
+    -------
+    {
+        "exact":   {sector: 行番号},
+        "lower":   {sector.lower(): 行番号},
+        "names":   ndarray[str],
+        "medians": ndarray[n_sectors, 3]（per / pbr / ev_ebitda、欠損・0 は NaN）,
+    }
+    """
+    exact: Dict[str, int] = {}
+    lower: Dict[str, int] = {}
+    for pos, name in enumerate(sector_db["sector"].tolist()):
+        if not isinstance(name, str):
+            continue
+        exact.setdefault(name, pos)
+        lower.setdefault(name.lower(), pos)
+
+    medians = np.column_stack([
+        pd.to_numeric(sector_db[col], errors="coerce").to_numpy(dtype=float)
+        if col in sector_db.columns else np.full(len(sector_db), np.nan)
+        for col in _SECTOR_MEDIAN_COLS
+    ]) if len(sector_db) else np.empty((0, len(_SECTOR_MEDIAN_COLS)))
+    medians[medians == 0] = np.nan
+
+    return {
+        "exact":   exact,
+        "lower":   lower,
+        "names":   sector_db["sector"].astype(object).to_numpy(),
+        "medians": medians,
+    }
+
+
+def load_sector_median_table() -> Dict[str, Any]:
+    """既定の sector_db から作ったテーブル（modules.ref_data の sector_medians 索引）。"""
+    table = ref_data.get("sector_medians")
+    if table is None:
+        load_sector_db()   # FileNotFoundError
+    return table
+
+
+def _sector_position(table: Dict[str, Any], sector: Any) -> int:
+    """セクター名 → 行番号（未収録は -1）。"""
+    pos = table["exact"].get(sector) if isinstance(sector, str) else None
+    if pos is None:
+        pos = table["lower"].get(str(sector).lower(), -1)
+    return pos
+
+
+def _float_array(values, n: int) -> np.ndarray:
+    if values is None:
+        return np.full(n, np.nan)
+    try:
+        return np.array([np.nan if v is None else v for v in values], dtype=float)
+    except (TypeError, ValueError):
+        return np.asarray(pd.to_numeric(pd.Series(values, dtype=object), errors="coerce"), dtype=float)
+
+
+def _round1(values: np.ndarray) -> np.ndarray:
+    """Python の round と同じ丸め（NaN は NaN）。"""
+    return np.array([round(v, 1) for v in values.tolist()], dtype=float)
+
+
+def calc_sector_relative_scores_batch(
+    sectors,
+    per,
+    pbr,
+    ev_ebitda,
+    table: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    (sector, PER, PBR, EV/EBITDA) の配列から V4 相対スコアを一括計算する。
+
+    スコアは calc_sector_relative_scores_from_db と同一。
+    *_vs_median の文字列は作らない（表示行だけ sector_vs_median_texts で生成）。
+
+    Returns
+    -------
+    dict（全て長さ n の配列）:
+        per_rel_score / pbr_rel_score / ev_ebitda_rel_score（NaN = 算出不可）
+        sector_v_score（未収録・全指標欠損は 50.0）
+        sector_matched, sector_pos（-1 = 未収録）
+        per / pbr / ev_ebitda / medians（文字列生成用の入力）
+    """
+    if table is None:
+        table = load_sector_median_table()
+
+    sectors = list(sectors)
+    n = len(sectors)
+    pos = np.fromiter((_sector_position(table, s) for s in sectors), dtype=np.int64, count=n)
+    matched = pos >= 0
+
+    medians = np.full((n, len(_SECTOR_MEDIAN_COLS)), np.nan)
+    medians[matched] = table["medians"][pos[matched]]
+    actual = np.column_stack([_float_array(per, n), _float_array(pbr, n), _float_array(ev_ebitda, n)])
+
+    # actual / median 比で 0〜100 点化。中央値=50点。
+    rel = np.clip(50.0 - (actual / medians - 1.0) * 50.0, 0.0, 100.0)
+
+    valid = ~np.isnan(rel)
+    num = np.zeros(n)
+    den = np.zeros(n)
+    for k, wt in enumerate(_SECTOR_V4_WEIGHTS):
+        num = num + np.where(valid[:, k], rel[:, k] * wt, 0.0)
+        den = den + np.where(valid[:, k], wt, 0.0)
+    v4 = np.divide(num, den, out=np.full(n, 50.0), where=den > 0)
+
+    return {
+        "per_rel_score":       _round1(rel[:, 0]),
+        "pbr_rel_score":       _round1(rel[:, 1]),
+        "ev_ebitda_rel_score": _round1(rel[:, 2]),
+        "sector_v_score":      _round1(v4),
+        "sector_matched":      matched,
+        "sector_pos":          pos,
+        "actual":              actual,
+        "medians":             medians,
+    }
+
+
+def _vs_median_text(actual: float, median: float, unit: str = "x") -> str:
+    if np.isnan(actual):
+        return "—"
+    if np.isnan(median):
+        return f"{actual:.1f}{unit}"
+    diff_pct = (actual / median - 1) * 100
+    sign = "+" if diff_pct >= 0 else ""
+    return (f"{actual:.1f}{unit}"
+            f"（中央値 {median:.1f}{unit} / {sign}{diff_pct:.0f}%）")
+
+
+def sector_vs_median_texts(batch: Dict[str, Any], idx: int) -> Dict[str, str]:
+    """バッチ結果の1行分の *_vs_median 表示文字列を作る。"""
+    if not batch["sector_matched"][idx]:
+        return {"per_vs_median": "—", "pbr_vs_median": "—", "ev_ebitda_vs_median": "—"}
+    actual = batch["actual"][idx]
+    medians = batch["medians"][idx]
+    return {
+        f"{key}_vs_median": _vs_median_text(actual[k], medians[k])
+        for k, key in enumerate(("per", "pbr", "ev_ebitda"))
+    }
 
 
 def calc_sector_relative_scores_from_db(
@@ -483,6 +634,7 @@ def calc_sector_relative_scores_from_db(
 
     financial_type（収益構造の記述ラベル）には一切依存しない。
     sector は yfinance が返す英語名（例: "Consumer Cyclical"）をそのまま渡す。
+    計算は calc_sector_relative_scores_batch の1行版（中央値テーブルを引くだけ）。
 
     Returns  ── calc_sector_relative_scores と同一キー構造（UI側変更なし）
     -------
@@ -498,76 +650,23 @@ def calc_sector_relative_scores_from_db(
         "sector_matched":      bool,           # sector_db にヒットしたか
     }
     """
-    if sector_db is None:
-        sector_db = load_sector_db()
+    table = load_sector_median_table() if sector_db is None else build_sector_median_table(sector_db)
+    batch = calc_sector_relative_scores_batch([sector], [per], [pbr], [ev_ebitda], table=table)
 
-    # ── sector マッチング（完全一致 → 大文字小文字無視）──────────
-    row = sector_db[sector_db["sector"] == sector]
-    if row.empty:
-        row = sector_db[sector_db["sector"].str.lower() == str(sector).lower()]
-
-    if row.empty:
+    if not batch["sector_matched"][0]:
         # DB未収録（sector 空文字、米国株のマイナーセクター等）
-        return {
-            "per_rel_score":       None,
-            "pbr_rel_score":       None,
-            "ev_ebitda_rel_score": None,
-            "per_vs_median":       "—",
-            "pbr_vs_median":       "—",
-            "ev_ebitda_vs_median": "—",
-            "sector_v_score":      50.0,
-            "sector_name":         sector,
-            "sector_matched":      False,
-        }
-
-    row = row.iloc[0]
-
-    # ── スコア関数（低いほど割安な指標用）──────────────────────
-    def _score_lower_better(actual, median):
-        """actual / median 比で 0〜100 点化。中央値=50点。"""
-        if actual is None or median is None or float(median) == 0:
-            return None
-        rel   = float(actual) / float(median) - 1.0
-        score = 50.0 - rel * 50.0
-        return max(0.0, min(100.0, score))
+        return {**_SECTOR_UNMATCHED_RESULT, "sector_name": sector}
 
-    def _vs_text(actual, median, unit="x"):
-        if actual is None:
-            return "—"
-        if median is None or float(median) == 0:
-            return f"{actual:.1f}{unit}"
-        diff_pct = (float(actual) / float(median) - 1) * 100
-        sign = "+" if diff_pct >= 0 else ""
-        return (f"{actual:.1f}{unit}"
-                f"（中央値 {float(median):.1f}{unit} / {sign}{diff_pct:.0f}%）")
-
-    # ── 各指標の中央値を sector_db から取得してスコア化 ─────────
-    per_med = row.get("per_median")
-    pbr_med = row.get("pbr_median")
-    ev_med  = row.get("ev_ebitda_median")
-
-    per_rel = _score_lower_better(per,       per_med)
-    pbr_rel = _score_lower_better(pbr,       pbr_med)
-    ev_rel  = _score_lower_better(ev_ebitda, ev_med)
-
-    # ── V4 総合スコア（有効指標の加重平均）──────────────────────
-    # PER/PBR を重視（各 40%）、EV/EBITDA は補助（20%）
-    scored = [(per_rel, 0.40), (pbr_rel, 0.40), (ev_rel, 0.20)]
-    valid  = [(s, w) for s, w in scored if s is not None]
-    if valid:
-        total_w       = sum(w for _, w in valid)
-        sector_v_score = sum(s * w for s, w in valid) / total_w
-    else:
-        sector_v_score = 50.0
+    def _opt(key: str) -> Optional[float]:
+        v = batch[key][0]
+        return None if np.isnan(v) else float(v)
 
     return {
-        "per_rel_score":       round(per_rel, 1) if per_rel is not None else None,
-        "pbr_rel_score":       round(pbr_rel, 1) if pbr_rel is not None else None,
-        "ev_ebitda_rel_score": round(ev_rel,  1) if ev_rel  is not None else None,
-        "per_vs_median":       _vs_text(per,       per_med),
-        "pbr_vs_median":       _vs_text(pbr,       pbr_med),
-        "ev_ebitda_vs_median": _vs_text(ev_ebitda, ev_med),
-        "sector_v_score":      round(sector_v_score, 1),
-        "sector_name":         str(row.get("sector", sector)),
+        "per_rel_score":       _opt("per_rel_score"),
+        "pbr_rel_score":       _opt("pbr_rel_score"),
+        "ev_ebitda_rel_score": _opt("ev_ebitda_rel_score"),
+        **sector_vs_median_texts(batch, 0),
+        "sector_v_score":      float(batch["sector_v_score"][0]),
+        "sector_name":         str(table["names"][batch["sector_pos"][0]]),
         "sector_matched":      True,
     }
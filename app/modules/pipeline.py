@@ -0,0 +1,306 @@
+"""
+pipeline.py
+────────────────────────────────────────────────────────────────────────────
+ステージ依存グラフ（DAG）の小さな実行器
+
+【考え方】
+  各ステージは「入力キー → 関数 → 出力キー」を宣言するだけ。
+  実行器は入力が揃ったステージからスレッドプールへ投入するので、
+  互いに依存しないステージ（ベンチマーク取得・ファンダ取得・分類など）は
+  自動的に並行実行される。
+
+  - ステージ関数は入力キーと同名のキーワード引数を受け取り、
+    出力キーを持つ dict を返す
+  - ステージは phase でグループ化でき、execute(phase=...) でその phase だけを
+    実行できる。Streamlit ではスピナー表示をメインスレッドで行い、
+    ワーカースレッドからは st.* を呼ばない
+  - cache_ttl を持つステージは、入力から作ったキーで出力をキャッシュする
+    （StageCache、プロセス内共有。期限切れは set 時に捨て、件数は LRU で上限まで）。
+    キャッシュされた値は呼び出し側で
+    破壊的に変更しないこと。出力のどれかが None の結果はキャッシュしない
+  - 各ステージの所要時間・キャッシュヒットは PipelineRun に記録する。
+    各ステージは modules.tracing の span（"stage.<name>"）でも囲まれ、
+    ワーカースレッドへは呼び出し元の contextvars を引き継ぐ
+
+【例】
+  graph = Pipeline([
+      Stage("price", fetch_price, inputs=("ticker",), outputs=("price_data",), phase="fetch"),
+      Stage("bm",    fetch_bm,    inputs=("ticker",), outputs=("benchmark",),  phase="fetch"),
+      Stage("base",  assemble,    inputs=("price_data", "benchmark"), outputs=("base",)),
+  ])
+  run = graph.start({"ticker": "7203.T"})
+  run.execute(phase="fetch")
+  run.execute()            # 残り全部
+  run.values["base"], run.timings
+"""
+
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Tuple, Callable, Hashable
+
+from modules.tracing import span
+
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_STAGE_CACHE_ENTRIES = 256     # 1銘柄あたり price / yf_info / primary_fundamentals の3件 + ベンチマーク
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# ステージ定義
+# ═══════════════════════════════════════════════════════════════════════════
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    func: Callable[..., Any]
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    phase: Optional[str] = None
+    cache_ttl: Optional[float] = None                          # 秒。None ならキャッシュしない
+    cache_key: Optional[Callable[[Dict[str, Any]], Hashable]] = None   # 省略時は入力値そのもの
+    cache_shared: bool = True                                  # False ならプロセス内のみ（SharedStageCache）
+
+    def make_key(self, kwargs: Dict[str, Any]) -> Hashable:
+        if self.cache_key is not None:
+            return (self.name, self.cache_key(kwargs))
+        return (self.name, tuple(kwargs[k] for k in self.inputs))
+
+
+class StageCache:
+    """
+    ステージ出力の TTL 付きキャッシュ（スレッドセーフ、プロセス内）。
+
+    長時間動く Streamlit サーバーで銘柄ごとのエントリが溜まり続けないよう、
+    set のたびに期限切れ（set 時の ttl を過ぎたもの）を捨て、max_entries を超えたら
+    最後に使われたのが古い順に捨てる（LRU）。ttl を渡さないエントリは LRU でだけ消える。
+    get / set の shared は SharedStageCache 用（ここでは使わない）。
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_STAGE_CACHE_ENTRIES):
+        # key → (保存時刻 monotonic, 期限 monotonic or None, 出力)
+        self._data: "OrderedDict[Hashable, Tuple[float, Optional[float], Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, ttl: float, shared: bool = True) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            stored_at, _, outputs = hit
+            if time.monotonic() - stored_at > ttl:
+                return None
+            self._data.move_to_end(key)
+        return outputs
+
+    def set(
+        self,
+        key: Hashable,
+        outputs: Dict[str, Any],
+        ttl: Optional[float] = None,
+        shared: bool = True,
+    ) -> None:
+        self._put(key, time.monotonic(), ttl, outputs)
+
+    def _put(self, key: Hashable, stored_at: float, ttl: Optional[float], outputs: Dict[str, Any]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._data[key] = (stored_at, None if ttl is None else stored_at + ttl, outputs)
+            self._data.move_to_end(key)
+            expired = [k for k, (_, expires_at, _) in self._data.items() if expires_at is not None and expires_at < now]
+            for k in expired:
+                del self._data[k]
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class SharedStageCache(StageCache):
+    """
+    プロセス内の StageCache（L1、同じ上限つき）の後ろにホスト共有ストア（L2、modules.shared_cache.SharedCache）を置く。
+
+    L1 で外れたら L2 を引き、当たれば L1 にも入れる（保存時刻は L2 のものを引き継ぐので
+    TTL は延びない）。set は両方へ書く。shared=False のステージと、pickle できずに
+    L2 へ書けなかった出力は L1 だけに残る。clear は両方を消す。
+    """
+
+    def __init__(self, store, max_entries: int = DEFAULT_STAGE_CACHE_ENTRIES):
+        super().__init__(max_entries)
+        self.store = store
+
+    @staticmethod
+    def _store_key(key: Hashable) -> str:
+        return f"stage:{key!r}"
+
+    def get(self, key: Hashable, ttl: float, shared: bool = True) -> Optional[Dict[str, Any]]:
+        hit = super().get(key, ttl)
+        if hit is not None or not shared:
+            return hit
+        entry = self.store.lookup(self._store_key(key), ttl)
+        if entry is None:
+            return None
+        stored_at, outputs = entry
+        self._put(key, time.monotonic() - max(time.time() - stored_at, 0.0), ttl, outputs)
+        return outputs
+
+    def set(
+        self,
+        key: Hashable,
+        outputs: Dict[str, Any],
+        ttl: Optional[float] = None,
+        shared: bool = True,
+    ) -> None:
+        super().set(key, outputs, ttl)
+        if shared:
+            self.store.set(self._store_key(key), outputs, ttl)
+
+    def clear(self) -> None:
+        super().clear()
+        self.store.clear()
+
+
+def _default_stage_cache() -> StageCache:
+    """SHARED_CACHE_PATH が設定されていればホスト共有、なければプロセス内のキャッシュ。"""
+    from modules.shared_cache import shared_cache
+
+    store = shared_cache()
+    return SharedStageCache(store) if store is not None else StageCache()
+
+
+DEFAULT_STAGE_CACHE = _default_stage_cache()
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 実行
+# ═══════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class PipelineRun:
+    """1回の実行状態（値・所要時間・キャッシュヒット）。"""
+
+    pipeline: "Pipeline"
+    values: Dict[str, Any]
+    timings: Dict[str, float] = field(default_factory=dict)
+    cache_hits: List[str] = field(default_factory=list)
+    done: set = field(default_factory=set)
+
+    def execute(self, phase: Optional[str] = None) -> "PipelineRun":
+        """
+        未実行ステージを実行する。phase 指定時はその phase のステージだけ。
+
+        ステージの例外はそのまま呼び出し元へ送出する（実行中の他ステージの完了は待つ）。
+        """
+        self.pipeline._execute(self, phase)
+        return self
+
+    def total_time(self) -> float:
+        return sum(self.timings.values())
+
+
+class Pipeline:
+    """ステージの集合。start() で実行状態を作り、execute() で進める。"""
+
+    def __init__(
+        self,
+        stages: List[Stage],
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        cache: Optional[StageCache] = None,
+    ):
+        self.stages: Dict[str, Stage] = {}
+        producers: Dict[str, str] = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"ステージ名が重複しています: {stage.name}")
+            for out in stage.outputs:
+                if out in producers:
+                    raise ValueError(f"出力 {out} が {producers[out]} と {stage.name} で重複しています。")
+                producers[out] = stage.name
+            self.stages[stage.name] = stage
+        self.producers = producers
+        self.max_workers = max_workers
+        self.cache = cache if cache is not None else DEFAULT_STAGE_CACHE
+
+    def start(self, initial: Dict[str, Any]) -> PipelineRun:
+        return PipelineRun(pipeline=self, values=dict(initial))
+
+    def run(self, initial: Dict[str, Any]) -> PipelineRun:
+        """全ステージを実行する（バッチ用途のショートカット）。"""
+        return self.start(initial).execute()
+
+    # ── 内部 ──
+
+    def _run_stage(self, stage: Stage, kwargs: Dict[str, Any]) -> Tuple[Dict[str, Any], float, bool]:
+        started = time.perf_counter()
+        with span(f"stage.{stage.name}") as attrs:
+            key = None
+            if stage.cache_ttl is not None:
+                key = stage.make_key(kwargs)
+                cached = self.cache.get(key, stage.cache_ttl, shared=stage.cache_shared)
+                if cached is not None:
+                    attrs["cache_hit"] = True
+                    return cached, time.perf_counter() - started, True
+
+            result = stage.func(**kwargs)
+            missing = [k for k in stage.outputs if k not in result]
+            if missing:
+                raise KeyError(f"ステージ {stage.name} が出力 {missing} を返しませんでした。")
+            outputs = {k: result[k] for k in stage.outputs}
+
+            # None は取得失敗・該当なしの印。キャッシュすると TTL の間（共有キャッシュなら
+            # ホストの全プロセスで）失敗が固定されるので、次の実行で取り直す
+            if key is not None and all(v is not None for v in outputs.values()):
+                self.cache.set(key, outputs, ttl=stage.cache_ttl, shared=stage.cache_shared)
+        return outputs, time.perf_counter() - started, False
+
+    def _execute(self, run: PipelineRun, phase: Optional[str]) -> None:
+        pending = [
+            s for s in self.stages.values()
+            if s.name not in run.done and (phase is None or s.phase == phase)
+        ]
+        running: Dict[Any, Stage] = {}
+
+        def _ready(stage: Stage) -> bool:
+            return all(k in run.values for k in stage.inputs)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                for stage in [s for s in pending if _ready(s)]:
+                    pending.remove(stage)
+                    kwargs = {k: run.values[k] for k in stage.inputs}
+                    ctx = contextvars.copy_context()
+                    running[pool.submit(ctx.run, self._run_stage, stage, kwargs)] = stage
+
+                if not running:
+                    blocked = {s.name: [k for k in s.inputs if k not in run.values] for s in pending}
+                    raise RuntimeError(f"入力が揃わないステージがあります: {blocked}")
+
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                error: Optional[BaseException] = None
+                for fut in finished:
+                    stage = running.pop(fut)
+                    try:
+                        outputs, elapsed, hit = fut.result()
+                    except BaseException as exc:
+                        error = error or exc
+                        continue
+                    run.values.update(outputs)
+                    run.timings[stage.name] = elapsed
+                    if hit:
+                        run.cache_hits.append(stage.name)
+                    run.done.add(stage.name)
+
+                if error is not None:
+                    wait(list(running))
+                    raise error
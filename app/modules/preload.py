@@ -0,0 +1,268 @@
+"""
+preload.py
+────────────────────────────────────────────────────────────────────────────
+プロセス起動時のウォームスタート（参照データ・キャッシュの事前読み込み）
+
+【背景】
+  pattern_db / sector_db / TSE マスター / 業種別閾値 / コメント辞書は、
+  どれも最初に使われたときに読み込まれる。デプロイ直後やスケールアウト直後の
+  最初の分析だけが、CSV の読み込みと索引づくりの分だけ遅くなる。
+
+【ステップ】（上から順に実行。失敗しても次へ進み、結果に記録する）
+  ref_data   : 参照データバンドル（modules.ref_data）を開く。無ければ CSV モード
+  pattern_db : load_pattern_db
+  sector_db  : load_sector_db + セクター中央値テーブル
+  tse_master : TSE マスター（ticker → 業種。data_fetch._load_tse_master と同じ値）
+  thresholds : q_logic の業種別閾値（TSE / US。業種 → 閾値の解決表まで）
+  imports    : （任意）分析パイプライン（data_fetch / indicators …）・yfinance・bs4・altair・
+               コメント辞書（dict.dic1 / dic2）。1秒以上かかり、その間 GIL を握って
+               スキン選択画面の描画を遅らせるので既定では行わない（起動時 import の
+               遅延読み込みを打ち消さないため）
+  benchmarks : （任意）日経225 / S&P500 を benchmark / benchmark_raw ステージのキャッシュへ
+  tickers    : （任意）指定銘柄の fetch フェーズをステージキャッシュへ
+
+  各ステップは modules.tracing の "preload.<name>" スパンで計測する
+  （?debug=1 の分位点表にも出る）。
+
+【使い方】
+  サーバー内 : main.py が start_preload() を呼ぶ（1プロセス1回、バックグラウンドスレッド）
+  起動時確認 : app/ で python -m modules.preload [--imports] [--benchmarks] [--tickers 7203.T,AAPL]
+               ステップごとの所要時間を表示し、失敗があれば終了コード 1
+               （CSV の欠落などをトラフィックを受ける前に検出する）
+
+【設定】（環境変数）
+  PRELOAD            : 1 / 0（既定 1）。0 なら start_preload() は何もしない
+  PRELOAD_IMPORTS    : 1 / 0（既定 0）。重いモジュールの import も行う
+  PRELOAD_BENCHMARKS : 1 / 0（既定 0）。ネットワーク取得を伴う
+  PRELOAD_TICKERS    : カンマ区切りの銘柄（既定なし）。ネットワーク取得を伴う
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from modules.tracing import span
+
+
+PRELOAD_ENABLED = os.environ.get("PRELOAD", "1").lower() not in ("0", "false", "no")
+PRELOAD_IMPORTS = os.environ.get("PRELOAD_IMPORTS", "0").lower() in ("1", "true", "yes")
+PRELOAD_BENCHMARKS = os.environ.get("PRELOAD_BENCHMARKS", "0").lower() in ("1", "true", "yes")
+PRELOAD_TICKERS = tuple(t.strip() for t in os.environ.get("PRELOAD_TICKERS", "").split(",") if t.strip())
+
+# 分析ボタンを押したとき・チャートを初めて描くときに読み込まれるモジュール
+_WARM_IMPORTS = (
+    "modules.analysis_pipeline",
+    "yfinance",
+    "bs4",
+    "altair",
+    "dict.dic1",
+    "dict.dic2",
+)
+
+# benchmark ステージのキャッシュキーは市場のベンチマーク銘柄（^N225 / ^GSPC）。
+# それぞれに解決される代表銘柄で1回ずつ実行する
+_BENCHMARK_PROBES = ("7203.T", "AAPL")
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# ステップ
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _warm_imports() -> str:
+    for name in _WARM_IMPORTS:
+        importlib.import_module(name)
+    return f"{len(_WARM_IMPORTS)} modules"
+
+
+def _warm_ref_data() -> str:
+    from modules.ref_data import source_mode
+
+    return source_mode()
+
+
+def _warm_pattern_db() -> str:
+    from modules.pattern_db import load_pattern_db
+
+    return f"{len(load_pattern_db())} types"
+
+
+def _warm_sector_db() -> str:
+    from modules.pattern_db import load_sector_db, load_sector_median_table
+
+    load_sector_median_table()
+    return f"{len(load_sector_db())} sectors"
+
+
+def _warm_tse_master() -> str:
+    # data_fetch._load_tse_master と同じ値。data_fetch（requests など）は import しない
+    from modules.ref_data import get
+
+    return f"{len(get('tse_master'))} tickers"
+
+
+def _warm_thresholds() -> str:
+    from modules.q_logic import _load_threshold_db_tse, _load_threshold_db_us
+
+    return f"tse={len(_load_threshold_db_tse())} us={len(_load_threshold_db_us())}"
+
+
+def _warm_benchmarks() -> str:
+    from modules.analysis_pipeline import ANALYSIS_PIPELINE
+    from modules.pipeline import Pipeline
+
+    stages = ANALYSIS_PIPELINE.stages
+    only = Pipeline([stages["benchmark"], stages["benchmark_raw"]], cache=ANALYSIS_PIPELINE.cache)
+    fetched = []
+    for ticker in _BENCHMARK_PROBES:
+        bm = only.run({"ticker": ticker}).values["benchmark"]
+        if bm is not None:
+            fetched.append(bm["ticker"])
+    return ", ".join(fetched) or "none"
+
+
+def _warm_tickers(tickers: Sequence[str]) -> str:
+    from modules.analysis_pipeline import ANALYSIS_PIPELINE
+
+    ok = 0
+    for ticker in tickers:
+        try:
+            ANALYSIS_PIPELINE.start({"ticker": ticker}).execute("fetch")
+            ok += 1
+        except Exception:
+            pass
+    return f"{ok}/{len(tickers)} tickers"
+
+
+# 参照データ（ネットワークなし）
+REFERENCE_STEPS: Dict[str, Callable[[], str]] = {
+    "ref_data":   _warm_ref_data,
+    "pattern_db": _warm_pattern_db,
+    "sector_db":  _warm_sector_db,
+    "tse_master": _warm_tse_master,
+    "thresholds": _warm_thresholds,
+}
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 実行
+# ═══════════════════════════════════════════════════════════════════════════
+
+def preload(
+    imports: Optional[bool] = None,
+    benchmarks: Optional[bool] = None,
+    tickers: Optional[Sequence[str]] = None,
+    log: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """
+    参照データを読み込み、任意で重いモジュールの import・ベンチマーク・銘柄のキャッシュを温める。
+
+    imports / benchmarks / tickers を省略すると PRELOAD_IMPORTS / PRELOAD_BENCHMARKS /
+    PRELOAD_TICKERS を使う。
+
+    Returns
+    -------
+    {
+        "ok":      bool（全ステップ成功）,
+        "total_s": float,
+        "steps":   [{"name", "seconds", "ok", "detail"}],
+    }
+    """
+    imports = PRELOAD_IMPORTS if imports is None else imports
+    benchmarks = PRELOAD_BENCHMARKS if benchmarks is None else benchmarks
+    tickers = PRELOAD_TICKERS if tickers is None else tuple(tickers)
+
+    steps: Dict[str, Callable[[], str]] = dict(REFERENCE_STEPS)
+    if imports:
+        steps["imports"] = _warm_imports
+    if benchmarks:
+        steps["benchmarks"] = _warm_benchmarks
+    if tickers:
+        steps["tickers"] = lambda: _warm_tickers(tickers)
+
+    rows: List[Dict[str, Any]] = []
+    started = time.perf_counter()
+    for name, func in steps.items():
+        t0 = time.perf_counter()
+        try:
+            with span(f"preload.{name}"):
+                detail, ok = func(), True
+        except Exception as exc:
+            detail, ok = f"{type(exc).__name__}: {exc}", False
+        row = {"name": name, "seconds": round(time.perf_counter() - t0, 4), "ok": ok, "detail": detail}
+        rows.append(row)
+        if log is not None:
+            log(f"{name:<11} {row['seconds'] * 1000:9.1f} ms  {'ok ' if ok else 'NG '} {detail}")
+
+    return {
+        "ok": all(r["ok"] for r in rows),
+        "total_s": round(time.perf_counter() - started, 4),
+        "steps": rows,
+    }
+
+
+# ─── サーバー内（バックグラウンド） ────────────────────────────────────────
+
+_lock = threading.Lock()
+_started = False
+_report: Optional[Dict[str, Any]] = None
+
+
+def _run_in_background() -> None:
+    global _report
+    _report = preload()
+
+
+def start_preload() -> bool:
+    """
+    プロセスで最初の1回だけ、バックグラウンドスレッドで preload() を始める。
+
+    描画はブロックしない。始めたとき True、既に開始済み・無効化時は False。
+    """
+    global _started
+    if not PRELOAD_ENABLED:
+        return False
+    with _lock:
+        if _started:
+            return False
+        _started = True
+    threading.Thread(target=_run_in_background, name="preload", daemon=True).start()
+    return True
+
+
+def preload_status() -> Optional[Dict[str, Any]]:
+    """直近の preload() の結果。未開始は None、実行中は {"running": True}。"""
+    if _report is not None:
+        return _report
+    return {"running": True} if _started else None
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# CLI
+# ═══════════════════════════════════════════════════════════════════════════
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="参照データ・キャッシュの事前読み込み（所要時間を表示）")
+    parser.add_argument("--imports", action="store_true", help="分析パイプライン・yfinance・altair なども import する")
+    parser.add_argument("--benchmarks", action="store_true", help="ベンチマーク（^N225 / ^GSPC）も取得する")
+    parser.add_argument("--tickers", default="", help="fetch フェーズを温める銘柄（カンマ区切り）")
+    args = parser.parse_args(argv)
+
+    tickers = [t.strip() for t in args.tickers.split(",") if t.strip()]
+    report = preload(
+        imports=args.imports or PRELOAD_IMPORTS,
+        benchmarks=args.benchmarks or PRELOAD_BENCHMARKS,
+        tickers=tickers or PRELOAD_TICKERS,
+        log=print,
+    )
+    print(f"total       {report['total_s'] * 1000:9.1f} ms  {'ok' if report['ok'] else 'FAILED'}")
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
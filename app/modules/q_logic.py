@@ -22,21 +22,55 @@ Q（ビジネスの質）スコア — 業種別閾値CSV対応版
 
 from __future__ import annotations
 
-import os
+import operator
+import threading
 from dataclasses import dataclass
-from typing import Optional, Tuple, List, Dict, Any
+from functools import lru_cache
+from typing import Optional, Tuple, List, Dict, Any, Callable, Sequence
 
+import numpy as np
 import pandas as pd
 
+from modules import ref_data
+
 
 # ─── 閾値DB ────────────────────────────────────────────────────────────────
+#
+# 参照データ（modules.ref_data）はロード時に1回だけ以下へコンパイルする:
+#   _THRESHOLD_DB_*     : 生キー → 閾値（完全一致用）
+#   _THRESHOLD_LOWER_*  : (小文字キー, 閾値) のタプル（部分一致スキャン用、CSV順）
+#   _TSE_RESOLUTION     : 業種文字列 → 解決済み閾値（None = 標準基準）
+#                         tse_master_latest.csv の全業種分は modules.ref_data の
+#                         tse_resolution 索引から読み込み、未知の文字列は初回解決時に追記する
+#                         （追記は _RESOLUTION_EXTRA_MAX 件まで。超えたら毎回スキャン）
+#   _US_RESOLUTION      : (sector, industry) → 解決済み閾値（同じく追記は上限つき）
+#
+# パイプラインのワーカースレッドから同時に呼ばれるので、3つは手元で組み立ててから
+# _THRESHOLD_LOCK の中でまとめて公開する（_THRESHOLD_DB_* が最後。None でなければ揃っている）。
 
 _THRESHOLD_DB_TSE: Optional[Dict[str, Dict]] = None
 _THRESHOLD_DB_US: Optional[Dict[str, Dict]] = None
+_THRESHOLD_LOWER_TSE: Tuple[Tuple[str, Dict], ...] = ()
+_THRESHOLD_LOWER_US: Tuple[Tuple[str, Dict], ...] = ()
+_TSE_RESOLUTION: Dict[str, Optional[Dict]] = {}
+_US_RESOLUTION: Dict[Tuple[str, str], Optional[Dict]] = {}
+_TSE_RESOLUTION_LIMIT = 0
+_US_RESOLUTION_LIMIT = 0
+_THRESHOLD_LOCK = threading.Lock()
+
+_RESOLUTION_EXTRA_MAX = 1024
+
+# CSV が見つからない場合は空 DB（= 全業種で標準基準）
+_BUILTIN_TSE: Dict[str, Dict] = {}
+_BUILTIN_US: Dict[str, Dict] = {}
 
 _DEFAULT_ER_THR = 10.0
 _DEFAULT_IC_THR = 1.5
 
+_DEFAULT_THRESHOLDS: Dict[str, Any] = {
+    "er": _DEFAULT_ER_THR, "ic": _DEFAULT_IC_THR, "note": "標準基準", "custom": False,
+}
+
 
 def _load_csv_to_dict(path: str, key_col: str) -> Dict[str, Dict]:
     df = pd.read_csv(path, encoding="utf-8-sig")
@@ -50,74 +84,117 @@ def _load_csv_to_dict(path: str, key_col: str) -> Dict[str, Dict]:
         if pd.notna(row.get(key_col))
     }
 
-def _find_file(filenames: list) -> Optional[str]:
-    try:
-        base = os.path.dirname(os.path.abspath(__file__))
-        rel_data = os.path.normpath(os.path.join(base, "..", "data"))
-    except Exception:
-        rel_data = None
-
-    for name in filenames:
-        candidates = []
-        if rel_data:
-            candidates.append(os.path.join(rel_data, name))
-        candidates += [
-            os.path.join("app", "data", name),
-            os.path.join("data", name),
-            name,
-        ]
-        for p in candidates:
-            if os.path.exists(p):
-                return os.path.abspath(p)
-    return None
+def _compile_lower(db: Dict[str, Dict]) -> Tuple[Tuple[str, Dict], ...]:
+    return tuple((key.lower(), {**val, "custom": True}) for key, val in db.items())
 
 
 def _load_threshold_db_tse() -> Dict[str, Dict]:
-    global _THRESHOLD_DB_TSE
+    global _THRESHOLD_DB_TSE, _THRESHOLD_LOWER_TSE, _TSE_RESOLUTION, _TSE_RESOLUTION_LIMIT
     if _THRESHOLD_DB_TSE is not None:
         return _THRESHOLD_DB_TSE
-    path = _find_file(["industry_thresholds.csv"])
-    try:
-        _THRESHOLD_DB_TSE = _load_csv_to_dict(path, "industry") if path else _BUILTIN_TSE
-    except Exception:
-        _THRESHOLD_DB_TSE = _BUILTIN_TSE
+    with _THRESHOLD_LOCK:
+        if _THRESHOLD_DB_TSE is not None:
+            return _THRESHOLD_DB_TSE
+        db = ref_data.get("thresholds_tse")
+        if db:
+            # TSE マスターの全業種は参照データの索引（tse_resolution）で解決済み
+            resolution = dict(ref_data.get("tse_resolution"))
+        else:
+            # 組み込みの空 DB では索引が使っている閾値と合わないので、毎回の解決に任せる
+            db, resolution = _BUILTIN_TSE, {}
+        _THRESHOLD_LOWER_TSE = _compile_lower(db)
+        _TSE_RESOLUTION = resolution
+        _TSE_RESOLUTION_LIMIT = len(resolution) + _RESOLUTION_EXTRA_MAX
+        _THRESHOLD_DB_TSE = db
     return _THRESHOLD_DB_TSE
 
 
 def _load_threshold_db_us() -> Dict[str, Dict]:
-    global _THRESHOLD_DB_US
+    global _THRESHOLD_DB_US, _THRESHOLD_LOWER_US, _US_RESOLUTION, _US_RESOLUTION_LIMIT
     if _THRESHOLD_DB_US is not None:
         return _THRESHOLD_DB_US
-    path = _find_file(["industry_thresholds_us.csv"])
-    try:
-        _THRESHOLD_DB_US = _load_csv_to_dict(path, "sector") if path else _BUILTIN_US
-    except Exception:
-        _THRESHOLD_DB_US = _BUILTIN_US
+    with _THRESHOLD_LOCK:
+        if _THRESHOLD_DB_US is not None:
+            return _THRESHOLD_DB_US
+        db = ref_data.get("thresholds_us") or _BUILTIN_US
+        _THRESHOLD_LOWER_US = _compile_lower(db)
+        _US_RESOLUTION = {}
+        _US_RESOLUTION_LIMIT = _RESOLUTION_EXTRA_MAX
+        _THRESHOLD_DB_US = db
     return _THRESHOLD_DB_US
 
 
+def _scan_tse_in(db: Dict[str, Dict], lower: Tuple[Tuple[str, Dict], ...], key: str) -> Optional[Dict]:
+    """TSE: 完全一致 → 双方向の部分一致（CSV順で最初にヒットしたもの）。"""
+    if not key:
+        return None
+    if key in db:
+        return {**db[key], "custom": True}
+    key_lower = key.lower()
+    for db_key, val in lower:
+        if key_lower in db_key or db_key in key_lower:
+            return val
+    return None
+
+
+def _scan_tse(key: str) -> Optional[Dict]:
+    return _scan_tse_in(_THRESHOLD_DB_TSE, _THRESHOLD_LOWER_TSE, key)
+
+
+def resolve_tse_industries(db: Dict[str, Dict], industries: Sequence[str]) -> Dict[str, Optional[Dict]]:
+    """業種文字列の一覧 → 解決済み閾値（modules.ref_data の tse_resolution 索引を作る）。"""
+    lower = _compile_lower(db)
+    resolved: Dict[str, Optional[Dict]] = {}
+    for industry in industries:
+        key = industry.strip()
+        if key not in resolved:
+            resolved[key] = _scan_tse_in(db, lower, key)
+    return resolved
+
+
+def _scan_us(sector_key: str, industry_key: str) -> Optional[Dict]:
+    """US: sector 完全一致。sector が空のときだけ industry への部分一致を試す。"""
+    if sector_key:
+        val = _THRESHOLD_DB_US.get(sector_key)
+        return {**val, "custom": True} if val is not None else None
+    if not industry_key:
+        return None
+    industry_lower = industry_key.lower()
+    for db_key, val in _THRESHOLD_LOWER_US:
+        if db_key in industry_lower:
+            return val
+    return None
+
+
+def _resolve(cache: Dict, limit: int, key: Any, scan: Callable[[], Optional[Dict]]) -> Optional[Dict]:
+    """cache にあればそれ、無ければ scan して limit 件までは cache に追記する。"""
+    try:
+        return cache[key]
+    except KeyError:
+        pass
+    resolved = scan()
+    if len(cache) < limit:
+        cache[key] = resolved
+    return resolved
+
+
 def get_thresholds(industry: str, sector: str = "", is_us: bool = False) -> Dict[str, Any]:
+    """
+    業種別の自己資本比率 / IC 閾値を返す（呼び出し側で変更してよいコピー）。
+
+    解決結果は _TSE_RESOLUTION / _US_RESOLUTION に保持し（上限つき）、
+    2回目以降は辞書引き1回で返す。
+    """
     if is_us:
-        db = _load_threshold_db_us()
-        key = (sector or "").strip()
-        if key and key in db:
-            return {**db[key], "custom": True}
-        if not key:
-            key = (industry or "").strip()
-            for db_key, val in db.items():
-                if key and db_key.lower() in key.lower():
-                    return {**val, "custom": True}
+        _load_threshold_db_us()
+        cache_key = ((sector or "").strip(), "" if (sector or "").strip() else (industry or "").strip())
+        resolved = _resolve(_US_RESOLUTION, _US_RESOLUTION_LIMIT, cache_key, lambda: _scan_us(*cache_key))
     else:
-        db = _load_threshold_db_tse()
+        _load_threshold_db_tse()
         key = (industry or "").strip()
-        if key and key in db:
-            return {**db[key], "custom": True}
-        for db_key, val in db.items():
-            if key and (key.lower() in db_key.lower() or db_key.lower() in key.lower()):
-                return {**val, "custom": True}
-
-    return {"er": _DEFAULT_ER_THR, "ic": _DEFAULT_IC_THR, "note": "標準基準", "custom": False}
+        resolved = _resolve(_TSE_RESOLUTION, _TSE_RESOLUTION_LIMIT, key, lambda: _scan_tse(key))
 
+    return dict(resolved if resolved is not None else _DEFAULT_THRESHOLDS)
 
 # ─── 重み ──────────────────────────────────────────────────────────────────
 
@@ -192,38 +269,114 @@ def _build_qweights(
 
 # ─── 業種判定 ──────────────────────────────────────────────────────────────
 
+_FINANCIAL_KEYWORDS: Tuple[str, ...] = (
+    "bank", "banks",
+    "insurance",
+    "capital markets",
+    "asset management",
+    "credit services",
+    "mortgage finance",
+    "financial conglomerates",
+    "financial services",
+    "securities",
+    "leasing",
+    "rental & leasing",
+)
+
+_BANK_KEYWORDS: Tuple[str, ...] = (
+    "bank", "banks",
+    "regional bank",
+    "regional banks",
+    "diversified bank",
+    "diversified banks",
+)
+
+
+@lru_cache(maxsize=4096)
 def _is_financial_industry(industry: str = "", sector: str = "") -> bool:
-    ind = (industry or "").lower()
-    sec = (sector or "").lower()
-    text = f"{ind} {sec}"
-    keywords = [
-        "bank", "banks",
-        "insurance",
-        "capital markets",
-        "asset management",
-        "credit services",
-        "mortgage finance",
-        "financial conglomerates",
-        "financial services",
-        "securities",
-        "leasing",
-        "rental & leasing",
-    ]
-    return any(k in text for k in keywords)
+    text = f"{(industry or '').lower()} {(sector or '').lower()}"
+    return any(k in text for k in _FINANCIAL_KEYWORDS)
 
 
+@lru_cache(maxsize=4096)
 def _is_bank_industry(industry: str = "", sector: str = "") -> bool:
-    ind = (industry or "").lower()
-    sec = (sector or "").lower()
-    text = f"{ind} {sec}"
-    bank_keywords = [
-        "bank", "banks",
-        "regional bank",
-        "regional banks",
-        "diversified bank",
-        "diversified banks",
-    ]
-    return any(k in text for k in bank_keywords)
+    text = f"{(industry or '').lower()} {(sector or '').lower()}"
+    return any(k in text for k in _BANK_KEYWORDS)
+
+
+# ─── 段階表 ────────────────────────────────────────────────────────────────
+#
+# (比較, 境界, 値) を上から順に評価し、最初に成立した行の値を返す。
+# どれも成立しなければ default。スカラー版（_step）とバッチ版（_step_batch）
+# で同じ表を使うため、境界を変えるときはここだけ直せばよい。
+
+_Ladder = Tuple[Tuple[Tuple[Callable, float, float], ...], float]
+
+_LE, _LT, _GT = operator.le, operator.lt, operator.gt
+
+_LADDER_ROE_GENERAL: _Ladder = ((
+    (_LE, 0, 0.00), (_LT, 5, 0.20), (_LT, 10, 0.40), (_LT, 15, 0.60),
+    (_LT, 20, 0.80), (_LT, 25, 0.90),
+), 1.00)
+_LADDER_ROA_GENERAL: _Ladder = ((
+    (_LE, 0, 0.00), (_LT, 2, 0.20), (_LT, 4, 0.40), (_LT, 6, 0.60), (_LT, 8, 0.80),
+), 1.00)
+_LADDER_OPM_GENERAL: _Ladder = ((
+    (_LE, 0, 0.00), (_LT, 3, 0.20), (_LT, 7, 0.40), (_LT, 12, 0.60), (_LT, 20, 0.80),
+), 1.00)
+
+_LADDER_ROE_BANK: _Ladder = ((
+    (_LE, 0, 0.00), (_LT, 3, 0.20), (_LT, 5, 0.35), (_LT, 8, 0.50),
+    (_LT, 10, 0.65), (_LT, 12, 0.80), (_LT, 15, 0.90),
+), 1.00)
+_LADDER_ROA_BANK: _Ladder = ((
+    (_LE, 0, 0.00), (_LT, 0.10, 0.15), (_LT, 0.20, 0.30), (_LT, 0.30, 0.45),
+    (_LT, 0.40, 0.60), (_LT, 0.50, 0.72), (_LT, 0.60, 0.82), (_LT, 0.80, 0.90),
+), 1.00)
+_LADDER_OPM_BANK: _Ladder = ((
+    (_LE, 0, 0.00), (_LT, 5, 0.25), (_LT, 10, 0.40), (_LT, 20, 0.55),
+    (_LT, 30, 0.70), (_LT, 40, 0.82),
+), 0.90)
+
+# 自己資本比率 / 閾値 の倍率
+_LADDER_ER_GENERAL: _Ladder = ((
+    (_LT, 1.0, 0.000), (_LT, 2.0, 0.125), (_LT, 3.0, 0.250), (_LT, 4.0, 0.500),
+    (_LT, 5.0, 0.750), (_LT, 6.0, 0.875),
+), 1.000)
+_LADDER_ER_FINANCIAL: _Ladder = ((
+    (_LT, 1.0, 0.000), (_LT, 1.25, 0.350), (_LT, 1.50, 0.500), (_LT, 2.00, 0.650),
+    (_LT, 2.50, 0.800), (_LT, 3.00, 0.900),
+), 1.000)
+# 銀行Q3: 自己資本比率そのもの（er_thr 未満は別途 0 点）
+_LADDER_ER_BANK: _Ladder = ((
+    (_LT, 4.2, 28.0), (_LT, 4.5, 38.0), (_LT, 5.0, 50.0), (_LT, 5.5, 65.0),
+    (_LT, 6.0, 75.0), (_LT, 7.0, 85.0), (_LT, 8.0, 92.0),
+), 100.0)
+
+_LADDER_DE: _Ladder = ((
+    (_GT, 3.0, 0.000), (_GT, 2.0, 0.167), (_GT, 1.5, 0.333), (_GT, 1.0, 0.500),
+    (_GT, 0.5, 0.733),
+), 1.000)
+# IC / 閾値 の倍率
+_LADDER_IC: _Ladder = ((
+    (_LT, 1.0, 0.000), (_LT, 2.0, 0.267), (_LT, 3.0, 0.500), (_LT, 6.0, 0.733),
+    (_LT, 13.0, 0.900),
+), 1.000)
+
+_BANK_Q3_WEIGHT_FACTOR = 0.8
+_BANK_OPM_WEIGHT_FACTOR = 0.25
+
+# ROE による自己資本比率閾値の緩和（Q3）とノックアウト軽減
+_HIGH_ROE_THRESHOLD = 50.0         # ROE ≥ 50%：高収益レバレッジとみなす基準
+_VERY_HIGH_ROE_THRESHOLD = 100.0   # ROE ≥ 100%：超高収益（Apple等）
+
+
+def _step(x: float, ladder: _Ladder) -> float:
+    rules, default = ladder
+    for op, edge, value in rules:
+        if op(x, edge):
+            return value
+    return default
 
 
 # ─── Q1: 一般業種 ──────────────────────────────────────────────────────────
@@ -237,38 +390,13 @@ def _score_q1_abs_general(
     raw = 0.0
 
     if roe is not None:
-        r = (
-            0.00 if roe <= 0 else
-            0.20 if roe < 5 else
-            0.40 if roe < 10 else
-            0.60 if roe < 15 else
-            0.80 if roe < 20 else
-            0.90 if roe < 25 else
-            1.00
-        )
-        raw += w.roe_w * r
+        raw += w.roe_w * _step(roe, _LADDER_ROE_GENERAL)
 
     if roa is not None:
-        r = (
-            0.00 if roa <= 0 else
-            0.20 if roa < 2 else
-            0.40 if roa < 4 else
-            0.60 if roa < 6 else
-            0.80 if roa < 8 else
-            1.00
-        )
-        raw += w.roa_w * r
+        raw += w.roa_w * _step(roa, _LADDER_ROA_GENERAL)
 
     if operating_margin is not None:
-        r = (
-            0.00 if operating_margin <= 0 else
-            0.20 if operating_margin < 3 else
-            0.40 if operating_margin < 7 else
-            0.60 if operating_margin < 12 else
-            0.80 if operating_margin < 20 else
-            1.00
-        )
-        raw += w.opm_w * r
+        raw += w.opm_w * _step(operating_margin, _LADDER_OPM_GENERAL)
 
     max_raw = w.roe_w + w.roa_w + w.opm_w
     return 0.0 if max_raw == 0 else max(0.0, min(100.0, raw / max_raw * 100.0))
@@ -294,48 +422,18 @@ def _score_q1_abs_bank(
 
     # ROE: 銀行向け
     if roe is not None:
-        r = (
-            0.00 if roe <= 0 else
-            0.20 if roe < 3 else
-            0.35 if roe < 5 else
-            0.50 if roe < 8 else
-            0.65 if roe < 10 else
-            0.80 if roe < 12 else
-            0.90 if roe < 15 else
-            1.00
-        )
-        raw += w.roe_w * r
+        raw += w.roe_w * _step(roe, _LADDER_ROE_BANK)
         max_raw += w.roe_w
 
     # ROA: 銀行専用レンジ
     if roa is not None:
-        r = (
-            0.00 if roa <= 0 else
-            0.15 if roa < 0.10 else
-            0.30 if roa < 0.20 else
-            0.45 if roa < 0.30 else
-            0.60 if roa < 0.40 else
-            0.72 if roa < 0.50 else
-            0.82 if roa < 0.60 else
-            0.90 if roa < 0.80 else
-            1.00
-        )
-        raw += w.roa_w * r
+        raw += w.roa_w * _step(roa, _LADDER_ROA_BANK)
         max_raw += w.roa_w
 
     # 営業利益率: さらに軽くする（従来 0.50倍 → 今回 0.25倍）
-    bank_opm_weight = w.opm_w * 0.25
+    bank_opm_weight = w.opm_w * _BANK_OPM_WEIGHT_FACTOR
     if operating_margin is not None:
-        r = (
-            0.00 if operating_margin <= 0 else
-            0.25 if operating_margin < 5 else
-            0.40 if operating_margin < 10 else
-            0.55 if operating_margin < 20 else
-            0.70 if operating_margin < 30 else
-            0.82 if operating_margin < 40 else
-            0.90
-        )
-        raw += bank_opm_weight * r
+        raw += bank_opm_weight * _step(operating_margin, _LADDER_OPM_BANK)
         max_raw += bank_opm_weight
 
     return 0.0 if max_raw == 0 else max(0.0, min(100.0, raw / max_raw * 100.0))
@@ -358,15 +456,7 @@ def _score_q1_abs(
 
 def _score_er_general(equity_ratio: float, er_thr: float) -> float:
     ratio = equity_ratio / er_thr if er_thr > 0 else 0
-    return (
-        0.000 if ratio < 1.0 else
-        0.125 if ratio < 2.0 else
-        0.250 if ratio < 3.0 else
-        0.500 if ratio < 4.0 else
-        0.750 if ratio < 5.0 else
-        0.875 if ratio < 6.0 else
-        1.000
-    )
+    return _step(ratio, _LADDER_ER_GENERAL)
 
 
 def _score_er_financial(
@@ -376,15 +466,7 @@ def _score_er_financial(
     sector: str = "",
 ) -> float:
     ratio = equity_ratio / er_thr if er_thr > 0 else 0
-    return (
-        0.000 if ratio < 1.0 else
-        0.350 if ratio < 1.25 else
-        0.500 if ratio < 1.50 else
-        0.650 if ratio < 2.00 else
-        0.800 if ratio < 2.50 else
-        0.900 if ratio < 3.00 else
-        1.000
-    )
+    return _step(ratio, _LADDER_ER_FINANCIAL)
 
 
 # ─── Q3: 銀行専用 ──────────────────────────────────────────────────────────
@@ -392,7 +474,7 @@ def _score_er_financial(
 def _score_q3_abs_bank(
     equity_ratio: Optional[float],
     er_thr: float = 4.0,
-    weight_factor: float = 0.8,  # ← 自己資本比率影響度の微調整係数
+    weight_factor: float = _BANK_Q3_WEIGHT_FACTOR,  # ← 自己資本比率影響度の微調整係数
 ) -> float:
     """
     銀行Q3（係数調整版）
@@ -404,25 +486,7 @@ def _score_q3_abs_bank(
         return 0.0
 
     x = equity_ratio
-
-    if x < er_thr:
-        base_score = 0.0
-    elif x < 4.2:
-        base_score = 28.0
-    elif x < 4.5:
-        base_score = 38.0
-    elif x < 5.0:
-        base_score = 50.0
-    elif x < 5.5:
-        base_score = 65.0
-    elif x < 6.0:
-        base_score = 75.0
-    elif x < 7.0:
-        base_score = 85.0
-    elif x < 8.0:
-        base_score = 92.0
-    else:
-        base_score = 100.0
+    base_score = 0.0 if x < er_thr else _step(x, _LADDER_ER_BANK)
     # 影響度を微調整
     adjusted_score = base_score * weight_factor
 
@@ -457,9 +521,9 @@ def _score_q3_abs(
     # ROE >= 50% : er_thrを0.6倍に縮小（閾値を中程度緩和）
     effective_er_thr = er_thr
     if equity_ratio is not None and roe is not None:
-        if roe >= 100.0:
+        if roe >= _VERY_HIGH_ROE_THRESHOLD:
             effective_er_thr = er_thr * 0.4
-        elif roe >= 50.0:
+        elif roe >= _HIGH_ROE_THRESHOLD:
             effective_er_thr = er_thr * 0.6
 
     raw = 0.0
@@ -474,27 +538,11 @@ def _score_q3_abs(
         raw += w.er_w * r
 
     if de_ratio is not None:
-        r = (
-            0.000 if de_ratio > 3.0 else
-            0.167 if de_ratio > 2.0 else
-            0.333 if de_ratio > 1.5 else
-            0.500 if de_ratio > 1.0 else
-            0.733 if de_ratio > 0.5 else
-            1.000
-        )
-        raw += w.de_w * r
+        raw += w.de_w * _step(de_ratio, _LADDER_DE)
 
     if interest_coverage is not None:
         ratio_ic = interest_coverage / ic_thr if ic_thr > 0 else 0
-        r = (
-            0.000 if ratio_ic < 1.0 else
-            0.267 if ratio_ic < 2.0 else
-            0.500 if ratio_ic < 3.0 else
-            0.733 if ratio_ic < 6.0 else
-            0.900 if ratio_ic < 13.0 else
-            1.000
-        )
-        raw += w.ic_w * r
+        raw += w.ic_w * _step(ratio_ic, _LADDER_IC)
 
     max_raw = w.er_w + w.de_w + w.ic_w
     return 0.0 if max_raw == 0 else max(0.0, min(100.0, raw / max_raw * 100.0))
@@ -556,9 +604,6 @@ def _knockout_penalty(
     if equity_ratio is not None and equity_ratio < er_thr:
         # ROEが高い超高収益企業（積極的な自社株買いによる資本圧縮）は
         # 財務的脆弱性ではなくレバレッジ活用と判断し、警告・ペナルティを軽減する
-        _HIGH_ROE_THRESHOLD = 50.0   # ROE ≥ 50%：高収益レバレッジとみなす基準
-        _VERY_HIGH_ROE_THRESHOLD = 100.0  # ROE ≥ 100%：超高収益（Apple等）
-
         if roe is not None and roe >= _VERY_HIGH_ROE_THRESHOLD:
             # ペナルティなし、情報提供のみ（警告アイコンなし）
             warnings.append(
@@ -727,9 +772,293 @@ def compute_q_block(
         "payload": {
             "q1": q_result["q1"],
             "q3": q_result["q3"],
+            "q1_abs": q_result["q1_abs"],
+            "q3_abs": q_result["q3_abs"],
+            "q1_rel": q_result["q1_rel"],
+            "q3_rel": q_result["q3_rel"],
+            "q_alpha": q_result["alpha"],
+            "q_penalty": q_result["penalty"],
             "q_warnings": q_result["warnings"],
             "er_threshold": q_result.get("er_threshold", 10.0),
             "ic_threshold": q_result.get("ic_threshold", 1.5),
             "threshold_note": q_result.get("threshold_note", "標準基準"),
         },
     }
+
+
+# ─── バッチ（列指向） ─────────────────────────────────────────────────────
+#
+# score_quality と同じ計算を銘柄配列に対して一括で行う。
+#   - 欠損は NaN（スカラー版の None に相当）
+#   - 業種は (industry, sector, is_us) の組ごとに1回だけ閾値・銀行判定を解決
+#   - 警告は文字列を作らずビットコード配列で返し、表示行だけ
+#     render_q_warnings() で文字列化する
+#   - 加算順序・丸め（Python round）までスカラー版と同一
+
+Q_WARN_IC = 1         # IC 閾値未満
+Q_WARN_ER = 2         # 自己資本比率 閾値未満（通常ペナルティ）
+Q_WARN_ER_HALF = 4    # 同上（ROE ≥ 50%、ペナルティ半減）
+Q_WARN_ER_INFO = 8    # 同上（ROE ≥ 100%、情報のみ）
+Q_WARN_OPM = 16       # 営業赤字
+
+
+def _step_batch(x: np.ndarray, ladder: _Ladder) -> np.ndarray:
+    rules, default = ladder
+    return np.select([op(x, edge) for op, edge, _ in rules], [v for _, _, v in rules], default=default)
+
+
+def _as_float_array(values, n: int) -> np.ndarray:
+    if values is None:
+        return np.full(n, np.nan)
+    return np.asarray(pd.to_numeric(pd.Series(values), errors="coerce"), dtype=float)
+
+
+def _round_exact(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """スカラー版と一致させるため Python の round で丸める（NaN は NaN）。"""
+    return np.array([round(v, ndigits) for v in values.tolist()], dtype=float)
+
+
+def _resolve_industry_codes(
+    industry: Sequence[str],
+    sector: Sequence[str],
+    is_us,
+    n: int,
+) -> Dict[str, np.ndarray]:
+    """(industry, sector, is_us) を業種コード化し、コード単位で閾値・銀行判定を解決する。"""
+    us = np.broadcast_to(np.asarray(is_us, dtype=bool), (n,))
+    keys = pd.DataFrame({
+        "industry": pd.Series(industry, dtype=object).fillna("").astype(str).to_numpy() if industry is not None else [""] * n,
+        "sector":   pd.Series(sector, dtype=object).fillna("").astype(str).to_numpy() if sector is not None else [""] * n,
+        "is_us":    us,
+    })
+    codes, uniques = pd.MultiIndex.from_frame(keys).factorize()
+
+    table = []
+    for ind, sec, u in uniques:
+        thr = get_thresholds(ind, sec, is_us=bool(u))
+        table.append((
+            thr["er"], thr["ic"], thr["note"], thr["custom"],
+            _is_bank_industry(ind, sec), _is_financial_industry(ind, sec),
+        ))
+    er, ic, note, custom, bank, fin = (np.array(col) for col in zip(*table)) if table else ([],) * 6
+
+    return {
+        "code":      codes,
+        "er_thr":    np.asarray(er, dtype=float)[codes],
+        "ic_thr":    np.asarray(ic, dtype=float)[codes],
+        "note":      np.asarray(note, dtype=object)[codes],
+        "custom":    np.asarray(custom, dtype=bool)[codes],
+        "is_bank":   np.asarray(bank, dtype=bool)[codes],
+        "is_financial": np.asarray(fin, dtype=bool)[codes],
+    }
+
+
+def _rel_mean(pairs: List[Tuple[np.ndarray, float]]) -> np.ndarray:
+    """_score_q1_rel / _score_q3_rel の配列版（欠損キーは分母から外す）。"""
+    num = np.zeros(len(pairs[0][0]))
+    den = np.zeros(len(pairs[0][0]))
+    for v, wt in pairs:
+        ok = ~np.isnan(v)
+        num = num + np.where(ok, v * wt, 0.0)
+        den = den + np.where(ok, wt, 0.0)
+    return np.divide(num, den, out=np.full_like(num, np.nan), where=den > 0)
+
+
+def score_quality_batch(
+    roe,
+    roa,
+    equity_ratio,
+    operating_margin=None,
+    de_ratio=None,
+    interest_coverage=None,
+    industry: Optional[Sequence[str]] = None,
+    sector: Optional[Sequence[str]] = None,
+    is_us=False,
+    q_rel: Optional[Dict[str, Any]] = None,
+    weights: Optional[QWeights] = None,
+    custom_q_weights: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    """
+    score_quality の列指向版。各引数は同じ長さの配列（欠損は NaN / None）。
+
+    Parameters
+    ----------
+    industry, sector : 文字列配列（省略時は全行空文字）
+    is_us : bool またはbool配列
+    q_rel : Q相対評価の配列 dict
+        {"alpha": 配列（相対評価なしの行は 0）,
+         "roe_rel" / "roa_rel" / "opm_rel" / "er_rel" / "ic_rel": 配列}
+
+    Returns
+    -------
+    dict（全て長さ n の配列）:
+        q_score, q1, q3, q1_abs, q3_abs, q1_rel, q3_rel, alpha, penalty,
+        warning_codes（Q_WARN_* のビット和）,
+        er_threshold, ic_threshold, threshold_note, industry_code
+        および render_q_warnings 用の入力値
+    """
+    w = _build_qweights(base=weights, custom_q_weights=custom_q_weights)
+
+    roe = np.asarray(pd.to_numeric(pd.Series(roe), errors="coerce"), dtype=float)
+    n = len(roe)
+    roa = _as_float_array(roa, n)
+    er = _as_float_array(equity_ratio, n)
+    opm = _as_float_array(operating_margin, n)
+    de = _as_float_array(de_ratio, n)
+    ic = _as_float_array(interest_coverage, n)
+
+    ind = _resolve_industry_codes(industry, sector, is_us, n)
+    is_bank = ind["is_bank"]
+    er_thr, ic_thr = ind["er_thr"], ind["ic_thr"]
+
+    has_roe, has_roa, has_opm = ~np.isnan(roe), ~np.isnan(roa), ~np.isnan(opm)
+    has_er, has_de, has_ic = ~np.isnan(er), ~np.isnan(de), ~np.isnan(ic)
+
+    def _clip100(raw, max_raw):
+        scaled = np.divide(raw, max_raw, out=np.zeros_like(raw), where=max_raw != 0) * 100.0
+        return np.where(max_raw == 0, 0.0, np.clip(scaled, 0.0, 100.0))
+
+    # ── Q1 絶対評価 ──
+    raw = 0.0 + np.where(has_roe, w.roe_w * _step_batch(roe, _LADDER_ROE_GENERAL), 0.0)
+    raw = raw + np.where(has_roa, w.roa_w * _step_batch(roa, _LADDER_ROA_GENERAL), 0.0)
+    raw = raw + np.where(has_opm, w.opm_w * _step_batch(opm, _LADDER_OPM_GENERAL), 0.0)
+    q1_general = _clip100(raw, np.full(n, w.roe_w + w.roa_w + w.opm_w))
+
+    bank_opm_w = w.opm_w * _BANK_OPM_WEIGHT_FACTOR
+    raw = 0.0 + np.where(has_roe, w.roe_w * _step_batch(roe, _LADDER_ROE_BANK), 0.0)
+    max_raw = 0.0 + np.where(has_roe, w.roe_w, 0.0)
+    raw = raw + np.where(has_roa, w.roa_w * _step_batch(roa, _LADDER_ROA_BANK), 0.0)
+    max_raw = max_raw + np.where(has_roa, w.roa_w, 0.0)
+    raw = raw + np.where(has_opm, bank_opm_w * _step_batch(opm, _LADDER_OPM_BANK), 0.0)
+    max_raw = max_raw + np.where(has_opm, bank_opm_w, 0.0)
+    q1_bank = _clip100(raw, max_raw)
+
+    q1_abs = np.where(is_bank, q1_bank, q1_general)
+
+    # ── Q3 絶対評価 ──
+    eff_er_thr = np.select(
+        [has_er & (roe >= _VERY_HIGH_ROE_THRESHOLD), has_er & (roe >= _HIGH_ROE_THRESHOLD)],
+        [er_thr * 0.4, er_thr * 0.6],
+        default=er_thr,
+    )
+    er_ratio = np.divide(er, eff_er_thr, out=np.zeros(n), where=eff_er_thr > 0)
+    er_step = np.where(
+        ind["is_financial"],
+        _step_batch(er_ratio, _LADDER_ER_FINANCIAL),
+        _step_batch(er_ratio, _LADDER_ER_GENERAL),
+    )
+    ic_ratio = np.divide(ic, ic_thr, out=np.zeros(n), where=ic_thr > 0)
+
+    raw = 0.0 + np.where(has_er, w.er_w * er_step, 0.0)
+    raw = raw + np.where(has_de, w.de_w * _step_batch(de, _LADDER_DE), 0.0)
+    raw = raw + np.where(has_ic, w.ic_w * _step_batch(ic_ratio, _LADDER_IC), 0.0)
+    q3_general = _clip100(raw, np.full(n, w.er_w + w.de_w + w.ic_w))
+
+    bank_base = np.where(er < er_thr, 0.0, _step_batch(er, _LADDER_ER_BANK))
+    q3_bank = np.where(has_er, bank_base * _BANK_Q3_WEIGHT_FACTOR, 0.0)
+
+    q3_abs = np.where(is_bank, q3_bank, q3_general)
+
+    # ── 相対評価ブレンド ──
+    q_rel = q_rel or {}
+    alpha = _as_float_array(q_rel.get("alpha"), n)
+    alpha = np.where(np.isnan(alpha), 0.0, alpha)
+    q1_rel = _rel_mean([(_as_float_array(q_rel.get(k), n), wt)
+                        for k, wt in [("roe_rel", 2.0), ("roa_rel", 1.0), ("opm_rel", 1.0)]])
+    q3_rel = _rel_mean([(_as_float_array(q_rel.get(k), n), wt)
+                        for k, wt in [("er_rel", 2.0), ("ic_rel", 1.5)]])
+
+    def _blend(a, r):
+        return np.where(np.isnan(r) | (alpha == 0.0), a, a * (1 - alpha) + r * alpha)
+
+    q1 = _blend(q1_abs, q1_rel)
+    q3 = _blend(q3_abs, q3_rel)
+
+    total_w = w.w_q1 + w.w_q3
+    q_raw = (q1 * w.w_q1 + q3 * w.w_q3) / total_w if total_w > 0 else np.zeros(n)
+
+    # ── ノックアウト ──
+    ko_ic = ~is_bank & has_ic & (ic < ic_thr)
+    er_low = has_er & (er < er_thr)
+    er_info = er_low & (roe >= _VERY_HIGH_ROE_THRESHOLD)
+    er_half = er_low & ~er_info & (roe >= _HIGH_ROE_THRESHOLD)
+    er_full = er_low & ~er_info & ~er_half
+    ko_opm = ~is_bank & has_opm & (opm < 0)
+
+    penalty = 0.0 + np.where(ko_ic, w.ko_ic, 0.0)
+    penalty = penalty + np.select([er_half, er_full], [w.ko_er * 0.5, w.ko_er], default=0.0)
+    penalty = penalty + np.where(ko_opm, w.ko_opm, 0.0)
+
+    codes = (
+        ko_ic * Q_WARN_IC + er_full * Q_WARN_ER + er_half * Q_WARN_ER_HALF
+        + er_info * Q_WARN_ER_INFO + ko_opm * Q_WARN_OPM
+    ).astype(np.int8)
+
+    effective_penalty = penalty * (1.0 - alpha * 0.5)
+    q_final = np.clip(q_raw - effective_penalty, 0.0, 100.0)
+
+    return {
+        "q_score": _round_exact(q_final, 1),
+        "q1": _round_exact(q1, 1),
+        "q3": _round_exact(q3, 1),
+        "q1_abs": _round_exact(q1_abs, 1),
+        "q3_abs": _round_exact(q3_abs, 1),
+        "q1_rel": _round_exact(q1_rel, 1),
+        "q3_rel": _round_exact(q3_rel, 1),
+        "alpha": alpha,
+        "penalty": effective_penalty,
+        "warning_codes": codes,
+        "er_threshold": er_thr,
+        "ic_threshold": ic_thr,
+        "threshold_note": ind["note"],
+        "threshold_custom": ind["custom"],
+        "industry_code": ind["code"],
+        "inputs": {
+            "roe": roe,
+            "equity_ratio": er,
+            "operating_margin": opm,
+            "interest_coverage": ic,
+        },
+    }
+
+
+def render_q_warnings(batch: Dict[str, Any], idx: int) -> List[str]:
+    """score_quality_batch の1行分の警告コードを score_quality と同じ文言に展開する。"""
+    code = int(batch["warning_codes"][idx])
+    if not code:
+        return []
+
+    inputs = batch["inputs"]
+    roe = inputs["roe"][idx]
+    equity_ratio = inputs["equity_ratio"][idx]
+    er_thr = batch["er_threshold"][idx]
+    ic_thr = batch["ic_threshold"][idx]
+    note = batch["threshold_note"][idx]
+    custom = batch["threshold_custom"][idx]
+
+    warnings: List[str] = []
+    if code & Q_WARN_IC:
+        warnings.append(
+            f"⚠️ インタレストカバレッジ {inputs['interest_coverage'][idx]:.1f}x"
+            f"（{'業種基準' if custom else '標準基準'} {ic_thr:.1f}x 未満）"
+        )
+    if code & Q_WARN_ER_INFO:
+        warnings.append(
+            f"ℹ️ 自己資本比率 {equity_ratio:.1f}%"
+            f"（{note} {er_thr:.0f}% 未満）"
+            f" ／ ROE {roe:.0f}% — 高収益による資本効率化レバレッジ（財務リスクは低い）"
+        )
+    elif code & Q_WARN_ER_HALF:
+        warnings.append(
+            f"⚠️ 自己資本比率 {equity_ratio:.1f}%"
+            f"（{note} {er_thr:.0f}% 未満）"
+            f" ／ ROE {roe:.0f}% — 高収益構造によるレバレッジの可能性あり"
+        )
+    elif code & Q_WARN_ER:
+        warnings.append(
+            f"⚠️ 自己資本比率 {equity_ratio:.1f}%"
+            f"（{note} {er_thr:.0f}% 未満）"
+        )
+    if code & Q_WARN_OPM:
+        warnings.append(f"⚠️ 営業利益率 {inputs['operating_margin'][idx]:.1f}%（営業赤字）")
+    return warnings
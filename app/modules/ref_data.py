@@ -0,0 +1,453 @@
+"""
+ref_data.py
+────────────────────────────────────────────────────────────────────────────
+参照データ（app/data の CSV 5本）の単一ローダーとバイナリバンドル
+
+【背景】
+  pattern_db / sector_db / TSE マスター / 業種別閾値（TSE・US）は、それぞれ
+  別のモジュールが独自のパス探索（PATTERN_DB_PATH、候補パスのリスト、
+  q_logic._find_file）で CSV を探し、プロセスごとに毎回パースしていた。
+
+【バンドル】 app/data/ref_bundle.bin（REF_BUNDLE_PATH で変更可）
+  ビルド時に CSV をパースし、索引まで作った状態で1ファイルにまとめる。
+    MAGIC(8) | version(uint32) | header 長(uint32) | header(JSON) | セクション…
+  header にはセクションごとの (offset, length) と元 CSV の sha256 が入る。
+  ファイルは mmap で開き、セクションは初めて get() されたときに1回だけ
+  pickle から復元する（復元した値はプロセスごとの私有オブジェクトで、
+  プロセス間で共有されるのはファイルのページキャッシュだけ）。
+  セクションの中身は dict / list / set / ndarray だけ（pandas の pickle に依存しない）。
+
+【セクション】
+  pattern_db     : 財務タイプ DB（DataFrame。_ticker_set 列つき）
+  sector_db      : セクター DB（DataFrame）
+  tse_master     : {ticker: {"sector", "industry"}}
+  thresholds_tse : {industry: {"er", "ic", "note"}}
+  thresholds_us  : {sector: {"er", "ic", "note"}}
+  ── 索引（上から導出）──
+  ticker_types   : {ticker: pattern_db の行番号}（CSV 順で最初に収録された行）
+  sector_medians : pattern_db.build_sector_median_table の結果
+  tse_resolution : {TSE マスターの業種: 解決済み閾値 or None}
+
+【フォールバック】
+  バンドルが無い・version が違う場合は CSV を直接パースする（開発時）。
+  PATTERN_DB_PATH が設定されていれば pattern_db（と ticker_types）だけ CSV を使う。
+  バンドルを開くときに CSV の sha256 を header の記録と比べ、食い違うセクション
+  （CSV を編集してバンドルを作り直していない）は CSV を直接パースする。
+  CSV が無いセクションはバンドルの値を使う。
+  索引は、依存セクションが1つでもバンドル以外から読まれたらバンドルの値を使わず、
+  実際に使う値から作り直す（閾値と tse_resolution が食い違わないように）。
+
+【ビルド】（app/ で実行。CSV を更新したら必ず作り直す）
+  python -m modules.ref_data build     # CSV → ref_bundle.bin
+  python -m modules.ref_data check     # バンドルが CSV と一致しなければ終了コード 1
+  python -m modules.ref_data info      # セクションとサイズの一覧
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+
+BUNDLE_MAGIC = b"CSREFBND"
+BUNDLE_VERSION = 1
+_HEADER = struct.Struct("<II")
+
+DATA_DIR = os.environ.get(
+    "REF_DATA_DIR", os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+)
+BUNDLE_PATH = os.environ.get("REF_BUNDLE_PATH", os.path.join(DATA_DIR, "ref_bundle.bin"))
+
+# セクション名 → 元 CSV（DATA_DIR 内）
+SOURCES: Dict[str, str] = {
+    "pattern_db":     "pattern_db_latest.csv",
+    "sector_db":      "sector_db_latest.csv",
+    "tse_master":     "tse_master_latest.csv",
+    "thresholds_tse": "industry_thresholds.csv",
+    "thresholds_us":  "industry_thresholds_us.csv",
+}
+
+# 個別に CSV のパスを差し替える環境変数（差し替えたセクションはバンドルを使わない）
+_SOURCE_ENV: Dict[str, str] = {
+    "pattern_db": "PATTERN_DB_PATH",
+}
+
+
+def source_path(name: str) -> Optional[str]:
+    """セクションの元 CSV のパス。存在しなければ None。"""
+    env = _SOURCE_ENV.get(name)
+    path = os.environ.get(env) if env else None
+    path = path or os.path.join(DATA_DIR, SOURCES[name])
+    return path if os.path.exists(path) else None
+
+
+def _overridden(name: str) -> bool:
+    env = _SOURCE_ENV.get(name)
+    return bool(env and os.environ.get(env))
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# CSV パーサー（path → バンドルに入れる素の値）
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _frame_payload(df: pd.DataFrame) -> Dict[str, Any]:
+    return {"columns": list(df.columns), "data": {c: df[c].tolist() for c in df.columns}}
+
+
+def _parse_pattern_db(path: Optional[str]) -> Optional[Dict[str, Any]]:
+    if path is None:
+        return None
+    df = pd.read_csv(path, encoding="utf-8-sig")
+    df["_ticker_set"] = df["ticker_list"].apply(
+        lambda x: set(str(x).replace('"', "").split(",")) if pd.notna(x) else set()
+    )
+    return _frame_payload(df)
+
+
+def _parse_sector_db(path: Optional[str]) -> Optional[Dict[str, Any]]:
+    if path is None:
+        return None
+    return _frame_payload(pd.read_csv(path, encoding="utf-8-sig"))
+
+
+def _parse_tse_master(path: Optional[str]) -> Dict[str, Dict[str, str]]:
+    if path is None:
+        return {}
+    try:
+        df = pd.read_csv(path, encoding="utf-8-sig", usecols=lambda c: c in ("ticker", "sector", "industry"))
+    except Exception:
+        return {}
+    df = df[df["ticker"].notna()]
+
+    def _col(name: str) -> list:
+        # 従来の str(row.get(name, "") or "") と同じ変換（NaN は "nan"）
+        if name not in df.columns:
+            return [""] * len(df)
+        return [str(v or "") for v in df[name].tolist()]
+
+    tickers = df["ticker"].astype(str).str.strip().str.upper().tolist()
+    return {t: {"sector": s, "industry": i} for t, s, i in zip(tickers, _col("sector"), _col("industry"))}
+
+
+def _threshold_parser(key_col: str) -> Callable[[Optional[str]], Dict[str, Dict]]:
+    def _parse(path: Optional[str]) -> Dict[str, Dict]:
+        from modules.q_logic import _load_csv_to_dict
+
+        if path is None:
+            return {}
+        try:
+            return _load_csv_to_dict(path, key_col)
+        except Exception:
+            return {}
+    return _parse
+
+
+_PARSERS: Dict[str, Callable[[Optional[str]], Any]] = {
+    "pattern_db":     _parse_pattern_db,
+    "sector_db":      _parse_sector_db,
+    "tse_master":     _parse_tse_master,
+    "thresholds_tse": _threshold_parser("industry"),
+    "thresholds_us":  _threshold_parser("sector"),
+}
+
+
+# ─── 素の値 → 利用側に渡す形 ──
+
+def _to_frame(payload: Optional[Dict[str, Any]]) -> Optional[pd.DataFrame]:
+    if payload is None:
+        return None
+    return pd.DataFrame(payload["data"], columns=payload["columns"])
+
+
+_MATERIALIZE: Dict[str, Callable[[Any], Any]] = {
+    "pattern_db": _to_frame,
+    "sector_db":  _to_frame,
+}
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 索引（他のセクションから導出）
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _ticker_types(pattern_db: Optional[pd.DataFrame]) -> Dict[str, int]:
+    index: Dict[str, int] = {}
+    if pattern_db is None:
+        return index
+    for pos, tickers in enumerate(pattern_db["_ticker_set"].tolist()):
+        for t in tickers:
+            index.setdefault(t, pos)
+    return index
+
+
+def _sector_medians(sector_db: Optional[pd.DataFrame]) -> Optional[Dict[str, Any]]:
+    from modules.pattern_db import build_sector_median_table
+
+    return None if sector_db is None else build_sector_median_table(sector_db)
+
+
+def _tse_resolution(thresholds_tse: Dict[str, Dict], tse_master: Dict[str, Dict[str, str]]) -> Dict[str, Optional[Dict]]:
+    from modules.q_logic import resolve_tse_industries
+
+    industries = sorted({info["industry"] for info in tse_master.values()})
+    return resolve_tse_industries(thresholds_tse, industries)
+
+
+# 名前 → (依存セクション, 導出関数)
+_DERIVED: Dict[str, Tuple[Tuple[str, ...], Callable[..., Any]]] = {
+    "ticker_types":   (("pattern_db",), _ticker_types),
+    "sector_medians": (("sector_db",), _sector_medians),
+    "tse_resolution": (("thresholds_tse", "tse_master"), _tse_resolution),
+}
+
+SECTIONS: Tuple[str, ...] = tuple(SOURCES) + tuple(_DERIVED)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# バンドル（読み込み）
+# ═══════════════════════════════════════════════════════════════════════════
+
+class Bundle:
+    """mmap したバンドル。read(name) でセクションを復元する（毎回デシリアライズ）。"""
+
+    __slots__ = ("path", "header", "stale", "_mm", "_base")
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC:
+            raise ValueError(f"参照データバンドルではありません: {path}")
+        pos = len(BUNDLE_MAGIC)
+        version, header_len = _HEADER.unpack_from(self._mm, pos)
+        if version != BUNDLE_VERSION:
+            raise ValueError(f"バンドルの version {version} はこのコード（{BUNDLE_VERSION}）と合いません: {path}")
+        pos += _HEADER.size
+        self.header: Dict[str, Any] = json.loads(bytes(self._mm[pos:pos + header_len]))
+        self._base = pos + header_len
+        self.path = path
+        self.stale: frozenset = frozenset()     # CSV と食い違うセクション（open_bundle が設定）
+
+    @property
+    def sections(self) -> Dict[str, List[int]]:
+        return self.header["sections"]
+
+    def read(self, name: str) -> Any:
+        offset, length = self.sections[name]
+        start = self._base + offset
+        return pickle.loads(memoryview(self._mm)[start:start + length])
+
+
+_lock = threading.RLock()
+_values: Dict[str, Any] = {}
+_bundle: Optional[Bundle] = None
+_bundle_checked = False
+
+
+def open_bundle() -> Optional[Bundle]:
+    """
+    BUNDLE_PATH のバンドル（1プロセス1回だけ開く）。無い・壊れている場合は None。
+
+    CSV と sha256 が食い違うセクションを Bundle.stale に記録する（そのセクションは CSV から読む）。
+    """
+    global _bundle, _bundle_checked
+    with _lock:
+        if not _bundle_checked:
+            _bundle_checked = True
+            try:
+                _bundle = Bundle(BUNDLE_PATH) if os.path.exists(BUNDLE_PATH) else None
+                if _bundle is not None:
+                    _bundle.stale = frozenset(_stale_in(_bundle.header, missing_is_stale=False))
+            except (OSError, ValueError):
+                _bundle = None
+        return _bundle
+
+
+def _from_bundle(bundle: Optional[Bundle], name: str) -> bool:
+    """
+    name をバンドルから読むか。索引は依存セクションも全部バンドルから読むときだけ
+    （依存のどれかが CSV に落ちたら、実際に使う値から作り直す）。
+    """
+    if bundle is None or name not in bundle.sections or name in bundle.stale or _overridden(name):
+        return False
+    if name in _DERIVED:
+        return all(_from_bundle(bundle, dep) for dep in _DERIVED[name][0])
+    return True
+
+
+def _load(name: str) -> Any:
+    bundle = open_bundle()
+    if _from_bundle(bundle, name):
+        raw = bundle.read(name)
+    elif name in _PARSERS:
+        raw = _PARSERS[name](source_path(name))
+    else:
+        deps, func = _DERIVED[name]
+        return func(*(get(dep) for dep in deps))
+    materialize = _MATERIALIZE.get(name)
+    return materialize(raw) if materialize is not None else raw
+
+
+def get(name: str) -> Any:
+    """
+    参照データのセクション（プロセス内で1回だけ読み込み、以後は同じオブジェクト）。
+
+    返り値は共有なので呼び出し側で変更しないこと。
+    """
+    try:
+        return _values[name]
+    except KeyError:
+        pass
+    if name not in SECTIONS:
+        raise KeyError(f"未知の参照データセクションです: {name}")
+    with _lock:
+        if name not in _values:
+            _values[name] = _load(name)
+        return _values[name]
+
+
+def source_mode() -> str:
+    """"bundle:<built_at>"（CSV から読むセクションがあれば " stale=<名前,…>" つき）または "csv"。"""
+    bundle = open_bundle()
+    if bundle is None:
+        return "csv"
+    mode = f"bundle:{bundle.header.get('built_at', '')}"
+    return f"{mode} stale={','.join(sorted(bundle.stale))}" if bundle.stale else mode
+
+
+def reset() -> None:
+    """読み込み済みの値とバンドルを捨てる（ビルド直後・テスト用）。"""
+    global _bundle, _bundle_checked
+    with _lock:
+        _values.clear()
+        _bundle, _bundle_checked = None, False
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# バンドル（ビルド）
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _sha256(path: Optional[str]) -> Optional[str]:
+    if path is None:
+        return None
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def source_digests() -> Dict[str, Optional[str]]:
+    """DATA_DIR の各 CSV の sha256（無い CSV は None）。"""
+    digests: Dict[str, Optional[str]] = {}
+    for name, fname in SOURCES.items():
+        path = os.path.join(DATA_DIR, fname)
+        digests[name] = _sha256(path if os.path.exists(path) else None)
+    return digests
+
+
+def compile_sources() -> Dict[str, Any]:
+    """DATA_DIR の CSV を全セクション（索引を含む）の素の値にする。"""
+    raw: Dict[str, Any] = {}
+    values: Dict[str, Any] = {}
+    for name, parser in _PARSERS.items():
+        path = os.path.join(DATA_DIR, SOURCES[name])
+        raw[name] = parser(path if os.path.exists(path) else None)
+        materialize = _MATERIALIZE.get(name)
+        values[name] = materialize(raw[name]) if materialize is not None else raw[name]
+    for name, (deps, func) in _DERIVED.items():
+        raw[name] = func(*(values[dep] for dep in deps))
+    return raw
+
+
+def build_bundle(path: str = BUNDLE_PATH) -> Dict[str, Any]:
+    """CSV からバンドルを作って path に書く（一時ファイル → rename）。header を返す。"""
+    raw = compile_sources()
+    blobs: List[bytes] = []
+    sections: Dict[str, List[int]] = {}
+    offset = 0
+    for name in SECTIONS:
+        blob = pickle.dumps(raw[name], protocol=5)
+        sections[name] = [offset, len(blob)]
+        blobs.append(blob)
+        offset += len(blob)
+
+    header = {
+        "version": BUNDLE_VERSION,
+        "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "sources": {name: {"file": SOURCES[name], "sha256": digest} for name, digest in source_digests().items()},
+        "sections": sections,
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False, sort_keys=True).encode("utf-8")
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(BUNDLE_MAGIC)
+        f.write(_HEADER.pack(BUNDLE_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp, path)
+    return header
+
+
+def stale_sources(path: str = BUNDLE_PATH) -> List[str]:
+    """バンドルと CSV の sha256 が食い違うセクション（バンドルが無ければ全部）。"""
+    try:
+        header = Bundle(path).header
+    except (OSError, ValueError):
+        return list(SOURCES)
+    return _stale_in(header, missing_is_stale=True)
+
+
+def _stale_in(header: Dict[str, Any], missing_is_stale: bool) -> List[str]:
+    """header の記録と CSV の sha256 が食い違うセクション。missing_is_stale=False なら無い CSV は数えない。"""
+    recorded = {name: info.get("sha256") for name, info in header.get("sources", {}).items()}
+    return [
+        name for name, digest in source_digests().items()
+        if (digest is not None or missing_is_stale) and recorded.get(name) != digest
+    ]
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# CLI
+# ═══════════════════════════════════════════════════════════════════════════
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="参照データバンドルのビルド・確認")
+    parser.add_argument("command", choices=("build", "check", "info"))
+    parser.add_argument("--path", default=BUNDLE_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        header = build_bundle(args.path)
+        size = os.path.getsize(args.path)
+        print(f"built: {args.path}（{size / 1024:.1f} KB, {len(header['sections'])} sections）")
+        return 0
+
+    if args.command == "check":
+        stale = stale_sources(args.path)
+        if stale:
+            print(f"stale: {', '.join(stale)} — python -m modules.ref_data build で作り直してください")
+            return 1
+        print("ok")
+        return 0
+
+    bundle = Bundle(args.path)
+    print(f"{bundle.path}  version={bundle.header['version']}  built_at={bundle.header['built_at']}")
+    for name, (offset, length) in bundle.sections.items():
+        print(f"  {name:<15} {length / 1024:9.1f} KB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
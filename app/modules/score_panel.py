@@ -0,0 +1,388 @@
+"""
+score_panel.py
+────────────────────────────────────────────────────────────────────────────
+サブスコアパネル（銘柄 × 時点）と重み付き合成
+
+【目的】
+  Q / V / T / D の最終スコアは「高コストなサブスコア計算」と
+  「重み付き合成（数回の積和）」の 2段構成になっている。
+  本モジュールはサブスコアだけを保持したパネルから、任意の重みで
+  最終スコアを再合成する。サブスコア自体は再計算しない。
+
+【パネル形式】
+  long 形式 DataFrame（1行 = 1銘柄 × 1時点）
+    キー      : ticker, as_of
+    Q         : q1, q3（α ブレンド後）
+                q1_abs, q3_abs, q1_rel, q3_rel, q_alpha（ブレンド前）
+                q_penalty（α 適用後のノックアウトペナルティ）
+    V         : v1, v2, v3, v4（v4 は NaN = セクター情報なし）
+    T         : t_score（+ 参考値 rsi / ma_25 / ma_50 / ma_75 / slope_25）
+    D         : def1〜def6（defensive 方向。def6 のみ非反転）
+    先行リターン: fwd_<h>（重み探索の目的関数用、任意）
+
+【永続化】
+  SQLite 1ファイル（テーブル panel、主キー (ticker, as_of)）。INSERT OR REPLACE で
+  upsert するので、1回の書き込みはパネル全体の大きさに依存せず、複数のスレッド・
+  Streamlit プロセスから同時に書いても行は失われない（WAL + busy_timeout）。
+  環境変数 SCORE_PANEL_PATH が設定されていれば、build_analysis_output が
+  分析のたびに1行を追記・更新する（ネットワーク取得は一切しない）。
+  CSV 形式の旧パネルは import_csv_panel() で取り込む。
+  rescore_panel() はこのパネルから全銘柄の最終スコアを再合成する。
+
+【合成式】（各 *_logic と同一）
+  Q   = clip((q1×w_q1 + q3×w_q3) / (w_q1 + w_q3) − q_penalty, 0, 100)
+        （w_q1 / w_q3 の既定は compute_q_block と同じ DEFAULT_Q_WEIGHTS）
+  V   = v4 あり: v1〜v4 を DEFAULT_V_WEIGHTS_WITH_SECTOR で加重
+        v4 なし: v1〜v3 を DEFAULT_V_WEIGHTS_NO_SECTOR で加重
+  QVT = Q×WEIGHT_Q + V×WEIGHT_V + T×WEIGHT_T
+  D   = clip(Σ d_i × w_i, 0, 1)、defensive = 1 − D
+        （d_i = 1 − def_i、d6 = def6）
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+from typing import Optional, Dict, Any, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from modules.indicators import WEIGHT_Q, WEIGHT_V, WEIGHT_T
+from modules.q_logic import DEFAULT_Q_WEIGHTS
+from modules.v_logic import DEFAULT_V_WEIGHTS_WITH_SECTOR, DEFAULT_V_WEIGHTS_NO_SECTOR
+from modules.d_logic import DEFAULT_D_WEIGHTS
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# スキーマ
+# ═══════════════════════════════════════════════════════════════════════════
+
+SCORE_PANEL_PATH = os.environ.get("SCORE_PANEL_PATH", "")
+
+KEY_COLS: List[str] = ["ticker", "as_of"]
+
+Q_SUB_COLS: List[str] = [
+    "q1", "q3", "q1_abs", "q3_abs", "q1_rel", "q3_rel", "q_alpha", "q_penalty",
+]
+V_SUB_COLS: List[str] = ["v1", "v2", "v3", "v4"]
+T_SUB_COLS: List[str] = ["t_score", "rsi", "ma_25", "ma_50", "ma_75", "slope_25"]
+D_SUB_COLS: List[str] = [f"def{i}" for i in range(1, 7)]
+
+SUBSCORE_COLS: List[str] = Q_SUB_COLS + V_SUB_COLS + T_SUB_COLS + D_SUB_COLS
+
+# 欠損時に 0 とみなす列（それ以外は NaN）
+_ZERO_FILL_COLS = ("q_alpha", "q_penalty")
+
+DEFAULT_QVT_WEIGHTS: Dict[str, float] = {"q": WEIGHT_Q, "v": WEIGHT_V, "t": WEIGHT_T}
+
+# 重みグループ → デフォルト重み（weight_search の探索対象単位）
+DEFAULT_WEIGHT_SETS: Dict[str, Dict[str, float]] = {
+    "qvt":         DEFAULT_QVT_WEIGHTS,
+    "q":           DEFAULT_Q_WEIGHTS,
+    "v_sector":    DEFAULT_V_WEIGHTS_WITH_SECTOR,
+    "v_no_sector": DEFAULT_V_WEIGHTS_NO_SECTOR,
+    "d":           DEFAULT_D_WEIGHTS,
+}
+
+# D 重みキー → 列（score_defense の _COL_WEIGHT_MAP と同順）
+_D_WEIGHT_COLS: List[tuple] = list(zip(DEFAULT_D_WEIGHTS.keys(), D_SUB_COLS))
+
+
+def fwd_col(horizon: int) -> str:
+    """先行リターン列名。"""
+    return f"fwd_{int(horizon)}"
+
+
+def make_subscore_panel(records) -> pd.DataFrame:
+    """
+    tech dict のリストや DataFrame からサブスコアパネルを作る。
+
+    欠損列は NaN（q_alpha / q_penalty は 0.0）で補完し、数値列を float に揃える。
+    """
+    panel = pd.DataFrame(records).copy()
+    if panel.empty:
+        return pd.DataFrame(columns=KEY_COLS + SUBSCORE_COLS)
+    for col in KEY_COLS:
+        if col not in panel.columns:
+            raise ValueError(f"パネルにキー列 {col} がありません。")
+    panel["as_of"] = pd.to_datetime(panel["as_of"])
+
+    for col in SUBSCORE_COLS:
+        if col not in panel.columns:
+            panel[col] = np.nan
+        panel[col] = pd.to_numeric(panel[col], errors="coerce")
+    for col in _ZERO_FILL_COLS:
+        panel[col] = panel[col].fillna(0.0)
+
+    extra = [c for c in panel.columns if c not in KEY_COLS + SUBSCORE_COLS]
+    return panel[KEY_COLS + SUBSCORE_COLS + extra].reset_index(drop=True)
+
+
+def attach_forward_returns(
+    panel: pd.DataFrame,
+    close: pd.DataFrame,
+    horizons: Sequence[int],
+) -> pd.DataFrame:
+    """
+    日付 × 銘柄の終値パネルから先行リターンを計算し、fwd_<h> 列として付与する。
+    as_of が営業日でない場合はその日以前の直近営業日の値を使う。
+    """
+    from modules.backtest import forward_returns
+
+    close = close.sort_index()
+    out = panel.copy()
+    pos = close.index.searchsorted(out["as_of"].to_numpy(), side="right") - 1
+    col_idx = close.columns.get_indexer(out["ticker"])
+    ok = (pos >= 0) & (col_idx >= 0)
+
+    for h, ret_df in forward_returns(close, horizons).items():
+        values = np.full(len(out), np.nan)
+        arr = ret_df.to_numpy(dtype=float)
+        values[ok] = arr[pos[ok], col_idx[ok]]
+        out[fwd_col(h)] = values
+    return out
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 重み付き合成（ベクトル化）
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _normalized(weights: Dict[str, float], keys: Sequence[str]) -> Dict[str, float]:
+    total = sum(float(weights[k]) for k in keys)
+    if total <= 0:
+        raise ValueError(f"重みの合計が0以下です: {total}")
+    return {k: float(weights[k]) / total for k in keys}
+
+
+def _blend_q(abs_: np.ndarray, rel: np.ndarray, alpha: np.ndarray) -> np.ndarray:
+    """score_quality._blend と同じ: rel がないか α=0 なら絶対評価のまま。"""
+    return np.where(np.isnan(rel) | (alpha == 0.0), abs_, abs_ * (1 - alpha) + rel * alpha)
+
+
+def combine_q(
+    cols: Dict[str, np.ndarray],
+    q_weights: Optional[Dict[str, float]] = None,
+    alpha: Optional[float] = None,
+) -> np.ndarray:
+    """
+    q1 / q3 / q_penalty から Q スコアを再合成する。
+
+    alpha を指定すると q1_abs / q1_rel などから相対評価のブレンド比率も
+    差し替える（ペナルティの α 軽減も再計算）。ブレンド前の値がない行は
+    保存済みの q1 / q3 をそのまま使う。
+    """
+    w = _normalized(q_weights or DEFAULT_Q_WEIGHTS, ["w_q1", "w_q3"])
+    q1, q3, penalty = cols["q1"], cols["q3"], cols["q_penalty"]
+
+    if alpha is not None:
+        stored_alpha = cols["q_alpha"]
+        new_alpha = np.where(np.isnan(cols["q1_rel"]) & np.isnan(cols["q3_rel"]), 0.0, float(alpha))
+        has_abs = ~np.isnan(cols["q1_abs"])
+        q1 = np.where(has_abs, _blend_q(cols["q1_abs"], cols["q1_rel"], new_alpha), q1)
+        q3 = np.where(has_abs, _blend_q(cols["q3_abs"], cols["q3_rel"], new_alpha), q3)
+        base_penalty = penalty / (1.0 - stored_alpha * 0.5)
+        penalty = np.where(has_abs, base_penalty * (1.0 - new_alpha * 0.5), penalty)
+
+    q_raw = q1 * w["w_q1"] + q3 * w["w_q3"]
+    return np.clip(q_raw - penalty, 0.0, 100.0)
+
+
+def combine_v(
+    cols: Dict[str, np.ndarray],
+    v_weights_with_sector: Optional[Dict[str, float]] = None,
+    v_weights_no_sector: Optional[Dict[str, float]] = None,
+) -> np.ndarray:
+    """v1〜v4 から V スコアを再合成する（v4 の有無で重みセットを切り替え）。"""
+    ws = _normalized(v_weights_with_sector or DEFAULT_V_WEIGHTS_WITH_SECTOR, ["v1", "v2", "v3", "v4"])
+    wn = _normalized(v_weights_no_sector or DEFAULT_V_WEIGHTS_NO_SECTOR, ["v1", "v2", "v3"])
+    v4 = cols["v4"]
+    with_sector = (cols["v1"] * ws["v1"] + cols["v2"] * ws["v2"]
+                   + cols["v3"] * ws["v3"] + np.nan_to_num(v4) * ws["v4"])
+    no_sector = cols["v1"] * wn["v1"] + cols["v2"] * wn["v2"] + cols["v3"] * wn["v3"]
+    return np.clip(np.where(np.isnan(v4), no_sector, with_sector), 0.0, 100.0)
+
+
+def combine_defense(cols: Dict[str, np.ndarray], d_weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+    """def1〜def6 から defensive_score を再合成する。"""
+    w = _normalized(d_weights or DEFAULT_D_WEIGHTS, list(DEFAULT_D_WEIGHTS.keys()))
+    d_index = 0.0
+    for wk, col in _D_WEIGHT_COLS:
+        d_i = cols[col] if col == "def6" else 1.0 - cols[col]
+        d_index = d_index + d_i * w[wk]
+    return 1.0 - np.clip(d_index, 0.0, 1.0)
+
+
+def combine_qvt(
+    cols: Dict[str, np.ndarray],
+    weights: Optional[Dict[str, Dict[str, float]]] = None,
+) -> np.ndarray:
+    """
+    サブスコアから QVT を再合成する。
+
+    weights は DEFAULT_WEIGHT_SETS と同じキー構成の部分 dict
+    （例: {"qvt": {...}, "q": {...}}）。未指定グループはデフォルト。
+    """
+    weights = weights or {}
+    q = combine_q(cols, weights.get("q"))
+    v = combine_v(cols, weights.get("v_sector"), weights.get("v_no_sector"))
+    # QVT 重みは indicators.calc_qvt_score と同じく正規化せずに使う
+    w = weights.get("qvt") or DEFAULT_QVT_WEIGHTS
+    return q * w["q"] + v * w["v"] + cols["t_score"] * w["t"]
+
+
+def panel_columns(panel: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """合成関数に渡す {列名: float 配列}。"""
+    return {col: panel[col].to_numpy(dtype=float) for col in SUBSCORE_COLS}
+
+
+def rescore_panel(
+    panel: pd.DataFrame,
+    weights: Optional[Dict[str, Dict[str, float]]] = None,
+    q_alpha: Optional[float] = None,
+) -> pd.DataFrame:
+    """
+    パネル全行の最終スコアを再合成して返す（ネットワーク・サブスコア計算なし）。
+
+    Parameters
+    ----------
+    weights : DEFAULT_WEIGHT_SETS と同じキー構成の部分 dict。未指定はデフォルト。
+    q_alpha : Q の相対評価ブレンド比率を一律に差し替える場合に指定
+
+    Returns
+    -------
+    pd.DataFrame
+        キー列 + q_score / v_score / t_score / qvt_score / defensive_score
+        （丸めは q/v/qvt が小数1桁、defensive が4桁で各 *_logic と同じ）
+    """
+    weights = weights or {}
+    cols = panel_columns(panel)
+    q = combine_q(cols, weights.get("q"), alpha=q_alpha)
+    v = combine_v(cols, weights.get("v_sector"), weights.get("v_no_sector"))
+    w = weights.get("qvt") or DEFAULT_QVT_WEIGHTS
+    qvt = q * w["q"] + v * w["v"] + cols["t_score"] * w["t"]
+
+    out = panel[KEY_COLS].copy()
+    out["q_score"] = np.round(q, 1)
+    out["v_score"] = np.round(v, 1)
+    out["t_score"] = cols["t_score"]
+    out["qvt_score"] = np.round(qvt, 1)
+    out["defensive_score"] = np.round(combine_defense(cols, weights.get("d")), 4)
+    return out
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 永続化（SQLite、(ticker, as_of) で upsert）
+# ═══════════════════════════════════════════════════════════════════════════
+
+def panel_row_from_tech(ticker: str, tech: Dict[str, Any], as_of=None) -> Dict[str, Any]:
+    """
+    compute_indicators の tech dict からパネル1行を作る。
+
+    as_of 未指定時は tech["df"] の最終日付（なければ当日）。
+    """
+    if as_of is None:
+        df = tech.get("df")
+        as_of = df.index[-1] if df is not None and len(df) else pd.Timestamp.today()
+    row: Dict[str, Any] = {"ticker": ticker, "as_of": pd.Timestamp(as_of).normalize()}
+    for col in SUBSCORE_COLS:
+        value = tech.get(col)
+        row[col] = float(value) if isinstance(value, (int, float, np.number)) else np.nan
+    return row
+
+
+# SQLite ファイルの先頭16バイト（CSV の旧パネルと見分ける）
+_SQLITE_MAGIC = b"SQLite format 3\x00"
+PANEL_TABLE = "panel"
+BUSY_TIMEOUT_S = 10.0
+
+
+def _quote(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _is_sqlite(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(_SQLITE_MAGIC)) == _SQLITE_MAGIC
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    """パネルの SQLite を開く（無ければテーブルごと作る）。呼び出しごとに1接続。"""
+    if os.path.exists(path) and os.path.getsize(path) and not _is_sqlite(path):
+        raise ValueError(
+            f"{path} は CSV 形式の旧パネルです。import_csv_panel(csv_path, 新しいパス) で移行してください。"
+        )
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_S)
+    conn.execute("PRAGMA journal_mode=WAL")
+    cols = ", ".join(f"{_quote(c)} REAL" for c in SUBSCORE_COLS)
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {PANEL_TABLE} ("
+        f"ticker TEXT NOT NULL, as_of TEXT NOT NULL, {cols}, PRIMARY KEY (ticker, as_of))"
+    )
+    return conn
+
+
+def _ensure_columns(conn: sqlite3.Connection, columns: Sequence[str]) -> None:
+    """SUBSCORE_COLS 以外の列（fwd_<h> など）を必要に応じて追加する。"""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({PANEL_TABLE})")}
+    for col in columns:
+        if col in existing:
+            continue
+        try:
+            conn.execute(f"ALTER TABLE {PANEL_TABLE} ADD COLUMN {_quote(col)}")
+        except sqlite3.OperationalError:
+            # 他のプロセスが同時に追加した
+            pass
+
+
+def load_panel(path: Optional[str] = None) -> pd.DataFrame:
+    """保存済みパネルを読み込む。ファイルがなければ空パネル。"""
+    path = path or SCORE_PANEL_PATH
+    if not path or not os.path.exists(path):
+        return make_subscore_panel([])
+    conn = _connect(path)
+    try:
+        frame = pd.read_sql_query(f"SELECT * FROM {PANEL_TABLE} ORDER BY ticker, as_of", conn)
+    finally:
+        conn.close()
+    return make_subscore_panel(frame)
+
+
+def upsert_panel(rows, path: Optional[str] = None) -> int:
+    """
+    行（dict のリスト or DataFrame）を (ticker, as_of) キーで upsert する。書いた行数を返す。
+
+    SQLite の INSERT OR REPLACE なので、既存行を読み直さず（パネルの大きさに依存しない）、
+    複数スレッド・複数プロセスから同時に呼んでも行は失われない。
+    """
+    path = path or SCORE_PANEL_PATH
+    if not path:
+        raise ValueError("保存先が指定されていません（SCORE_PANEL_PATH）。")
+
+    new = make_subscore_panel(rows)
+    if new.empty:
+        return 0
+    new = new.drop_duplicates(subset=KEY_COLS, keep="last")
+    new["as_of"] = new["as_of"].dt.strftime("%Y-%m-%d")
+    new = new.astype(object).where(new.notna(), None)
+
+    columns = list(new.columns)
+    sql = (
+        f"INSERT OR REPLACE INTO {PANEL_TABLE} ({', '.join(_quote(c) for c in columns)}) "
+        f"VALUES ({', '.join('?' for _ in columns)})"
+    )
+    conn = _connect(path)
+    try:
+        _ensure_columns(conn, columns)
+        with conn:
+            conn.executemany(sql, new.itertuples(index=False, name=None))
+    finally:
+        conn.close()
+    return len(new)
+
+
+def import_csv_panel(csv_path: str, path: Optional[str] = None) -> int:
+    """CSV 形式の旧パネルを SQLite のパネルへ取り込む。取り込んだ行数を返す。"""
+    return upsert_panel(pd.read_csv(csv_path), path)
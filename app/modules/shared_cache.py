@@ -0,0 +1,292 @@
+"""
+shared_cache.py
+────────────────────────────────────────────────────────────────────────────
+ホスト内の全 Streamlit プロセスで共有するキャッシュ（ローカル SQLite ファイル）
+
+【背景】
+  StageCache（modules.pipeline）はプロセス内の dict なので、同じホストで
+  ワーカーを複数立てると、各プロセスが同じ銘柄の価格・ファンダ・ベンチマークを
+  取り直し、同じ分析を計算し直す。外部サービスは増やさず、ホストのローカル
+  ファイル1つを全プロセスの温まったキャッシュとして使う。
+
+【共有するもの】
+  stage 出力 : price / primary_fundamentals / benchmark / benchmark_raw
+               （pipeline.SharedStageCache 経由。Stage.cache_shared=False の
+                 yf_info は yfinance の Ticker オブジェクトを含むのでプロセス内のみ）
+  分析結果   : ui.output_structure が AnalysisResult を "analysis:<ticker>" で保存
+  参照データ : 対象外。各プロセスが ref_bundle.bin（modules.ref_data）から数 ms で
+               復元する（値はプロセスごと。共有されるのはファイルのページキャッシュだけ）
+
+【保存形式】
+  テーブル entries(key, value, size, stored_at, expires_at, accessed_at)
+    value      : pickle（protocol 5）。pickle できない値は保存しない（set が False）
+    stored_at  : 壁時計（time.time）。プロセス間で比較できるように monotonic は使わない
+    expires_at : set 時の ttl から。get 側の ttl でも判定する（短い方が効く）
+  合計サイズが max_bytes を超えたら、期限切れ → accessed_at の古い順に削除して
+  max_bytes の 90% まで下げる（LRU）。accessed_at の更新は ACCESS_RESOLUTION 秒に1回。
+
+【並行性】
+  WAL モード + busy_timeout。接続はスレッドごと（fork 後は作り直す）。
+  ロック待ちの超過・ディスクエラーなどはキャッシュなしとして続行する
+  （get は None、set は False）。
+
+【セキュリティ】
+  値は pickle なので、読み出し（pickle.loads）で任意のコードが実行されうる。
+  SHARED_CACHE_PATH のファイル（と -wal / -shm）に書き込めるプロセスは、
+  このキャッシュを使う全ワーカーでコードを実行できる。アプリと同じユーザーだけが
+  書ける場所に置くこと（/tmp 直下のような共有ディレクトリは不可）。
+  SharedCache はディレクトリを 0700、ファイルを 0600 で作る（umask に任せない）。
+  既にあるファイル・ディレクトリの権限は変更しない。
+
+【設定】（環境変数）
+  SHARED_CACHE_PATH   : SQLite ファイルのパス。未設定なら共有しない（従来どおり）
+  SHARED_CACHE_MAX_MB : サイズ上限（既定 256）
+
+【使い方】
+  store = shared_cache()            # 未設定なら None
+  store.set("analysis:7203.T", result, ttl=300)
+  store.get("analysis:7203.T", ttl=300)
+  CLI（app/ で）: python -m modules.shared_cache [stats|clear|evict]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+SHARED_CACHE_PATH = os.environ.get("SHARED_CACHE_PATH", "")
+SHARED_CACHE_MAX_MB = float(os.environ.get("SHARED_CACHE_MAX_MB", "256"))
+
+BUSY_TIMEOUT_S = 5.0
+ACCESS_RESOLUTION = 30.0       # accessed_at の更新間隔（秒）。読み出しごとの書き込みを避ける
+EVICT_TARGET = 0.9             # 退避後の目標サイズ（max_bytes に対する比）
+RECOUNT_EVERY = 64             # この回数の set ごとに合計サイズを実測し直す（他プロセスの書き込み分）
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS entries (
+        key         TEXT PRIMARY KEY,
+        value       BLOB NOT NULL,
+        size        INTEGER NOT NULL,
+        stored_at   REAL NOT NULL,
+        expires_at  REAL,
+        accessed_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed_at)",
+)
+
+
+class SharedCache:
+    """SQLite 1ファイルの key → 値ストア（TTL・サイズ上限つき、プロセス間・スレッド間で共有）。"""
+
+    def __init__(self, path: str, max_bytes: int = int(SHARED_CACHE_MAX_MB * 1024 * 1024)):
+        self.path = os.path.abspath(path)
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._size_lock = threading.Lock()
+        self._approx_bytes: Optional[int] = None
+        self._sets = 0
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            os.chmod(directory, 0o700)
+        # SQLite に作らせると umask 次第で他ユーザーから書けてしまう。-wal / -shm は
+        # SQLite が本体と同じ権限で作る
+        os.close(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600))
+        conn = self._conn()
+        for sql in _SCHEMA:
+            conn.execute(sql)
+
+    # ── 接続 ──
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_S, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    # ── 読み書き ──
+
+    def lookup(self, key: str, ttl: Optional[float] = None) -> Optional[Tuple[float, Any]]:
+        """(stored_at, 値)。無い・期限切れ・読めないときは None。stored_at は壁時計。"""
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT value, stored_at, expires_at, accessed_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            blob, stored_at, expires_at, accessed_at = row
+            if (expires_at is not None and now > expires_at) or (ttl is not None and now - stored_at > ttl):
+                return None
+            value = pickle.loads(blob)
+            if now - accessed_at > ACCESS_RESOLUTION:
+                conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        except (sqlite3.Error, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+        return stored_at, value
+
+    def get(self, key: str, ttl: Optional[float] = None, default: Any = None) -> Any:
+        hit = self.lookup(key, ttl)
+        return default if hit is None else hit[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """保存する。pickle できない値・書き込み失敗は False（呼び出し側はそのまま続行）。"""
+        try:
+            blob = pickle.dumps(value, protocol=5)
+        except Exception:
+            return False
+        if len(blob) > self.max_bytes:
+            return False
+        now = time.time()
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, stored_at, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now, None if ttl is None else now + ttl, now),
+            )
+        except sqlite3.Error:
+            return False
+        self._account(len(blob))
+        return True
+
+    def delete(self, key: str) -> None:
+        try:
+            self._conn().execute("DELETE FROM entries WHERE key = ?", (key,))
+        except sqlite3.Error:
+            pass
+
+    def clear(self) -> None:
+        try:
+            self._conn().execute("DELETE FROM entries")
+        except sqlite3.Error:
+            pass
+        with self._size_lock:
+            self._approx_bytes = 0
+
+    # ── サイズ管理 ──
+
+    def _account(self, added: int) -> None:
+        # 合計は他プロセスの書き込みでも増える。普段は自プロセスの書き込みを足すだけの概算で、
+        # RECOUNT_EVERY 回ごとに実測し直す。概算が上限を超えたら退避する
+        with self._size_lock:
+            self._sets += 1
+            if self._approx_bytes is None or self._sets % RECOUNT_EVERY == 0:
+                self._approx_bytes = self.total_bytes()
+            else:
+                self._approx_bytes += added
+            over = self._approx_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def total_bytes(self) -> int:
+        try:
+            return int(self._conn().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0])
+        except sqlite3.Error:
+            return 0
+
+    def evict(self) -> Dict[str, int]:
+        """期限切れを消し、まだ max_bytes を超えていれば古くアクセスされた順に消す。"""
+        removed = {"expired": 0, "lru": 0}
+        try:
+            conn = self._conn()
+            removed["expired"] = conn.execute(
+                "DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+            ).rowcount
+            total = self.total_bytes()
+            if total > self.max_bytes:
+                excess = total - int(self.max_bytes * EVICT_TARGET)
+                victims: List[str] = []
+                for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+                    if excess <= 0:
+                        break
+                    victims.append(key)
+                    excess -= size
+                conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in victims])
+                removed["lru"] = len(victims)
+        except sqlite3.Error:
+            pass
+        with self._size_lock:
+            self._approx_bytes = self.total_bytes()
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            count, total, expired = self._conn().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), "
+                "COALESCE(SUM(expires_at IS NOT NULL AND expires_at < ?), 0) FROM entries",
+                (time.time(),),
+            ).fetchone()
+        except sqlite3.Error:
+            count, total, expired = 0, 0, 0
+        return {
+            "path": self.path,
+            "entries": int(count),
+            "expired": int(expired),
+            "bytes": int(total),
+            "max_bytes": self.max_bytes,
+        }
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# プロセス共有のインスタンス
+# ═══════════════════════════════════════════════════════════════════════════
+
+_lock = threading.Lock()
+_store: Optional[SharedCache] = None
+_opened = False
+
+
+def shared_cache() -> Optional[SharedCache]:
+    """SHARED_CACHE_PATH の SharedCache（プロセスで1つ）。未設定・開けないときは None。"""
+    global _store, _opened
+    if _opened:
+        return _store
+    with _lock:
+        if not _opened:
+            if SHARED_CACHE_PATH:
+                try:
+                    _store = SharedCache(SHARED_CACHE_PATH)
+                except (sqlite3.Error, OSError):
+                    _store = None
+            _opened = True
+    return _store
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# CLI
+# ═══════════════════════════════════════════════════════════════════════════
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="ホスト共有キャッシュ（SQLite）の確認・削除")
+    parser.add_argument("command", nargs="?", default="stats", choices=("stats", "clear", "evict"))
+    parser.add_argument("--path", default=SHARED_CACHE_PATH, help="SQLite ファイル（既定 SHARED_CACHE_PATH）")
+    args = parser.parse_args(argv)
+
+    if not args.path:
+        parser.error("SHARED_CACHE_PATH が未設定です（--path で指定）")
+    store = SharedCache(args.path)
+    if args.command == "clear":
+        store.clear()
+    elif args.command == "evict":
+        print(store.evict())
+    for k, v in store.stats().items():
+        print(f"{k:<10} {v}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,8 +12,9 @@ t_logic.py
 - T モード（順張り / 逆張り）とラベル
 """
 
-from typing import Tuple, Optional, Dict, Any
+from typing import Tuple, Optional, Dict, Any, List
 
+import numpy as np
 import pandas as pd
 
 # -----------------------------------------------------------
@@ -521,3 +522,132 @@ def compute_t_metrics(
         "slope_ok": slope_ok,
         "is_flat_or_gentle_up": is_flat_or_gentle_up,
     }
+
+
+# -----------------------------------------------------------
+# パネル版：日付 × 銘柄の T スコア一括計算（バックテスト用）
+# -----------------------------------------------------------
+
+# T スコアに必要な最大ルックバック（52週レンジ / 75MA + 傾き4本）
+T_LOOKBACK_DAYS = 252
+
+
+def compute_t_score_panel(
+    close: pd.DataFrame,
+    high: Optional[pd.DataFrame] = None,
+    low: Optional[pd.DataFrame] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    終値パネル（index=日付, columns=銘柄）から各日時点の T スコアを一括計算する。
+
+    compute_t_block → calc_timing_score を「その日までのデータ」で
+    呼んだ値と同じ（52週高値/安値は直近252日、High/Low がなければ終値）。
+    指標が揃わない日は NaN。
+
+    日米混在パネルのように日付が各市場の営業日の和集合で、銘柄ごとに
+    休場日の NaN が挟まる場合は、終値のある行が同じ銘柄をまとめ、その行だけで
+    計算して元の日付へ戻す（rolling が NaN を引きずって列全体が NaN になるのを防ぐ）。
+    その銘柄の休場日は NaN。
+
+    Returns
+    -------
+    dict:
+        t_score, rsi, ma_25, ma_50, ma_75, slope_25 の各 DataFrame
+    """
+    close = close.astype(float)
+    if not close.isna().to_numpy().any():
+        return _t_score_frames(close, high, low)
+
+    # 休場日の並びが同じ銘柄（同じ市場の銘柄）をまとめて1回で計算する
+    valid = close.notna().to_numpy()
+    groups: Dict[bytes, List[int]] = {}
+    for j in range(valid.shape[1]):
+        groups.setdefault(valid[:, j].tobytes(), []).append(j)
+
+    parts: Dict[str, list] = {}
+    order: List[int] = []
+    for positions in groups.values():
+        rows = valid[:, positions[0]]
+        cols = close.columns[positions]
+        frames = _t_score_frames(
+            close.loc[rows, cols],
+            high.loc[rows, cols] if high is not None else None,
+            low.loc[rows, cols] if low is not None else None,
+        )
+        for name, frame in frames.items():
+            parts.setdefault(name, []).append(frame.reindex(close.index))
+        order.extend(positions)
+    if not parts:
+        return _t_score_frames(close, high, low)
+    restore = np.argsort(order)
+    return {name: pd.concat(frames, axis=1).iloc[:, restore] for name, frames in parts.items()}
+
+
+def _t_score_frames(
+    close: pd.DataFrame,
+    high: Optional[pd.DataFrame],
+    low: Optional[pd.DataFrame],
+) -> Dict[str, pd.DataFrame]:
+    """compute_t_score_panel の本体（close に途中の NaN が無い前提）。"""
+    close = close.astype(float)
+    ma_25 = close.rolling(25).mean()
+    ma_50 = close.rolling(50).mean()
+    ma_75 = close.rolling(75).mean()
+
+    ma_20  = close.rolling(20).mean()
+    std_20 = close.rolling(20).std()
+    bb_plus1,  bb_plus2  = ma_20 + std_20, ma_20 + 2 * std_20
+    bb_minus1, bb_minus2 = ma_20 - std_20, ma_20 - 2 * std_20
+
+    delta = close.diff()
+    avg_gain = delta.clip(lower=0).rolling(14).mean()
+    avg_loss = (-delta.clip(upper=0)).rolling(14).mean().replace(0, 1e-10)
+    rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+
+    # calc_slope(window=4): 4本前の MA との変化率（%）
+    ma_25_prev = ma_25.shift(4)
+    slope_25 = ((ma_25 - ma_25_prev) / ma_25_prev * 100.0).where(ma_25_prev != 0, 0.0)
+    slope_25 = slope_25.where(ma_25_prev.notna(), 0.0)
+
+    high_52w = (high if high is not None else close).astype(float).rolling(T_LOOKBACK_DAYS, min_periods=1).max()
+    low_52w  = (low  if low  is not None else close).astype(float).rolling(T_LOOKBACK_DAYS, min_periods=1).min()
+
+    price = close.to_numpy()
+    r = rsi.to_numpy()
+    t = 50.0 + (50 - r) * 0.6
+
+    bp1, bp2 = bb_plus1.to_numpy(), bb_plus2.to_numpy()
+    bm1, bm2 = bb_minus1.to_numpy(), bb_minus2.to_numpy()
+    t = t + np.select(
+        [price <= bm2, price <= bm1, price >= bp2, price >= bp1],
+        [20.0, 10.0, -20.0, -10.0],
+        0.0,
+    )
+
+    hi, lo = high_52w.to_numpy(), low_52w.to_numpy()
+    has_range = (lo != 0) & (hi != 0) & (hi > lo)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pos = (price - lo) / (hi - lo)
+    t = t + np.where(has_range, (0.5 - pos) * 40, 0.0)
+
+    m25, m50, m75 = ma_25.to_numpy(), ma_50.to_numpy(), ma_75.to_numpy()
+    below_mas = (price < m25).astype(int) + (price < m50) + (price < m75)
+    t = t + below_mas * 5
+
+    sl = slope_25.to_numpy()
+    t = t + np.select([sl <= -1.0, sl < 0, sl >= 1.0], [-15.0, -5.0, 5.0], 0.0)
+
+    t = np.clip(np.round(t, 1), 0.0, 100.0)
+
+    valid = np.isfinite(price) & np.isfinite(r) & np.isfinite(m25) & np.isfinite(m50) & np.isfinite(m75) \
+        & np.isfinite(bp1) & np.isfinite(bm1)
+    t = np.where(valid, t, np.nan)
+
+    return {
+        "t_score":  pd.DataFrame(t, index=close.index, columns=close.columns),
+        "rsi":      rsi,
+        "ma_25":    ma_25,
+        "ma_50":    ma_50,
+        "ma_75":    ma_75,
+        "slope_25": slope_25,
+    }
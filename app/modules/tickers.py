@@ -0,0 +1,25 @@
+"""
+tickers.py
+────────────────────────────────────────────────────────────────────────────
+ティッカー文字列の正規化（外部依存なし）
+
+skin は入力欄の値を convert_ticker() で正規化するだけなので、
+yfinance / requests を読み込む modules.data_fetch ではなくここから import する。
+modules.data_fetch からも同じ名前で import できる。
+"""
+
+
+def convert_ticker(raw: str) -> str:
+    t = raw.strip().upper()
+    if not t:
+        return ""
+    if t.endswith(".T"):
+        return t
+    if t.isdigit() and 4 <= len(t) <= 5:
+        return t + ".T"
+    return t
+
+
+def is_jpx_ticker(ticker: str) -> bool:
+    t = ticker.strip().upper()
+    return t.endswith(".T") or (t.isdigit() and 4 <= len(t) <= 5)
@@ -0,0 +1,278 @@
+"""
+tracing.py
+────────────────────────────────────────────────────────────────────────────
+処理時間の計測（スパン / トレース / ローリング分位点）
+
+【使い方】
+  with trace("request", ui="classic") as tr:      # 1リクエスト = 1トレース
+      with span("yf.download", ticker="7203.T"):  # 計測したい区間
+          ...
+  tr.summary()           → {スパン名: 合計秒}
+  SPAN_STATS.snapshot()  → {スパン名: {count, mean, p50, p90, p99}}
+
+  関数全体を計測する場合は @traced("d_logic.score_defense")。
+
+【設計メモ】
+  - 現在のトレースと親スパンは contextvars で持つ。スレッドプールへ
+    投入する側（modules.pipeline）は contextvars.copy_context() で
+    コンテキストを引き継ぐので、並行ステージのスパンも同じトレースに入る
+  - スパンはトレースの外でも SPAN_STATS（直近 ROLLING_WINDOW 件）に集計される
+  - 環境変数 TRACE_LOG_PATH が設定されていれば、完了したトレースを
+    JSON Lines で追記する（1行 = 1トレース）。回帰の追跡用
+  - 計測のオーバーヘッドは perf_counter 2回 + リスト追加程度
+"""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Iterator, Callable, Deque
+
+import numpy as np
+
+
+TRACE_LOG_PATH = os.environ.get("TRACE_LOG_PATH", "")
+ROLLING_WINDOW = 500
+PERCENTILES = (50, 90, 99)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# レコード
+# ═══════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class SpanRecord:
+    name: str
+    start: float                  # トレース開始からの秒
+    duration: float               # 秒
+    parent: Optional[str] = None
+    depth: int = 0
+    thread: str = ""
+    attrs: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration": round(self.duration, 6),
+            "parent": self.parent,
+            "depth": self.depth,
+            "thread": self.thread,
+            "attrs": self.attrs,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """1リクエスト分のスパン集合（複数スレッドから追記される）。"""
+
+    def __init__(self, name: str, attrs: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.attrs: Dict[str, Any] = dict(attrs or {})
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.spans: List[SpanRecord] = []
+        self._lock = threading.Lock()
+
+    def add(self, record: SpanRecord) -> None:
+        with self._lock:
+            self.spans.append(record)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def summary(self) -> Dict[str, float]:
+        """スパン名ごとの合計秒（同名スパンは合算）。"""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for s in self.spans:
+                totals[s.name] = totals.get(s.name, 0.0) + s.duration
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration": self.duration if self.duration is not None else self.elapsed(),
+            "attrs": self.attrs,
+            "spans": [s.to_dict() for s in spans],
+        }
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# ローリング集計
+# ═══════════════════════════════════════════════════════════════════════════
+
+class RollingStats:
+    """スパン名ごとに直近 window 件の所要時間を保持し、分位点を返す。"""
+
+    def __init__(self, window: int = ROLLING_WINDOW):
+        self.window = window
+        self._data: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, duration: float) -> None:
+        with self._lock:
+            buf = self._data.get(name)
+            if buf is None:
+                buf = self._data[name] = deque(maxlen=self.window)
+            buf.append(duration)
+
+    def percentiles(self, name: str, qs=PERCENTILES) -> Dict[str, float]:
+        with self._lock:
+            values = list(self._data.get(name, ()))
+        if not values:
+            return {}
+        arr = np.asarray(values, dtype=float)
+        out = {"count": len(values), "mean": float(arr.mean())}
+        for q, v in zip(qs, np.percentile(arr, qs)):
+            out[f"p{q}"] = float(v)
+        return out
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            names = sorted(self._data)
+        return {name: self.percentiles(name) for name in names}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+SPAN_STATS = RollingStats()
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# コンテキスト
+# ═══════════════════════════════════════════════════════════════════════════
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("_current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("_current_span", default=None)
+_current_depth: contextvars.ContextVar[int] = contextvars.ContextVar("_current_depth", default=0)
+
+_export_lock = threading.Lock()
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Dict[str, Any]]:
+    """
+    区間を計測する。yield される dict に属性を追記できる
+    （例: キャッシュヒットの有無を後から記録）。
+    """
+    tr = _current_trace.get()
+    parent = _current_span.get()
+    depth = _current_depth.get()
+    span_token = _current_span.set(name)
+    depth_token = _current_depth.set(depth + 1)
+    error: Optional[str] = None
+    started = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as exc:
+        error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        _current_span.reset(span_token)
+        _current_depth.reset(depth_token)
+        SPAN_STATS.add(name, duration)
+        if tr is not None:
+            tr.add(SpanRecord(
+                name=name,
+                start=started - tr._t0,
+                duration=duration,
+                parent=parent,
+                depth=depth,
+                thread=threading.current_thread().name,
+                attrs=attrs,
+                error=error,
+            ))
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """関数全体を span で囲むデコレータ。name 省略時は module.qualname。"""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def trace(name: str, export_path: Optional[str] = None, **attrs) -> Iterator[Trace]:
+    """
+    トレースを開始する。ネストした場合は外側のトレースをそのまま使う。
+
+    終了時に全体の所要時間を SPAN_STATS へ記録し、export_path
+    （省略時は TRACE_LOG_PATH）があれば JSON Lines で書き出す。
+    """
+    outer = _current_trace.get()
+    if outer is not None:
+        yield outer
+        return
+
+    tr = Trace(name, attrs)
+    token = _current_trace.set(tr)
+    try:
+        yield tr
+    finally:
+        _current_trace.reset(token)
+        tr.duration = tr.elapsed()
+        SPAN_STATS.add(f"trace:{name}", tr.duration)
+        path = export_path if export_path is not None else TRACE_LOG_PATH
+        if path and tr.spans:
+            try:
+                export_jsonl(tr, path)
+            except OSError:
+                # 書き出し失敗は処理を止めない
+                pass
+
+
+def export_jsonl(tr: Trace, path: str) -> None:
+    """トレースを JSON Lines 形式で1行追記する。"""
+    line = json.dumps(tr.to_dict(), ensure_ascii=False, default=str)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with _export_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def load_jsonl(path: str) -> List[Dict[str, Any]]:
+    """export_jsonl で書き出したトレースを読み込む（壊れた行は無視）。"""
+    if not path or not os.path.exists(path):
+        return []
+    traces = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                traces.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return traces
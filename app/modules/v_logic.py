@@ -26,7 +26,11 @@ V（バリュエーション）スコア — 4サブスコア構造
   - 配当利回り「高配当＝衰退企業」問題 → V3 ウェイトを 0.10 に抑制
 """
 
-from typing import Optional, Dict
+from bisect import bisect_right
+from typing import Optional, Dict, Any, Tuple
+
+import numpy as np
+import pandas as pd
 
 
 # ─── デフォルト重み（V内部） ─────────────────────────────────────────
@@ -79,6 +83,43 @@ def _normalize_weights(weights: Dict[str, float], keys: list[str]) -> Dict[str,
     return {k: v / total for k, v in filtered.items()}
 
 
+# ─── 市場別ブレークポイント ─────────────────────────────────────────
+#
+# (境界, 点数): 境界は昇順。値 x の点数は points[bisect_right(edges, x)]
+#   = 「x 未満となる最初の境界」の段の点数（x が全境界以上なら末尾）。
+# スカラー版は bisect、バッチ版は np.digitize で同じ表を引く。
+# NaN は bisect では末尾の段になってしまうので、どちらも欠損として扱う。
+# キーは is_us。
+
+_Breakpoints = Tuple[Tuple[float, ...], Tuple[float, ...]]
+
+_V_BREAKPOINTS: Dict[bool, Dict[str, _Breakpoints]] = {
+    False: {
+        "per":       ((8, 12, 20, 30, 40),  (30, 26, 20, 10, 5, 0)),
+        "pbr":       ((0.8, 1.2, 2.0, 3.0), (25, 20, 10, 5, 0)),
+        "ev_ebitda": ((5, 8, 12, 16, 22),   (100.0, 85.0, 65.0, 45.0, 25.0, 10.0)),
+        "dividend":  ((1, 2, 3, 5),         (20.0, 35.0, 55.0, 80.0, 100.0)),
+    },
+    True: {
+        "per":       ((15, 20, 28, 40, 55),  (30, 26, 20, 10, 5, 0)),
+        "pbr":       ((2.0, 4.0, 6.0, 10.0), (25, 20, 10, 5, 0)),
+        "ev_ebitda": ((8, 12, 18, 25, 35),   (100.0, 85.0, 65.0, 45.0, 25.0, 10.0)),
+        "dividend":  ((0.5, 1.0, 2.0, 3.0),  (20.0, 35.0, 55.0, 80.0, 100.0)),
+    },
+}
+
+_V1_MAX_RAW = 30 + 25       # PER 満点 + PBR 満点
+_V_NEUTRAL = 50.0           # EV/EBITDA・配当利回りが欠損のときの中立点
+
+
+def _lookup(x: Optional[float], table: _Breakpoints, missing: float = _V_NEUTRAL) -> float:
+    """表を引く。None / NaN は欠損として missing を返す（バッチ版の np.isnan 判定と同じ）。"""
+    if x is None or x != x:
+        return missing
+    edges, points = table
+    return points[bisect_right(edges, x)]
+
+
 # ─── V1: 伝統的割安（絶対値） ─────────────────────────────────────────
 
 def _score_v1_traditional(
@@ -86,78 +127,32 @@ def _score_v1_traditional(
     pbr: Optional[float],
     is_us: bool = False,
 ) -> float:
+    bp = _V_BREAKPOINTS[bool(is_us)]
     raw = 0.0
 
     if per is not None and per > 0:
-        if is_us:
-            if per < 15: raw += 30
-            elif per < 20: raw += 26
-            elif per < 28: raw += 20
-            elif per < 40: raw += 10
-            elif per < 55: raw += 5
-        else:
-            if per < 8: raw += 30
-            elif per < 12: raw += 26
-            elif per < 20: raw += 20
-            elif per < 30: raw += 10
-            elif per < 40: raw += 5
+        raw += _lookup(per, bp["per"], missing=0.0)
 
     if pbr is not None and pbr > 0:
-        if is_us:
-            if pbr < 2.0: raw += 25
-            elif pbr < 4.0: raw += 20
-            elif pbr < 6.0: raw += 10
-            elif pbr < 10.0: raw += 5
-        else:
-            if pbr < 0.8: raw += 25
-            elif pbr < 1.2: raw += 20
-            elif pbr < 2.0: raw += 10
-            elif pbr < 3.0: raw += 5
+        raw += _lookup(pbr, bp["pbr"], missing=0.0)
 
-    max_raw = 30 + 25
-    return max(0.0, min(100.0, raw / max_raw * 100.0))
+    return max(0.0, min(100.0, raw / _V1_MAX_RAW * 100.0))
 
 
 # ─── V2: EV/EBITDA ─────────────────────────────────────────
 
 def _score_v2_ev_ebitda(ev_ebitda: Optional[float], is_us: bool = False) -> float:
     if ev_ebitda is None or ev_ebitda <= 0:
-        return 50.0
-
-    if is_us:
-        if ev_ebitda < 8: return 100.0
-        elif ev_ebitda < 12: return 85.0
-        elif ev_ebitda < 18: return 65.0
-        elif ev_ebitda < 25: return 45.0
-        elif ev_ebitda < 35: return 25.0
-        else: return 10.0
-    else:
-        if ev_ebitda < 5: return 100.0
-        elif ev_ebitda < 8: return 85.0
-        elif ev_ebitda < 12: return 65.0
-        elif ev_ebitda < 16: return 45.0
-        elif ev_ebitda < 22: return 25.0
-        else: return 10.0
+        return _V_NEUTRAL
+    return _lookup(ev_ebitda, _V_BREAKPOINTS[bool(is_us)]["ev_ebitda"])
 
 
 # ─── V3: 配当利回り ─────────────────────────────────────────
 
 def _score_v3_dividend(dividend_yield: Optional[float], is_us: bool = False) -> float:
     if not dividend_yield:
-        return 50.0
-
-    if is_us:
-        if dividend_yield >= 3.0: return 100.0
-        elif dividend_yield >= 2.0: return 80.0
-        elif dividend_yield >= 1.0: return 55.0
-        elif dividend_yield >= 0.5: return 35.0
-        return 20.0
-    else:
-        if dividend_yield >= 5: return 100.0
-        elif dividend_yield >= 3: return 80.0
-        elif dividend_yield >= 2: return 55.0
-        elif dividend_yield >= 1: return 35.0
-        return 20.0
+        return _V_NEUTRAL
+    return _lookup(dividend_yield, _V_BREAKPOINTS[bool(is_us)]["dividend"])
 
 
 # ─── メイン関数 ─────────────────────────────────────────
@@ -177,6 +172,10 @@ def score_valuation(
     v2 = _score_v2_ev_ebitda(ev_ebitda, is_us=is_us)
     v3 = _score_v3_dividend(dividend_yield, is_us=is_us)
 
+    # NaN / inf の V4 はセクターなし扱い（バッチ版の has_sector と同じ）
+    if sector_v_score is not None and not np.isfinite(sector_v_score):
+        sector_v_score = None
+
     if sector_v_score is not None:
         weights = _normalize_weights(
             v_weights_with_sector or DEFAULT_V_WEIGHTS_WITH_SECTOR,
@@ -224,17 +223,22 @@ def compute_v_block(
     ev_ebitda: Optional[float] = None,
     sector_v_score: Optional[float] = None,
     is_us: bool = False,
+    valuation_inputs: Optional[Dict[str, Optional[float]]] = None,
 ) -> Dict[str, Dict]:
     """
     indicators 向けに V スコア計算結果と関連入力をまとめて返す。
+
+    valuation_inputs（build_valuation_inputs の結果）が渡された場合は
+    それをそのまま使い、PER / PBR を組み立て直さない。
     """
-    valuation_inputs = build_valuation_inputs(
-        price=price,
-        eps=eps,
-        bps=bps,
-        eps_fwd=eps_fwd,
-        per_fwd=per_fwd,
-    )
+    if valuation_inputs is None:
+        valuation_inputs = build_valuation_inputs(
+            price=price,
+            eps=eps,
+            bps=bps,
+            eps_fwd=eps_fwd,
+            per_fwd=per_fwd,
+        )
     v_result = score_valuation(
         per=valuation_inputs["per"],
         pbr=valuation_inputs["pbr"],
@@ -255,3 +259,86 @@ def compute_v_block(
             "has_sector": v_result["has_sector"],
         },
     }
+
+
+# ─── バッチ（列指向） ─────────────────────────────────────────
+
+def _digitize(x: np.ndarray, table: _Breakpoints) -> np.ndarray:
+    edges, points = table
+    return np.asarray(points, dtype=float)[np.digitize(x, edges)]
+
+
+def _per_market(x: np.ndarray, is_us: np.ndarray, key: str) -> np.ndarray:
+    """市場ごとの表で引き、is_us マスクで合成する。"""
+    return np.where(
+        is_us,
+        _digitize(x, _V_BREAKPOINTS[True][key]),
+        _digitize(x, _V_BREAKPOINTS[False][key]),
+    )
+
+
+def _as_float_array(values, n: int) -> np.ndarray:
+    if values is None:
+        return np.full(n, np.nan)
+    return np.asarray(pd.to_numeric(pd.Series(values), errors="coerce"), dtype=float)
+
+
+def _round_exact(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """score_valuation と一致させるため Python の round で丸める（NaN は NaN）。"""
+    return np.array([round(v, ndigits) for v in values.tolist()], dtype=float)
+
+
+def score_valuation_batch(
+    per,
+    pbr,
+    dividend_yield,
+    ev_ebitda=None,
+    sector_v_score=None,
+    is_us=False,
+    v_weights_with_sector: Optional[Dict[str, float]] = None,
+    v_weights_no_sector: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    """
+    score_valuation の列指向版。各引数は同じ長さの配列（欠損は NaN / None）。
+
+    sector_v_score が NaN / inf の行は自動的に V4 なしの重みでリウェイトする。
+    結果は score_valuation と完全一致する。
+
+    Returns
+    -------
+    dict（全て長さ n の配列）:
+        v_score, v1, v2, v3, v4（NaN = セクターなし）, has_sector
+    """
+    per = np.asarray(pd.to_numeric(pd.Series(per), errors="coerce"), dtype=float)
+    n = len(per)
+    pbr = _as_float_array(pbr, n)
+    dy = _as_float_array(dividend_yield, n)
+    ev = _as_float_array(ev_ebitda, n)
+    v4 = _as_float_array(sector_v_score, n)
+    us = np.broadcast_to(np.asarray(is_us, dtype=bool), (n,))
+
+    raw = 0.0 + np.where(per > 0, _per_market(per, us, "per"), 0.0)
+    raw = raw + np.where(pbr > 0, _per_market(pbr, us, "pbr"), 0.0)
+    v1 = np.clip(raw / _V1_MAX_RAW * 100.0, 0.0, 100.0)
+
+    v2 = np.where(ev > 0, _per_market(ev, us, "ev_ebitda"), _V_NEUTRAL)
+    # `not dividend_yield`（None / 0）は中立点
+    v3 = np.where(np.isnan(dy) | (dy == 0), _V_NEUTRAL, _per_market(dy, us, "dividend"))
+
+    ws = _normalize_weights(v_weights_with_sector or DEFAULT_V_WEIGHTS_WITH_SECTOR, ["v1", "v2", "v3", "v4"])
+    wn = _normalize_weights(v_weights_no_sector or DEFAULT_V_WEIGHTS_NO_SECTOR, ["v1", "v2", "v3"])
+    has_sector = np.isfinite(v4)
+    v4 = np.where(has_sector, v4, np.nan)
+
+    with_sector = v1 * ws["v1"] + v2 * ws["v2"] + v3 * ws["v3"] + v4 * ws["v4"]
+    no_sector = v1 * wn["v1"] + v2 * wn["v2"] + v3 * wn["v3"]
+    v_final = np.clip(np.where(has_sector, with_sector, no_sector), 0.0, 100.0)
+
+    return {
+        "v_score": _round_exact(v_final, 1),
+        "v1": _round_exact(v1, 1),
+        "v2": _round_exact(v2, 1),
+        "v3": _round_exact(v3, 1),
+        "v4": _round_exact(v4, 1),
+        "has_sector": has_sector,
+    }
@@ -0,0 +1,357 @@
+"""
+weight_search.py
+────────────────────────────────────────────────────────────────────────────
+QVT / Q / V / D 重みの再探索（オフライン再現用）
+
+WEIGHT_Q / DEFAULT_V_WEIGHTS_* / CUSTOM_Q_WEIGHTS_BT はオフラインで
+フィットされた値。本モジュールはサブスコアパネル（score_panel）を
+入力として、重み候補を評価・探索する。
+
+【処理フロー】
+  ① パネルを日付 × 銘柄の密行列へ展開（1回だけ）
+     先行リターンの横断順位も事前に計算しておく
+  ② 候補重みごとに score_panel.combine_* で最終スコアを再合成
+     （サブスコアは再計算しない）
+  ③ 目的関数 = 日付ごとの順位IC（スコア順位 × 先行リターン順位の相関）の平均
+  ④ 候補を ProcessPoolExecutor でワーカーへ分配して並列評価
+     （ワーカー初期化時に密行列を1回だけ受け渡す）
+
+【探索方式】
+  grid       : 単体（重み和 = 1）上の等間隔グリッド
+  random     : Dirichlet 分布からのランダムサンプル
+  coordinate : 座標降下（1座標ずつ ±step で動かし、改善がなければ step を半減）
+
+【探索対象 target】
+  "qvt" / "q" / "v_sector" / "v_no_sector" / "d"
+  （score_panel.DEFAULT_WEIGHT_SETS のキー。対象外のグループはデフォルト固定）
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, Any, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from modules.score_panel import (
+    SUBSCORE_COLS,
+    DEFAULT_WEIGHT_SETS,
+    combine_qvt,
+    combine_q,
+    combine_v,
+    combine_defense,
+    fwd_col,
+)
+
+
+SEARCH_STRATEGIES = ("grid", "random", "coordinate")
+
+DEFAULT_GRID_STEP = 0.05
+DEFAULT_RANDOM_SAMPLES = 500
+DEFAULT_CD_STEP = 0.10
+DEFAULT_CD_MIN_STEP = 0.005
+DEFAULT_CD_MAX_ROUNDS = 50
+
+# 1日あたりの有効銘柄数がこれ未満の日は IC 計算から除外
+MIN_NAMES_PER_DATE = 5
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 評価コンテキスト（密行列）
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _row_rank(mat: np.ndarray) -> np.ndarray:
+    """行（日付）ごとの横断順位。NaN は NaN のまま、同順位は平均順位。"""
+    return pd.DataFrame(mat).rank(axis=1).to_numpy(dtype=float)
+
+
+def build_eval_context(panel: pd.DataFrame, horizon: int = 20) -> Dict[str, Any]:
+    """
+    サブスコアパネルを日付 × 銘柄の密行列に展開し、評価用コンテキストを作る。
+
+    Returns
+    -------
+    dict:
+        cols     : {サブスコア列: ndarray[n_dates, n_tickers]}
+        fwd_rank : 先行リターンの横断順位
+        dates / tickers : 行・列ラベル
+        horizon  : 先行リターンの営業日数
+    """
+    target = fwd_col(horizon)
+    if target not in panel.columns:
+        raise ValueError(f"パネルに {target} 列がありません（attach_forward_returns を先に実行）。")
+
+    dates = pd.Index(sorted(panel["as_of"].unique()))
+    tickers = pd.Index(sorted(panel["ticker"].unique()))
+    row = dates.get_indexer(panel["as_of"])
+    col = tickers.get_indexer(panel["ticker"])
+
+    def _dense(series: pd.Series) -> np.ndarray:
+        mat = np.full((len(dates), len(tickers)), np.nan)
+        mat[row, col] = series.to_numpy(dtype=float)
+        return mat
+
+    return {
+        "cols":     {c: _dense(panel[c]) for c in SUBSCORE_COLS},
+        "fwd_rank": _row_rank(_dense(panel[target])),
+        "dates":    dates,
+        "tickers":  tickers,
+        "horizon":  horizon,
+    }
+
+
+def mean_rank_ic(signal: np.ndarray, fwd_rank: np.ndarray) -> float:
+    """
+    日付ごとの順位IC（Spearman 相関）の平均。
+
+    シグナルと先行リターンの両方が有効な銘柄のみで順位を付け直す。
+    """
+    sig = np.where(np.isnan(fwd_rank), np.nan, signal)
+    ok = ~np.isnan(sig)
+    sig_rank = _row_rank(sig)
+    fwd = _row_rank(np.where(ok, fwd_rank, np.nan))
+
+    n = ok.sum(axis=1)
+    valid = n >= MIN_NAMES_PER_DATE
+    if not valid.any():
+        return float("nan")
+
+    sig_rank, fwd, ok = sig_rank[valid], fwd[valid], ok[valid]
+    xs = np.where(ok, sig_rank - np.nanmean(sig_rank, axis=1, keepdims=True), 0.0)
+    ys = np.where(ok, fwd - np.nanmean(fwd, axis=1, keepdims=True), 0.0)
+    num = (xs * ys).sum(axis=1)
+    den = np.sqrt((xs ** 2).sum(axis=1) * (ys ** 2).sum(axis=1))
+    ic = np.divide(num, den, out=np.full_like(num, np.nan), where=den > 0)
+    return float(np.nanmean(ic)) if np.isfinite(ic).any() else float("nan")
+
+
+def _signal_for(ctx: Dict[str, Any], target: str, candidate: Dict[str, float]) -> np.ndarray:
+    """探索対象グループだけ candidate に差し替えて最終スコアを再合成する。"""
+    cols = ctx["cols"]
+    if target == "d":
+        return combine_defense(cols, candidate)
+    if ctx.get("objective") == "component":
+        if target == "q":
+            return combine_q(cols, candidate)
+        if target == "v_sector":
+            return combine_v(cols, v_weights_with_sector=candidate)
+        if target == "v_no_sector":
+            return combine_v(cols, v_weights_no_sector=candidate)
+    return combine_qvt(cols, {target: candidate})
+
+
+def evaluate_weights(ctx: Dict[str, Any], target: str, candidate: Dict[str, float]) -> float:
+    """1候補の目的関数値（平均順位IC）。"""
+    return mean_rank_ic(_signal_for(ctx, target, candidate), ctx["fwd_rank"])
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 並列評価
+# ═══════════════════════════════════════════════════════════════════════════
+
+_WORKER_CTX: Optional[Dict[str, Any]] = None
+
+
+def _init_worker(ctx: Dict[str, Any]) -> None:
+    global _WORKER_CTX
+    _WORKER_CTX = ctx
+
+
+def _evaluate_chunk(target: str, candidates: List[Dict[str, float]]) -> List[float]:
+    return [evaluate_weights(_WORKER_CTX, target, c) for c in candidates]
+
+
+def _chunks(items: List[Any], n: int) -> List[List[Any]]:
+    size = max(1, -(-len(items) // n))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class _Evaluator:
+    """
+    候補リストをまとめて評価する。
+
+    max_workers > 1 のときはプロセスプールを1回だけ起動し、
+    座標降下の各ラウンドでも同じプールを使い回す。
+    """
+
+    def __init__(self, ctx: Dict[str, Any], target: str, max_workers: Optional[int]):
+        self.ctx = ctx
+        self.target = target
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self):
+        if self.max_workers > 1:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(self.ctx,),
+            )
+        return self
+
+    def __exit__(self, *exc):
+        if self._pool is not None:
+            self._pool.shutdown()
+        return False
+
+    def __call__(self, candidates: List[Dict[str, float]]) -> List[float]:
+        if self._pool is None or len(candidates) < self.max_workers:
+            return [evaluate_weights(self.ctx, self.target, c) for c in candidates]
+        parts = _chunks(candidates, self.max_workers * 4)
+        futures = [self._pool.submit(_evaluate_chunk, self.target, p) for p in parts]
+        return [score for f in futures for score in f.result()]
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 候補生成
+# ═══════════════════════════════════════════════════════════════════════════
+
+def grid_candidates(keys: Sequence[str], step: float = DEFAULT_GRID_STEP) -> List[Dict[str, float]]:
+    """重み和 = 1 の単体上グリッド（各重み > 0）。"""
+    n = int(round(1.0 / step))
+    k = len(keys)
+    out = []
+    for combo in itertools.combinations(range(1, n), k - 1):
+        parts = np.diff((0,) + combo + (n,))
+        out.append({key: round(p / n, 6) for key, p in zip(keys, parts)})
+    return out
+
+
+def random_candidates(
+    keys: Sequence[str],
+    n_samples: int = DEFAULT_RANDOM_SAMPLES,
+    seed: Optional[int] = 0,
+    concentration: float = 1.0,
+) -> List[Dict[str, float]]:
+    """Dirichlet(concentration) からのランダム重み。"""
+    rng = np.random.default_rng(seed)
+    draws = rng.dirichlet(np.full(len(keys), concentration), size=n_samples)
+    return [{key: round(float(v), 6) for key, v in zip(keys, row)} for row in draws]
+
+
+def _normalize_candidate(c: Dict[str, float]) -> Dict[str, float]:
+    total = sum(c.values())
+    return {k: round(v / total, 6) for k, v in c.items()}
+
+
+def _coordinate_descent(
+    evaluate,
+    start: Dict[str, float],
+    step: float,
+    min_step: float,
+    max_rounds: int,
+) -> List[tuple]:
+    """座標降下。評価履歴 [(weights, score), ...] を返す。"""
+    current = _normalize_candidate(start)
+    best = evaluate([current])[0]
+    history = [(current, best)]
+
+    for _ in range(max_rounds):
+        if step < min_step:
+            break
+        moves = []
+        for key in current:
+            for sign in (1.0, -1.0):
+                moved = dict(current)
+                moved[key] = max(0.0, moved[key] + sign * step)
+                if sum(moved.values()) > 0 and moved != current:
+                    moves.append(_normalize_candidate(moved))
+        scores = evaluate(moves)
+        history.extend(zip(moves, scores))
+
+        finite = [(s, m) for s, m in zip(scores, moves) if np.isfinite(s)]
+        top = max(finite, key=lambda x: x[0]) if finite else None
+        if top is not None and (not np.isfinite(best) or top[0] > best):
+            best, current = top
+        else:
+            step /= 2.0
+    return history
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# メイン: search_weights
+# ═══════════════════════════════════════════════════════════════════════════
+
+def search_weights(
+    panel: pd.DataFrame,
+    target: str = "qvt",
+    strategy: str = "random",
+    horizon: int = 20,
+    objective: str = "qvt",
+    max_workers: Optional[int] = None,
+    grid_step: float = DEFAULT_GRID_STEP,
+    n_samples: int = DEFAULT_RANDOM_SAMPLES,
+    seed: Optional[int] = 0,
+    cd_step: float = DEFAULT_CD_STEP,
+    cd_min_step: float = DEFAULT_CD_MIN_STEP,
+    cd_max_rounds: int = DEFAULT_CD_MAX_ROUNDS,
+    ctx: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    サブスコアパネルから target グループの重みを探索する。
+
+    Parameters
+    ----------
+    panel : pd.DataFrame
+        score_panel.make_subscore_panel + attach_forward_returns 済みのパネル
+    target : "qvt" | "q" | "v_sector" | "v_no_sector" | "d"
+    strategy : "grid" | "random" | "coordinate"
+    horizon : 目的関数に使う先行リターン（fwd_<horizon> 列）
+    objective : "qvt"（最終 QVT で評価） | "component"（対象の Q / V 単体で評価）
+        target="d" は常に defensive_score 単体で評価する。
+    max_workers : プロセス数。1 なら直列評価。None なら CPU 数。
+    ctx : build_eval_context の結果を使い回す場合に指定
+
+    Returns
+    -------
+    dict:
+        best        : {"weights": dict, "score": float}
+        baseline    : {"weights": dict, "score": float}（現行デフォルト重み）
+        results     : 全候補の DataFrame（score 降順）
+        target / strategy / horizon / objective / n_evaluated
+    """
+    if target not in DEFAULT_WEIGHT_SETS:
+        raise ValueError(f"未対応の target です: {target}")
+    if strategy not in SEARCH_STRATEGIES:
+        raise ValueError(f"未対応の strategy です: {strategy}")
+
+    ctx = dict(ctx or build_eval_context(panel, horizon=horizon))
+    ctx["objective"] = objective
+    baseline_w = dict(DEFAULT_WEIGHT_SETS[target])
+    keys = list(baseline_w.keys())
+
+    with _Evaluator(ctx, target, max_workers) as evaluate:
+        baseline_score = evaluate([baseline_w])[0]
+
+        if strategy == "grid":
+            candidates = grid_candidates(keys, step=grid_step)
+            history = list(zip(candidates, evaluate(candidates)))
+        elif strategy == "random":
+            candidates = random_candidates(keys, n_samples=n_samples, seed=seed)
+            history = list(zip(candidates, evaluate(candidates)))
+        else:
+            history = _coordinate_descent(
+                evaluate, baseline_w,
+                step=cd_step, min_step=cd_min_step, max_rounds=cd_max_rounds,
+            )
+
+    results = pd.DataFrame([{**w, "score": s} for w, s in history])
+    results = results.sort_values("score", ascending=False, na_position="last").reset_index(drop=True)
+    best_row = results.iloc[0] if len(results) else None
+
+    return {
+        "best": {
+            "weights": {k: float(best_row[k]) for k in keys} if best_row is not None else baseline_w,
+            "score":   float(best_row["score"]) if best_row is not None else baseline_score,
+        },
+        "baseline": {"weights": baseline_w, "score": baseline_score},
+        "results":     results,
+        "target":      target,
+        "strategy":    strategy,
+        "horizon":     ctx["horizon"],
+        "objective":   objective,
+        "n_evaluated": len(results) + 1,
+    }
@@ -0,0 +1,435 @@
+"""D タブ（価格耐性）のチャートを skin 共通で組み立てるモジュール。
+
+classic / magi / cyber の各 skin はチャート本体を持たず、ChartTheme（配色・高さ）
+だけを定義して render_chart() を呼ぶ。
+
+  - データ整形は NumPy でまとめて行い、DataFrame は最後に1回だけ作る
+  - 時系列（終値 vs 200MA）は spec に埋め込む前に modules.downsample で間引く
+  - レーダーの同心円・軸線・ラベル位置は分析結果に依存しないため、
+    テーマごとにモジュールレベルでキャッシュする
+  - 完成した Vega-Lite spec は ui.lazy_tabs.tab_artifact で分析結果ごとに保持し、
+    同じ分析結果の再描画では組み立ても spec 変換も行わない
+  - altair は spec を組み立てる関数の中で import する（skin の import 時や
+    spec キャッシュに当たる再描画では読み込まない）
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from modules.d_logic import summarize_volume_pressure
+from modules.downsample import crossing_indices, downsample_indices, extreme_indices
+from ui.lazy_tabs import tab_artifact
+
+
+DEFENSIVE_RADAR_LABELS: Tuple[str, ...] = (
+    "① MA\n固り比率",
+    "② 最大\n下方乖離",
+    "③ 52w安値\n/200MA",
+    "④ 最大\nDD",
+    "⑤ 下方\nVol",
+    "⑥ 出来高\n下方圧力",
+)
+
+TYPE_UP = "上昇・横ばい日"
+TYPE_DOWN = "下落日"
+TYPE_DOMAIN = [TYPE_UP, TYPE_DOWN]
+VOLUME_RATIO_TITLE = "出来高倍率（当日 / 20日MA）"
+
+_RING_RADII = (0.25, 0.5, 0.75, 1.0)
+_RING_POINTS = 181
+_LABEL_RADIUS = 1.18
+_RADAR_DOMAIN = [-1.25, 1.25]
+_BM_RADIUS = 0.5
+_BOX_WIDTH = 42
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# テーマ
+# ═══════════════════════════════════════════════════════════════════════════
+
+@dataclass(frozen=True)
+class ChartTheme:
+    """skin ごとの配色。name は生成物キャッシュのキーに使う。"""
+
+    name: str
+    ticker: str                 # レーダーの銘柄ポリゴン
+    benchmark: str              # レーダーの BM=0.5 ポリゴン
+    up: str                     # 上昇・横ばい日
+    down: str                   # 下落日（終値 < 200MA の塗りにも使う）
+    accent: str                 # 中央値・ヒゲ・BM(1.0) 基準線
+    close: str                  # 終値ライン
+    ma: str                     # 200MA ライン
+    grid: str = "#273142"
+    grid_opacity: float = 0.6
+    spoke: str = "#273142"
+    spoke_opacity: float = 0.5
+    label: str = "#c9d4e5"
+    label_size: int = 11
+    legend_label: Optional[str] = None
+    below_opacity: float = 0.18
+    hist_opacity: float = 0.55
+    outlier_stroke: str = "white"
+    height: int = 320
+    background: Optional[str] = None
+    axis_label: Optional[str] = None
+    axis_grid: Optional[str] = None
+
+
+def _finish(chart, theme: ChartTheme, height: Optional[int] = None):
+    props: Dict[str, Any] = {}
+    if height is not None:
+        props["height"] = height
+    if theme.background is not None:
+        props["background"] = theme.background
+    if props:
+        chart = chart.properties(**props)
+    if theme.axis_label is not None or theme.axis_grid is not None:
+        axis: Dict[str, Any] = {}
+        if theme.axis_label is not None:
+            axis.update(labelColor=theme.axis_label, titleColor=theme.axis_label)
+        if theme.axis_grid is not None:
+            axis.update(gridColor=theme.axis_grid)
+        chart = chart.configure_axis(**axis)
+    return chart.configure_view(stroke=None)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# データ整形（分析結果ごと）
+# ═══════════════════════════════════════════════════════════════════════════
+
+@lru_cache(maxsize=None)
+def _angles(n: int) -> np.ndarray:
+    return np.linspace(0, 2 * np.pi, n, endpoint=False)
+
+
+def radar_values(tech: Dict[str, Any]) -> Optional[np.ndarray]:
+    values = [tech.get(f"def{i}") for i in range(1, 7)]
+    if any(v is None for v in values):
+        return None
+    return np.asarray(values, dtype=float)
+
+
+def radar_polygons(values: np.ndarray, labels: Sequence[str] = DEFENSIVE_RADAR_LABELS) -> pd.DataFrame:
+    """銘柄と BM=0.5 の閉じたポリゴン（先頭点を末尾に複製）。"""
+    n = len(values)
+    closed = np.r_[np.arange(n), 0]
+    angles = _angles(n)[closed]
+    radii = np.vstack([values[closed], np.full(n + 1, _BM_RADIUS)])
+    return pd.DataFrame({
+        "series": np.repeat(["Ticker", "BM=0.5"], n + 1),
+        "order": np.tile(np.arange(n + 1), 2),
+        "label": np.tile(np.asarray(labels, dtype=object)[closed], 2),
+        "x": (radii * np.cos(angles)).ravel(),
+        "y": (radii * np.sin(angles)).ravel(),
+    })
+
+
+def _close_vs_ma_keep(tech: Dict[str, Any], index: pd.Index, close: np.ndarray, ma200: np.ndarray) -> np.ndarray:
+    """間引いても残す位置: 最大DD日とその直前の高値・最大下方乖離日・MA交差・終値の最安/最高。"""
+    series = tech["series"]
+    detail = tech.get("d_detail") or {}
+    keep = [crossing_indices(close, ma200), extreme_indices(close)]
+    dates = []
+    mdd_date = detail.get("mdd_date")
+    if mdd_date is not None:
+        dates.append(mdd_date)
+        if "drawdown" in series:
+            peaks = series.series("drawdown").loc[:mdd_date]
+            peaks = peaks[peaks >= 0]
+            if not peaks.empty:
+                dates.append(peaks.index[-1])
+    if "deviation" in series:
+        deviation = series.series("deviation")
+        if deviation.notna().any():
+            dates.append(deviation.idxmin())
+    if dates:
+        pos = index.get_indexer(pd.Index(dates))
+        keep.append(pos[pos >= 0])
+    return np.concatenate(keep)
+
+
+def close_vs_ma_frame(tech: Dict[str, Any], budget: Optional[int] = None) -> Optional[pd.DataFrame]:
+    """
+    終値と 200MA（tech["series"] の close / ma）。CHART_POINT_BUDGET（budget）を
+    超える行数は modules.downsample で間引く（最大DD日・MA交差などの目印は残す）。
+    """
+    series = tech.get("series")
+    if series is None or "close" not in series or "ma" not in series:
+        return None
+
+    close = series.array("close")
+    ma200 = series.array("ma")
+    keep = ~(np.isnan(close) | np.isnan(ma200))
+    if not keep.any():
+        return None
+    index, close, ma200 = series.index[keep], close[keep], ma200[keep]
+
+    picks = downsample_indices(
+        index.asi8 if isinstance(index, pd.DatetimeIndex) else np.arange(len(index)),
+        close,
+        budget=budget,
+        keep=_close_vs_ma_keep(tech, index, close, ma200),
+    )
+    index, close, ma200 = index[picks], close[picks], ma200[picks]
+    return pd.DataFrame({
+        "Date": index,
+        "Close": close,
+        "MA200": ma200,
+        "Baseline": close.min(),
+        "BelowClose": np.where(close < ma200, close, np.nan),
+    })
+
+
+_GROUP_TYPES = (("up", TYPE_UP), ("down", TYPE_DOWN))
+
+
+def volume_stats(tech: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    d_logic.summarize_volume_pressure の結果（indicators が d_detail["vol_stats"] に格納）。
+    古い分析結果で未格納ならここで1回だけ求める。
+    """
+    detail = tech.get("d_detail") or {}
+    stats = detail.get("vol_stats")
+    if stats is None:
+        series = tech.get("series")
+        if series is None or "vol_ratio" not in series or "down_mask" not in series:
+            return None
+        stats = summarize_volume_pressure(series.series("vol_ratio"), series.series("down_mask"))
+    return stats if stats["groups"] else None
+
+
+def boxplot_frames(stats: Dict[str, Any]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """サマリーから箱（種別ごと1行）と外れ値の DataFrame を作る。"""
+    rows, outlier_pos, outlier_type = [], [], []
+    for key, label in _GROUP_TYPES:
+        g = stats["groups"].get(key)
+        if g is None:
+            continue
+        rows.append({k: g[k] for k in ("q1", "median", "q3", "lower", "upper")} | {"Type": label})
+        outlier_pos.append(g["outliers"])
+        outlier_type.append(np.full(len(g["outliers"]), label, dtype=object))
+    pos = np.concatenate(outlier_pos) if outlier_pos else np.empty(0, dtype=np.int64)
+    outliers = pd.DataFrame({
+        "Type": np.concatenate(outlier_type) if outlier_type else np.empty(0, dtype=object),
+        "VolumeRatio": stats["values"][pos],
+    })
+    return pd.DataFrame(rows), outliers
+
+
+def histogram_frame(stats: Dict[str, Any]) -> pd.DataFrame:
+    """サマリーの度数から棒（階級 × 種別）の DataFrame を作る。"""
+    hist = stats["hist"]
+    edges = hist["edges"]
+    n = len(edges) - 1
+    return pd.DataFrame({
+        "Type": np.repeat([label for _, label in _GROUP_TYPES], n),
+        "start": np.tile(edges[:-1], 2),
+        "end": np.tile(edges[1:], 2),
+        "count": np.concatenate([hist["up"], hist["down"]]),
+    })
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# チャート
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _xy(**extra):
+    import altair as alt
+
+    scale = alt.Scale(domain=_RADAR_DOMAIN)
+    return dict(
+        x=alt.X("x:Q", axis=None, scale=scale),
+        y=alt.Y("y:Q", axis=None, scale=scale),
+        **extra,
+    )
+
+
+@lru_cache(maxsize=None)
+def _radar_frame_layers(theme: ChartTheme, labels: Tuple[str, ...] = DEFENSIVE_RADAR_LABELS):
+    """同心円・軸線・軸ラベル（分析結果に依存しない部分）。"""
+    import altair as alt
+
+    n = len(labels)
+    angles = _angles(n)
+
+    steps = np.linspace(0, 2 * np.pi, _RING_POINTS)
+    radii = np.asarray(_RING_RADII)[:, None]
+    grid_df = pd.DataFrame({
+        "radius": np.repeat(_RING_RADII, _RING_POINTS),
+        "x": (radii * np.cos(steps)).ravel(),
+        "y": (radii * np.sin(steps)).ravel(),
+    })
+    spoke_df = pd.DataFrame({
+        "axis": np.repeat(np.arange(n), 2),
+        "order": np.tile([0, 1], n),
+        "x": np.column_stack([np.zeros(n), np.cos(angles)]).ravel(),
+        "y": np.column_stack([np.zeros(n), np.sin(angles)]).ravel(),
+    })
+    label_df = pd.DataFrame({
+        "label": list(labels),
+        "x": _LABEL_RADIUS * np.cos(angles),
+        "y": _LABEL_RADIUS * np.sin(angles),
+    })
+
+    grid = alt.Chart(grid_df).mark_line(color=theme.grid, opacity=theme.grid_opacity).encode(
+        **_xy(detail="radius:N"),
+    )
+    spokes = alt.Chart(spoke_df).mark_line(color=theme.spoke, opacity=theme.spoke_opacity).encode(
+        **_xy(detail="axis:N", order="order:Q"),
+    )
+    text = alt.Chart(label_df).mark_text(color=theme.label, fontSize=theme.label_size).encode(
+        **_xy(text="label:N"),
+    )
+    return grid, spokes, text
+
+
+def defensive_radar_chart(tech: Dict[str, Any], theme: ChartTheme):
+    import altair as alt
+
+    values = radar_values(tech)
+    if values is None:
+        return None
+
+    legend = alt.Legend(title=None, orient="bottom")
+    if theme.legend_label is not None:
+        legend = alt.Legend(title=None, orient="bottom",
+                            labelColor=theme.legend_label, titleColor=theme.legend_label)
+    series_domain = ["Ticker", "BM=0.5"]
+    polygons = alt.Chart(radar_polygons(values)).mark_line(point=True, strokeWidth=2).encode(
+        **_xy(
+            color=alt.Color(
+                "series:N",
+                scale=alt.Scale(domain=series_domain, range=[theme.ticker, theme.benchmark]),
+                legend=legend,
+            ),
+            strokeDash=alt.StrokeDash(
+                "series:N",
+                scale=alt.Scale(domain=series_domain, range=[[1, 0], [6, 4]]),
+                legend=None,
+            ),
+            detail="series:N",
+            order="order:Q",
+            tooltip=["series:N", "label:N"],
+        ),
+    )
+    grid, spokes, text = _radar_frame_layers(theme)
+    return _finish(grid + spokes + polygons + text, theme)
+
+
+def close_vs_ma_chart(tech: Dict[str, Any], theme: ChartTheme):
+    import altair as alt
+
+    close_df = close_vs_ma_frame(tech)
+    if close_df is None:
+        return None
+
+    base = alt.Chart(close_df).encode(x=alt.X("Date:T", title=None))
+    area = base.mark_area(color=theme.down, opacity=theme.below_opacity).encode(
+        y=alt.Y("BelowClose:Q", title="Price"),
+        y2="Baseline:Q",
+    )
+    close_line = base.mark_line(color=theme.close).encode(y="Close:Q")
+    ma_line = base.mark_line(color=theme.ma, strokeDash=[6, 4]).encode(y="MA200:Q")
+    return _finish(area + close_line + ma_line, theme, theme.height)
+
+
+def volume_pressure_boxplot_chart(tech: Dict[str, Any], theme: ChartTheme):
+    import altair as alt
+
+    stats = volume_stats(tech)
+    if stats is None:
+        return None
+    box_df, outlier_df = boxplot_frames(stats)
+
+    type_x = alt.X("Type:N", sort=TYPE_DOMAIN)
+    type_color = alt.Color(
+        "Type:N", scale=alt.Scale(domain=TYPE_DOMAIN, range=[theme.up, theme.down]), legend=None,
+    )
+    base = alt.Chart(box_df)
+    box = base.mark_bar(size=_BOX_WIDTH).encode(
+        x=alt.X("Type:N", title=None, sort=TYPE_DOMAIN),
+        y=alt.Y("q1:Q", title=VOLUME_RATIO_TITLE),
+        y2="q3:Q",
+        color=type_color,
+        tooltip=[
+            "Type:N",
+            alt.Tooltip("q1:Q", format=".3f", title="Q1"),
+            alt.Tooltip("median:Q", format=".3f", title="中央値"),
+            alt.Tooltip("q3:Q", format=".3f", title="Q3"),
+        ],
+    )
+    whisker = base.mark_rule(color=theme.accent, strokeWidth=2).encode(x=type_x, y="lower:Q", y2="upper:Q")
+    lower_cap = base.mark_tick(color=theme.accent, thickness=2, size=_BOX_WIDTH).encode(x=type_x, y="lower:Q")
+    upper_cap = base.mark_tick(color=theme.accent, thickness=2, size=_BOX_WIDTH).encode(x=type_x, y="upper:Q")
+    median = base.mark_tick(color=theme.accent, thickness=2.5, size=_BOX_WIDTH).encode(x=type_x, y="median:Q")
+    outliers = alt.Chart(outlier_df).mark_point(
+        shape="circle", filled=True, size=90, opacity=0.95,
+        stroke=theme.outlier_stroke, strokeWidth=1.4,
+    ).encode(
+        x=type_x,
+        y=alt.Y("VolumeRatio:Q"),
+        color=type_color,
+        tooltip=["Type:N", alt.Tooltip("VolumeRatio:Q", format=".3f", title="倍率")],
+    )
+    chart = box + whisker + lower_cap + upper_cap + median + outliers
+    return _finish(chart, theme, theme.height)
+
+
+def volume_pressure_histogram_chart(tech: Dict[str, Any], theme: ChartTheme):
+    import altair as alt
+
+    # 度数は d_logic 側で 99%tile クリップ済みの値から数えてある
+    stats = volume_stats(tech)
+    if stats is None:
+        return None
+
+    bars = alt.Chart(histogram_frame(stats)).mark_bar(opacity=theme.hist_opacity).encode(
+        x=alt.X("start:Q", title=VOLUME_RATIO_TITLE),
+        x2="end:Q",
+        y=alt.Y("count:Q", title="日数"),
+        color=alt.Color(
+            "Type:N", scale=alt.Scale(domain=TYPE_DOMAIN, range=[theme.up, theme.down]), legend=None,
+        ),
+        tooltip=["Type:N", alt.Tooltip("count:Q", title="件数")],
+    )
+    # BM基準線（出来高倍率 = 1.0）
+    bm_line = alt.Chart(pd.DataFrame({"x": [1.0]})).mark_rule(
+        color=theme.accent, strokeDash=[6, 4], strokeWidth=1.5,
+    ).encode(x=alt.X("x:Q"))
+    return _finish(bars + bm_line, theme, theme.height)
+
+
+CHART_BUILDERS: Dict[str, Callable[[Dict[str, Any], ChartTheme], Any]] = {
+    "defensive_radar": defensive_radar_chart,
+    "close_vs_ma": close_vs_ma_chart,
+    "volume_pressure_boxplot": volume_pressure_boxplot_chart,
+    "volume_pressure_histogram": volume_pressure_histogram_chart,
+}
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 描画
+# ═══════════════════════════════════════════════════════════════════════════
+
+def chart_spec(tech: Dict[str, Any], name: str, theme: ChartTheme) -> Optional[Dict[str, Any]]:
+    """Vega-Lite spec（dict）。データ不足なら None。分析結果ごとに1回だけ組み立てる。"""
+    def _build():
+        chart = CHART_BUILDERS[name](tech, theme)
+        return None if chart is None else chart.to_dict()
+    return tab_artifact(tech, f"chart.{theme.name}.{name}", _build)
+
+
+def render_chart(tech: Dict[str, Any], name: str, theme: ChartTheme) -> bool:
+    """チャートを描画する。データ不足で描けなかった場合は False。"""
+    spec = chart_spec(tech, name, theme)
+    if spec is None:
+        return False
+    st.vega_lite_chart(spec, use_container_width=True)
+    return True
@@ -5,16 +5,16 @@ cls_main.py のロジック・仕様関数をサイバーパンクUIで再実装
 エントリーポイント: run()
 """
 
-import altair as alt
-import numpy as np
 import pandas as pd
 import streamlit as st
 import streamlit.components.v1 as components
 
-from modules.data_fetch import convert_ticker
+from modules.tickers import convert_ticker
 from modules.q_correction import apply_q_correction
 from modules.pattern_db import get_all_types_for_display
 from ui.output_structure import build_analysis_output
+from ui.lazy_tabs import lazy_tabs
+from ui.charts import ChartTheme, render_chart
 from dict.dic1 import DEFENSIVE_RANK_LABELS
 
 
@@ -880,10 +880,28 @@ _DEFENSIVE_METRIC_LABELS = [
     "① MA固り比率", "② 最大下方乖離", "③ 52w安値/200MA",
     "④ 最大DD", "⑤ 下方Vol", "⑥ 出来高下方圧力",
 ]
-_DEFENSIVE_RADAR_LABELS = [
-    "① MA\n固り比率", "② 最大\n下方乖離", "③ 52w安値\n/200MA",
-    "④ 最大\nDD", "⑤ 下方\nVol", "⑥ 出来高\n下方圧力",
-]
+_CHART_THEME = ChartTheme(
+    name="cyber",
+    ticker="#00ff88",
+    benchmark="#ff005566",
+    up="#00f3ff",
+    down="#ff0055",
+    accent="#f5c542",
+    close="#00f3ff",
+    ma="#f5c542",
+    grid="#00f3ff22",
+    grid_opacity=1.0,
+    spoke="#00f3ff22",
+    spoke_opacity=1.0,
+    label="#00f3ff",
+    label_size=9,
+    legend_label="#e8f7ff",
+    hist_opacity=0.65,
+    height=280,
+    background="transparent",
+    axis_label="#e8f7ff",
+    axis_grid="#3a4d66",
+)
 
 
 def _build_defensive_metric_frame(tech):
@@ -908,194 +926,30 @@ def _build_defensive_metric_frame(tech):
 
 
 def _render_defensive_radar(tech):
-    values = [tech.get(f"def{i}") for i in range(1, 6)] + [tech.get("def6")]
-    if any(v is None for v in values):
+    if not render_chart(tech, "defensive_radar", _CHART_THEME):
         st.info("Dスコアのレーダーチャートに必要なデータが不足しています。")
-        return
 
-    n      = len(values)
-    angles = np.linspace(0, 2 * np.pi, n, endpoint=False)
-
-    def _polygon_points(series_name, radii):
-        rows = []
-        for idx, radius in enumerate(radii):
-            angle = angles[idx]
-            rows.append({
-                "series": series_name, "order": idx,
-                "label": _DEFENSIVE_RADAR_LABELS[idx],
-                "x": float(radius * np.cos(angle)),
-                "y": float(radius * np.sin(angle)),
-            })
-        rows.append(rows[0] | {"order": n})
-        return rows
-
-    value_rows = _polygon_points("Ticker", [float(v) for v in values])
-    bm_rows    = _polygon_points("BM=0.5", [0.5] * n)
-    grid_rows  = []
-    for radius in (0.25, 0.5, 0.75, 1.0):
-        gr = _polygon_points(f"grid_{radius}", [radius] * n)
-        grid_rows.extend(gr)
-
-    grid_df = pd.DataFrame(grid_rows)
-    val_df  = pd.DataFrame(value_rows)
-    bm_df   = pd.DataFrame(bm_rows)
-
-    grid_layer = alt.Chart(grid_df).mark_line(color="#00f3ff22", strokeWidth=0.8).encode(
-        x=alt.X("x:Q", axis=None), y=alt.Y("y:Q", axis=None), order="order:O",
-        detail="series:N",
-    )
-    val_layer = alt.Chart(val_df).mark_line(color="#00ff88", strokeWidth=2).encode(
-        x="x:Q", y="y:Q", order="order:O",
-    )
-    bm_layer = alt.Chart(bm_df).mark_line(color="#ff005566", strokeWidth=1.5, strokeDash=[4, 4]).encode(
-        x="x:Q", y="y:Q", order="order:O",
-    )
-    label_df = val_df[val_df["order"] < n].copy()
-    label_layer = alt.Chart(label_df).mark_text(
-        color="#00f3ff", fontSize=9, fontWeight="bold",
-    ).encode(
-        x=alt.X("x:Q"), y=alt.Y("y:Q"),
-        text="label:N",
-    )
-    chart = (grid_layer + bm_layer + val_layer + label_layer).properties(
-        height=280,
-        background="transparent",
-    ).configure_view(stroke=None)
-    
-    st.altair_chart(chart, use_container_width=True)
-    
-def _render_close_vs_ma_chart(tech):
-    detail = tech.get("d_detail") or {}
-    price_df = tech.get("d_price_df")
-    ma = detail.get("ma")
 
-    if price_df is None or ma is None or price_df.empty:
+def _render_close_vs_ma_chart(tech):
+    if not render_chart(tech, "close_vs_ma", _CHART_THEME):
         st.info("終値 vs 200MA チャートに必要なデータが不足しています。")
-        return
-
-    close_df = price_df[["Close"]].copy()
-    close_df["MA200"] = ma.reindex(close_df.index)
-
-    close_df = (
-        close_df
-        .dropna(subset=["Close", "MA200"])
-        .reset_index()
-    )
 
-    # index名をDateに統一
-    if "index" in close_df.columns:
-        close_df = close_df.rename(columns={"index": "Date"})
-
-    base = alt.Chart(close_df).transform_fold(
-        ["Close", "MA200"],
-        as_=["series", "value"]
-    )
-
-    lines = base.mark_line().encode(
-        x=alt.X("Date:T", title=None),
-        y=alt.Y("value:Q", title="価格"),
-        color=alt.Color(
-            "series:N",
-            scale=alt.Scale(
-                domain=["Close", "MA200"],
-                range=["#00f3ff", "#f5c542"]
-            ),
-            legend=alt.Legend(title=None)
-        ),
-    ).properties(
-        height=280,
-        background="transparent"
-    )
-
-    st.altair_chart(lines, use_container_width=True)
 
 def _render_volume_pressure_boxplot(tech):
-    detail = tech.get("d_detail") or {}
-    vol_ratio = detail.get("vol_ratio")
-    down_mask = detail.get("down_mask")
-    if vol_ratio is None or down_mask is None:
-        st.info("出来高倍率箱ひげ図に必要なデータが不足しています。")
-        return
-
-    vr = vol_ratio.dropna()
-    mask = down_mask.reindex(vr.index).fillna(False).astype(bool)
-
-    if vr.empty:
+    if not render_chart(tech, "volume_pressure_boxplot", _CHART_THEME):
         st.info("出来高倍率箱ひげ図に必要なデータが不足しています。")
         return
-
-    clip_upper = float(vr.quantile(0.99))
-    hist_df = pd.DataFrame({
-        "Type": np.where(mask, "下落日", "上昇・横ばい日"),
-        "VolumeRatio": vr.clip(upper=clip_upper).values,
-    })
-
-    type_domain = ["上昇・横ばい日", "下落日"]
-    type_range = ["#00f3ff", "#ff0055"]
-
-    base = alt.Chart(hist_df)
-
-    box = base.mark_boxplot(
-        extent="min-max",
-        ticks=True
-    ).encode(
-        x=alt.X("Type:N", sort=type_domain),
-        y=alt.Y(
-            "VolumeRatio:Q",
-            title="出来高倍率",
-            axis=alt.Axis(
-                labelColor="#e8f7ff",
-                titleColor="#e8f7ff",
-                gridColor="#3a4d66",
-                gridOpacity=0.55
-            )
-        ),
-        color=alt.Color(
-            "Type:N",
-            scale=alt.Scale(domain=type_domain, range=type_range),
-            legend=None
-        )
-    ).properties(
-        height=280,
-        background="transparent"
-    )
-
-    st.altair_chart(box, use_container_width=True)
-
+    detail = tech.get("d_detail") or {}
     pressure = (tech.get("d_raw") or {}).get("⑥_vol_pressure")
     n_down = detail.get("n_down")
     st.caption(f"圧力={_fmt_optional_float(pressure, 3)} / 下落日数={n_down or 0}")
 
+
 def _render_volume_pressure_histogram(tech):
-    detail    = tech.get("d_detail") or {}
-    vol_ratio = detail.get("vol_ratio")
-    down_mask = detail.get("down_mask")
-    if vol_ratio is None or down_mask is None:
+    if not render_chart(tech, "volume_pressure_histogram", _CHART_THEME):
         st.info("出来高倍率ヒストグラムに必要なデータが不足しています。")
         return
-
-    vr   = vol_ratio.dropna()
-    mask = down_mask.reindex(vr.index).fillna(False).astype(bool)
-    clip_upper = float(vr.quantile(0.99))
-    hist_df = pd.DataFrame({
-        "Type":        np.where(mask, "下落日", "上昇・横ばい日"),
-        "VolumeRatio": vr.clip(upper=clip_upper).values,
-    })
-    type_domain = ["上昇・横ばい日", "下落日"]
-    type_range  = ["#00f3ff88", "#ff005588"]
-
-    bars = alt.Chart(hist_df).mark_bar(opacity=0.65).encode(
-        x=alt.X("VolumeRatio:Q", bin=alt.Bin(maxbins=30), title="出来高倍率（当日 / 20日MA）"),
-        y=alt.Y("count():Q", title="日数"),
-        color=alt.Color("Type:N", scale=alt.Scale(domain=type_domain, range=type_range), legend=None),
-        tooltip=["Type:N", alt.Tooltip("count():Q", title="件数")],
-    )
-    bm_line = alt.Chart(pd.DataFrame({"x": [1.0]})).mark_rule(
-        color="#f5c542", strokeDash=[6, 4], strokeWidth=1.5,
-    ).encode(x=alt.X("x:Q"))
-    chart = (bars + bm_line).properties(height=280, background="transparent")
-    st.altair_chart(chart, use_container_width=True)
-
+    detail = tech.get("d_detail") or {}
     pressure = (tech.get("d_raw") or {}).get("⑥_vol_pressure")
     n_down   = detail.get("n_down")
     st.caption(f"圧力={_fmt_optional_float(pressure, 3)} / 下落日数={n_down or 0}　　破線=BM(1.0)")
@@ -1201,6 +1055,7 @@ def run():
 
     output = build_analysis_output(
         ticker,
+        reuse=not search,
         spinner_messages={
             "fetch":    f"📥 {ticker} のデータを取得中…",
             "classify": "🔍 財務タイプを分類中…",
@@ -1227,14 +1082,17 @@ def run():
     render_qvt_cards(scores["q"], scores["v"], scores["t"], scores["qvt"])
     st.markdown("---")
 
-    tab_t, tab_q, tab_v, tab_qvt, tab_d = st.tabs(
-        ["⏰ タイミング", "🏢 質", "💰 値札", "🧮 総合", "🛡️ 価格耐性"]
+    lazy_tabs(
+        ["⏰ タイミング", "🏢 質", "💰 値札", "🧮 総合", "🛡️ 価格耐性"],
+        [
+            lambda: render_t_tab(tech),
+            lambda: render_q_tab(tech),
+            lambda: render_v_tab(tech),
+            lambda: render_qvt_tab(tech),
+            lambda: render_defensive_tab(tech),
+        ],
+        key="cyber_tabs",
     )
-    with tab_t:   render_t_tab(tech)
-    with tab_q:   render_q_tab(tech)
-    with tab_v:   render_v_tab(tech)
-    with tab_qvt: render_qvt_tab(tech)
-    with tab_d:   render_defensive_tab(tech)
 
     if base.get("dividend_yield"):
         st.caption(f"予想配当利回り: **{base['dividend_yield']:.2f}%**")
@@ -0,0 +1,95 @@
+"""処理時間のデバッグパネル（?debug=1 のときだけ表示）。
+
+main.py が1回の描画を modules.tracing のトレースで囲み、終了後に
+サイドバーへこのパネルを出す。どの skin でも同じ内容が表示される。
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import streamlit as st
+
+from modules.av_quota import quota_status
+from modules.preload import preload_status
+from modules.tracing import SPAN_STATS, TRACE_LOG_PATH, Trace
+
+
+def debug_enabled() -> bool:
+    """URL に ?debug=1 が付いているか。"""
+    try:
+        return str(st.query_params.get("debug", "")).lower() in ("1", "true", "yes")
+    except Exception:
+        return False
+
+
+def _span_rows(tr: Trace) -> List[Dict[str, Any]]:
+    data = tr.to_dict()
+    rows = []
+    for s in data["spans"]:
+        rows.append({
+            "span": "　" * s["depth"] + s["name"],
+            "start_ms": round(s["start"] * 1000, 1),
+            "ms": round(s["duration"] * 1000, 1),
+            "thread": s["thread"],
+            "attrs": ", ".join(f"{k}={v}" for k, v in s["attrs"].items()),
+            "error": s["error"] or "",
+        })
+    return rows
+
+
+def _render_ms(tr: Trace) -> Optional[float]:
+    """ui.run から分析本体（analysis）を引いた残り＝描画時間の目安。"""
+    totals = tr.summary()
+    if "ui.run" not in totals:
+        return None
+    return (totals["ui.run"] - totals.get("analysis", 0.0)) * 1000
+
+
+def render_debug_panel(tr: Trace) -> None:
+    with st.expander("⏱ 処理時間（debug）", expanded=True):
+        duration = tr.duration if tr.duration is not None else tr.elapsed()
+        st.caption(f"trace {tr.trace_id} — 合計 {duration * 1000:.0f} ms")
+        render_ms = _render_ms(tr)
+        if render_ms is not None:
+            st.caption(f"描画（ui.run − analysis）: {render_ms:.0f} ms")
+
+        rows = _span_rows(tr)
+        if rows:
+            st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        else:
+            st.caption("このリクエストで計測されたスパンはありません。")
+
+        st.markdown("**直近の分位点（ms）**")
+        stats = SPAN_STATS.snapshot()
+        if stats:
+            table = pd.DataFrame.from_dict(stats, orient="index")
+            for col in table.columns:
+                if col != "count":
+                    table[col] = (table[col] * 1000).round(1)
+            st.dataframe(table, use_container_width=True)
+
+        preload = preload_status()
+        if preload is not None:
+            st.markdown("**起動時プリロード**")
+            if preload.get("running"):
+                st.caption("実行中…")
+            else:
+                st.caption(f"合計 {preload['total_s'] * 1000:.0f} ms" + ("" if preload["ok"] else "（失敗あり）"))
+                st.dataframe(pd.DataFrame(preload["steps"]), hide_index=True, use_container_width=True)
+
+        quota = quota_status()
+        if quota["keys"] or any(quota["counters"].values()):
+            st.markdown("**Alpha Vantage クォータ**")
+            st.json(quota, expanded=False)
+
+        st.download_button(
+            "トレースを JSON Lines で保存",
+            data=json.dumps(tr.to_dict(), ensure_ascii=False, default=str) + "\n",
+            file_name=f"trace_{tr.trace_id}.jsonl",
+            mime="application/json",
+        )
+        if TRACE_LOG_PATH:
+            st.caption(f"全トレースを {TRACE_LOG_PATH} に追記しています。")
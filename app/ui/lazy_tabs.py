@@ -0,0 +1,87 @@
+"""skin 共通の遅延タブ描画。
+
+st.tabs は全タブの中身を毎回組み立てる（見えていないタブも含む）。
+lazy_tabs() は st.tabs(on_change="rerun") で選択状態を受け取り、
+開いているタブだけ renderer を呼ぶ。タブを切り替えると再実行され、
+そのタブが初めて組み立てられる。
+
+チャートなどの重い生成物は tab_artifact() で分析結果ごとに保持し、
+同じ分析結果のタブを開き直したときは作り直さない。
+
+st.tabs の key / on_change は新しい Streamlit にしかない。requirements.txt の
+下限（1.32）のように対応していない版では、従来どおり st.tabs(labels) で全タブを描画する。
+"""
+
+from __future__ import annotations
+
+import inspect
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Optional, Sequence
+
+import streamlit as st
+
+
+MAX_ANALYSES = 3    # 生成物を保持する分析結果の数（古いものから捨てる）
+
+_ARTIFACTS_KEY = "_lazy_tab_artifacts"
+
+
+@lru_cache(maxsize=1)
+def _tabs_params() -> frozenset:
+    """この Streamlit の st.tabs が受け取るキーワード引数。"""
+    try:
+        return frozenset(inspect.signature(st.tabs).parameters)
+    except (TypeError, ValueError):
+        return frozenset()
+
+
+def lazy_tabs(
+    labels: Sequence[str],
+    renderers: Sequence[Callable[[], None]],
+    key: str,
+    default: Optional[str] = None,
+) -> None:
+    """
+    labels[i] のタブが開いているときだけ renderers[i]() を呼ぶ。
+
+    Streamlit が選択状態を返さない場合（st.tabs に key / on_change が無い版、
+    または TabContainer.open が None）は従来どおり全タブを描画する。
+    """
+    if len(labels) != len(renderers):
+        raise ValueError("labels と renderers の数が一致しません。")
+
+    params = _tabs_params()
+    if {"key", "on_change"} <= params:
+        options = {"key": key, "on_change": "rerun"}
+        if "default" in params:
+            options["default"] = default
+        tabs = st.tabs(list(labels), **options)
+    else:
+        tabs = st.tabs(list(labels))
+    for tab, render in zip(tabs, renderers):
+        if getattr(tab, "open", None) is False:
+            continue
+        with tab:
+            render()
+
+
+def tab_artifact(owner: Any, name: str, builder: Callable[[], Any]) -> Any:
+    """
+    owner（分析結果の tech 等）ごとに builder() の結果を保持して返す。
+
+    owner はオブジェクトの同一性で識別する。build_analysis_output(reuse=True)
+    が同じ出力を返している間は同じ生成物が使われる。
+    """
+    store: "OrderedDict[int, tuple]" = st.session_state.setdefault(_ARTIFACTS_KEY, OrderedDict())
+    entry = store.get(id(owner))
+    if entry is None or entry[0] is not owner:
+        entry = store[id(owner)] = (owner, {})
+    store.move_to_end(id(owner))
+    while len(store) > MAX_ANALYSES:
+        store.popitem(last=False)
+
+    artifacts = entry[1]
+    if name not in artifacts:
+        artifacts[name] = builder()
+    return artifacts[name]
@@ -13,7 +13,7 @@ import re
 import textwrap
 import streamlit as st
 
-from modules.data_fetch import convert_ticker
+from modules.tickers import convert_ticker
 from ui.output_structure import build_analysis_output
 from dict.dic1 import DEFENSIVE_RANK_LABELS
 
@@ -0,0 +1,285 @@
+"""
+benchmarks/fixtures.py
+────────────────────────────────────────────────────────────────────────────
+ベンチマーク用の市場データフィクスチャ（ネットワーク不要）
+
+【フォーマット】（benchmarks/fixtures/<name>/）
+  ohlcv/<ticker>.csv     : Date, Open, High, Low, Close, Volume
+  fundamentals.json      : {ticker: {eps, bps, roe, ..., industry, sector}}
+  benchmarks.json        : {market: ベンチマークティッカー}（ohlcv/ に同じ形式で保存）
+
+【作り方】
+  記録（ネットワークあり・1回だけ）:
+    python -m benchmarks.fixtures record 7203 8306 AAPL MSFT --name recorded
+  合成（記録がない環境向け。決定的）:
+    python -m benchmarks.fixtures synth --tickers 50 --days 1000 --name synthetic
+
+  ベンチマーク実行時は load_universe(n_tickers, days) が
+  記録済み銘柄を循環させて n 銘柄・days 日分のユニバースに拡張する。
+  記録済みフィクスチャがなければ合成フィクスチャを自動生成する。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List
+
+import numpy as np
+import pandas as pd
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_APP_DIR = os.path.join(_ROOT, "app")
+if _APP_DIR not in sys.path:
+    sys.path.insert(0, _APP_DIR)
+
+FIXTURE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+DEFAULT_FIXTURE = os.environ.get("BENCH_FIXTURE", "recorded")
+SYNTHETIC_FIXTURE = "synthetic"
+
+OHLCV_COLS = ["Open", "High", "Low", "Close", "Volume"]
+FUNDAMENTAL_FIELDS = [
+    "eps", "bps", "eps_fwd", "per_fwd",
+    "roe", "roa", "equity_ratio",
+    "operating_margin", "interest_coverage", "de_ratio",
+    "ev_ebitda", "dividend_yield",
+    "industry", "sector",
+]
+BENCHMARK_TICKERS = {"TSE": "^N225", "NYSE": "^GSPC", "NASDAQ": "^GSPC"}
+
+
+@dataclass
+class Fixture:
+    name: str
+    ohlcv: Dict[str, pd.DataFrame]
+    fundamentals: Dict[str, Dict[str, Any]]
+    benchmarks: Dict[str, pd.DataFrame]      # {market: OHLCV}
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 保存 / 読み込み
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _fixture_dir(name: str) -> str:
+    return os.path.join(FIXTURE_ROOT, name)
+
+
+def _safe_name(ticker: str) -> str:
+    return ticker.replace("^", "_").replace("/", "_")
+
+
+def save_fixture(fx: Fixture) -> str:
+    root = _fixture_dir(fx.name)
+    os.makedirs(os.path.join(root, "ohlcv"), exist_ok=True)
+    for ticker, df in fx.ohlcv.items():
+        df[OHLCV_COLS].to_csv(os.path.join(root, "ohlcv", f"{_safe_name(ticker)}.csv"), index_label="Date")
+    bm_map = {}
+    for market, df in fx.benchmarks.items():
+        bm_ticker = BENCHMARK_TICKERS.get(market, market)
+        bm_map[market] = bm_ticker
+        df[OHLCV_COLS].to_csv(os.path.join(root, "ohlcv", f"{_safe_name(bm_ticker)}.csv"), index_label="Date")
+    with open(os.path.join(root, "fundamentals.json"), "w", encoding="utf-8") as f:
+        json.dump(fx.fundamentals, f, ensure_ascii=False, indent=1)
+    with open(os.path.join(root, "benchmarks.json"), "w", encoding="utf-8") as f:
+        json.dump(bm_map, f, ensure_ascii=False, indent=1)
+    return root
+
+
+def _read_ohlcv(path: str) -> pd.DataFrame:
+    df = pd.read_csv(path, index_col="Date", parse_dates=["Date"])
+    return df[OHLCV_COLS].astype(float)
+
+
+def load_fixture(name: str) -> Optional[Fixture]:
+    root = _fixture_dir(name)
+    fund_path = os.path.join(root, "fundamentals.json")
+    if not os.path.exists(fund_path):
+        return None
+    with open(fund_path, encoding="utf-8") as f:
+        fundamentals = json.load(f)
+    with open(os.path.join(root, "benchmarks.json"), encoding="utf-8") as f:
+        bm_map = json.load(f)
+    ohlcv = {
+        t: _read_ohlcv(os.path.join(root, "ohlcv", f"{_safe_name(t)}.csv"))
+        for t in fundamentals
+    }
+    benchmarks = {
+        m: _read_ohlcv(os.path.join(root, "ohlcv", f"{_safe_name(t)}.csv"))
+        for m, t in bm_map.items()
+    }
+    return Fixture(name=name, ohlcv=ohlcv, fundamentals=fundamentals, benchmarks=benchmarks)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 記録（ネットワーク）
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _flatten_ohlcv(df: pd.DataFrame) -> pd.DataFrame:
+    """yfinance の MultiIndex 列を Open/High/Low/Close/Volume に揃える。"""
+    out = {}
+    for col in OHLCV_COLS:
+        match = [c for c in df.columns if str(c[0] if isinstance(c, tuple) else c) == col]
+        if match:
+            out[col] = df[match[0]]
+    return pd.DataFrame(out).dropna(subset=["Close"])
+
+
+def record_fixture(tickers: List[str], name: str = DEFAULT_FIXTURE, period: str = "1500d") -> str:
+    """get_price_and_meta / get_benchmark_data の結果をフィクスチャとして保存する。"""
+    from modules.data_fetch import get_price_and_meta, get_benchmark_data, parse_ticker_for_d
+
+    ohlcv: Dict[str, pd.DataFrame] = {}
+    fundamentals: Dict[str, Dict[str, Any]] = {}
+    markets = set()
+    for raw in tickers:
+        base = get_price_and_meta(raw, period=period)
+        meta = parse_ticker_for_d(raw)
+        symbol = meta["yf_symbol"]
+        ohlcv[symbol] = _flatten_ohlcv(base["df"])
+        fundamentals[symbol] = {k: base.get(k) for k in FUNDAMENTAL_FIELDS}
+        markets.add(meta["market"])
+
+    benchmarks = {}
+    for market in sorted(markets):
+        bm = get_benchmark_data("7203.T" if market == "TSE" else "AAPL",
+                                bm_ticker=BENCHMARK_TICKERS[market], period=period)
+        benchmarks[market] = _flatten_ohlcv(bm["df"])
+
+    return save_fixture(Fixture(name, ohlcv, fundamentals, benchmarks))
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 合成（決定的）
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _synthetic_ohlcv(rng: np.random.Generator, days: int, start_price: float) -> pd.DataFrame:
+    idx = pd.bdate_range(end="2025-12-30", periods=days)
+    ret = rng.normal(0.0003, 0.018, days)
+    close = start_price * np.exp(np.cumsum(ret))
+    spread = np.abs(rng.normal(0, 0.01, days))
+    high = close * (1 + spread)
+    low = close * (1 - spread)
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    volume = rng.lognormal(13, 0.6, days).round()
+    return pd.DataFrame(
+        {"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+        index=idx,
+    )
+
+
+def _synthetic_fundamentals(rng: np.random.Generator, industry: str, sector: str, price: float) -> Dict[str, Any]:
+    eps = float(price / rng.uniform(6, 40))
+    return {
+        "eps": eps,
+        "bps": float(price / rng.uniform(0.4, 4.0)),
+        "eps_fwd": eps * float(rng.uniform(0.9, 1.2)),
+        "per_fwd": float(rng.uniform(6, 35)),
+        "roe": float(rng.normal(9, 6)),
+        "roa": float(rng.normal(4, 3)),
+        "equity_ratio": float(rng.uniform(5, 80)),
+        "operating_margin": float(rng.normal(8, 6)),
+        "interest_coverage": float(rng.lognormal(2.5, 1.0)),
+        "de_ratio": float(rng.uniform(0, 250)),
+        "ev_ebitda": float(rng.uniform(3, 25)),
+        "dividend_yield": float(rng.uniform(0, 5)),
+        "industry": industry,
+        "sector": sector,
+    }
+
+
+def synthesize_fixture(n_tickers: int = 50, days: int = 1500, seed: int = 0,
+                       name: str = SYNTHETIC_FIXTURE) -> Fixture:
+    """tse_master の実在ティッカー・業種に合成価格と合成ファンダを割り当てる。"""
+    rng = np.random.default_rng(seed)
+    master_path = os.path.join(_APP_DIR, "data", "tse_master_latest.csv")
+    master = pd.read_csv(master_path, dtype=str).fillna("")
+    master = master[master["quote_type"].str.upper().eq("EQUITY")] if "quote_type" in master else master
+    rows = master.iloc[:n_tickers]
+
+    ohlcv, fundamentals = {}, {}
+    for _, row in rows.iterrows():
+        df = _synthetic_ohlcv(rng, days, float(rng.uniform(300, 8000)))
+        ohlcv[row["ticker"]] = df
+        fundamentals[row["ticker"]] = _synthetic_fundamentals(
+            rng, row.get("industry", ""), row.get("sector_yf", ""), float(df["Close"].iloc[-1])
+        )
+    benchmarks = {"TSE": _synthetic_ohlcv(rng, days, 30000.0)}
+    return Fixture(name, ohlcv, fundamentals, benchmarks)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# ユニバース拡張
+# ═══════════════════════════════════════════════════════════════════════════
+
+def get_fixture(name: Optional[str] = None) -> Fixture:
+    """記録済みフィクスチャを読み込む。なければ合成フィクスチャ（保存して再利用）。"""
+    fx = load_fixture(name or DEFAULT_FIXTURE)
+    if fx is not None:
+        return fx
+    fx = load_fixture(SYNTHETIC_FIXTURE)
+    if fx is None:
+        fx = synthesize_fixture()
+        save_fixture(fx)
+    return fx
+
+
+def load_universe(fx: Fixture, n_tickers: int, days: int) -> Dict[str, Any]:
+    """
+    フィクスチャの銘柄を循環させて n_tickers 銘柄 × 直近 days 日のユニバースを作る。
+
+    循環2周目以降は価格を決定的にスケールし、ラベルに "#k" を付ける
+    （同一データの単純コピーでキャッシュが効きすぎないように）。
+    """
+    base = list(fx.fundamentals)
+    if not base:
+        raise ValueError(f"フィクスチャ {fx.name} に銘柄がありません。")
+
+    ohlcv: Dict[str, pd.DataFrame] = {}
+    fundamentals: Dict[str, Dict[str, Any]] = {}
+    for i in range(n_tickers):
+        src = base[i % len(base)]
+        lap = i // len(base)
+        label = src if lap == 0 else f"{src}#{lap}"
+        df = fx.ohlcv[src].iloc[-days:]
+        if lap:
+            scale = 1.0 + 0.01 * lap
+            df = df.copy()
+            df[["Open", "High", "Low", "Close"]] *= scale
+        ohlcv[label] = df
+        fundamentals[label] = fx.fundamentals[src]
+
+    benchmarks = {m: df.iloc[-days:] for m, df in fx.benchmarks.items()}
+    return {"ohlcv": ohlcv, "fundamentals": fundamentals, "benchmarks": benchmarks,
+            "history_days": min(days, min(len(df) for df in ohlcv.values()))}
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# CLI
+# ═══════════════════════════════════════════════════════════════════════════
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="ベンチマーク用フィクスチャの記録 / 合成")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    rec = sub.add_parser("record", help="yfinance / IRBANK / Alpha Vantage から記録する")
+    rec.add_argument("tickers", nargs="+")
+    rec.add_argument("--name", default=DEFAULT_FIXTURE)
+    rec.add_argument("--period", default="1500d")
+    syn = sub.add_parser("synth", help="合成フィクスチャを作る（ネットワーク不要）")
+    syn.add_argument("--tickers", type=int, default=50)
+    syn.add_argument("--days", type=int, default=1500)
+    syn.add_argument("--seed", type=int, default=0)
+    syn.add_argument("--name", default=SYNTHETIC_FIXTURE)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "record":
+        path = record_fixture(args.tickers, name=args.name, period=args.period)
+    else:
+        path = save_fixture(synthesize_fixture(args.tickers, args.days, args.seed, args.name))
+    print(f"saved: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+benchmarks/importtime.py
+────────────────────────────────────────────────────────────────────────────
+起動時 import のベンチマーク（python -X importtime）
+
+  python -m benchmarks.importtime                    # 全ターゲット
+  python -m benchmarks.importtime --targets selector,classic --repeat 3
+  python -m benchmarks.importtime --compare --fail-on-regression
+  python -m benchmarks.importtime --top 15           # 重い import の内訳も表示
+
+【計測】
+  ターゲットごとに新しいプロセスで `python -X importtime -c "import <module>"` を
+  repeat 回実行し、ターゲット自身の cumulative（μs）の最小値を取る。
+  PYTHONPATH に app/ を足すので、モジュール名は app/ からの相対で書く。
+
+【ガード】
+  FORBIDDEN に挙げたモジュールが import 時に読み込まれたら違反として表示し、
+  終了コード 1 を返す（--compare の有無に関係なく）。
+    selector : スキン選択画面。streamlit 以外の重い依存を読まない
+    各 skin   : yfinance / bs4 / requests / altair / 分析パイプラインを読まない
+               （分析ボタンを押したとき・チャート spec を初めて作るときに読む）
+
+【結果の保存】
+  benchmarks.run と同じ history.jsonl に case="import:<target>" で追記する
+  （n_tickers=1, days=0, fixture="importtime"）。前回比の判定も同じ関数を使う。
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import uuid
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Tuple
+
+from benchmarks.run import (
+    DEFAULT_THRESHOLD,
+    HISTORY_PATH,
+    _environment,
+    _git_rev,
+    append_history,
+    compare_with_history,
+    load_history,
+)
+
+
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_APP_DIR = os.path.join(_ROOT_DIR, "app")
+
+DEFAULT_REPEAT = 5
+FIXTURE_NAME = "importtime"
+
+# ターゲット名 → import するモジュール（app/ からの相対）
+TARGETS: Dict[str, str] = {
+    "selector":  "main",
+    "classic":   "ui.classic.cls_main",
+    "magi":      "ui.magi.magi_main",
+    "newspaper": "ui.newspaper.np_main",
+    "cyber":     "ui.cyber.cyb_main",
+}
+
+_SKIN_FORBIDDEN = ("yfinance", "bs4", "requests", "altair", "modules.analysis_pipeline", "modules.data_fetch")
+
+FORBIDDEN: Dict[str, Tuple[str, ...]] = {
+    "selector": _SKIN_FORBIDDEN + ("pandas", "ui.output_structure"),
+    **{name: _SKIN_FORBIDDEN for name in TARGETS if name != "selector"},
+}
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 計測
+# ═══════════════════════════════════════════════════════════════════════════
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """-X importtime の出力を [{"module", "self_us", "cumulative_us", "depth"}] にする。"""
+    rows = []
+    for line in stderr.splitlines():
+        m = _LINE.match(line)
+        if m is None:
+            continue
+        rows.append({
+            "module": m.group(4),
+            "self_us": int(m.group(1)),
+            "cumulative_us": int(m.group(2)),
+            "depth": (len(m.group(3)) - 1) // 2,
+        })
+    return rows
+
+
+def import_once(module: str) -> List[Dict[str, Any]]:
+    """新しいプロセスで module を import し、importtime の行を返す。"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (_APP_DIR, env.get("PYTHONPATH")) if p)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, cwd=_APP_DIR,
+    )
+    if proc.returncode != 0:
+        tail = proc.stderr.strip().splitlines()[-1:] or [""]
+        raise RuntimeError(f"import {module} に失敗しました: {tail[0]}")
+    return parse_importtime(proc.stderr)
+
+
+def _cumulative(rows: List[Dict[str, Any]], module: str) -> int:
+    for row in reversed(rows):
+        if row["module"] == module:
+            return row["cumulative_us"]
+    return 0
+
+
+def top_children(rows: List[Dict[str, Any]], n: int) -> List[Dict[str, Any]]:
+    """ターゲット直下（depth 1）の import を cumulative の大きい順に n 件。"""
+    children = [r for r in rows if r["depth"] == 1]
+    return sorted(children, key=lambda r: r["cumulative_us"], reverse=True)[:n]
+
+
+def measure_target(name: str, repeat: int = DEFAULT_REPEAT) -> Dict[str, Any]:
+    module = TARGETS[name]
+    best_rows: List[Dict[str, Any]] = []
+    samples: List[int] = []
+    for _ in range(max(repeat, 1)):
+        rows = import_once(module)
+        total = _cumulative(rows, module)
+        if not samples or total < min(samples):
+            best_rows = rows
+        samples.append(total)
+
+    loaded = {r["module"] for r in best_rows}
+    violations = [m for m in FORBIDDEN.get(name, ()) if m in loaded]
+    return {
+        "target": name,
+        "module": module,
+        "samples_us": samples,
+        "modules_loaded": len(loaded),
+        "violations": violations,
+        "rows": best_rows,
+    }
+
+
+def run_suite(
+    targets: List[str],
+    repeat: int = DEFAULT_REPEAT,
+    top: int = 0,
+    log=print,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    run_id = uuid.uuid4().hex[:12]
+    stamp = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    meta = {"run_id": run_id, "timestamp": stamp, "git_rev": _git_rev(), "fixture": FIXTURE_NAME, **_environment()}
+
+    records, results = [], []
+    for name in targets:
+        res = measure_target(name, repeat)
+        results.append(res)
+        best = min(res["samples_us"]) / 1e6
+        records.append({
+            **meta,
+            "case": f"import:{name}",
+            "n_tickers": 1,
+            "days": 0,
+            "repeats": len(res["samples_us"]),
+            "best_s": round(best, 6),
+            "median_s": round(sorted(res["samples_us"])[len(res["samples_us"]) // 2] / 1e6, 6),
+            "per_ticker_us": round(best * 1e6, 2),
+            "modules_loaded": res["modules_loaded"],
+        })
+        mark = f"  FORBIDDEN: {', '.join(res['violations'])}" if res["violations"] else ""
+        log(f"{name:<10} {res['module']:<24} best={best * 1000:8.1f} ms  modules={res['modules_loaded']:<5}{mark}")
+        for row in top_children(res["rows"], top):
+            log(f"    {row['cumulative_us'] / 1000:8.1f} ms  {row['module']}")
+    return records, results
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# CLI
+# ═══════════════════════════════════════════════════════════════════════════
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="起動時 import のベンチマーク（-X importtime）")
+    parser.add_argument("--targets", default=",".join(TARGETS))
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--top", type=int, default=0, help="ターゲット直下の重い import を n 件表示")
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = [t for t in targets if t not in TARGETS]
+    if unknown:
+        parser.error(f"未知のターゲット: {unknown}（選択肢: {', '.join(TARGETS)}）")
+
+    records, results = run_suite(targets, repeat=args.repeat, top=args.top)
+
+    history = load_history(args.history) if args.compare else []
+    if not args.no_save:
+        append_history(records, args.history)
+        print(f"saved: {args.history}")
+
+    status = 0
+    if any(r["violations"] for r in results):
+        status = 1
+
+    if args.compare:
+        rows = compare_with_history(records, history, args.threshold)
+        for r in rows:
+            mark = "REGRESSION" if r["regression"] else ""
+            print(f"{r['case']:<20} {r['prev_s'] * 1000:8.1f} → {r['now_s'] * 1000:8.1f} ms  x{r['ratio']:.2f} {mark}")
+        if args.fail_on_regression and any(r["regression"] for r in rows):
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
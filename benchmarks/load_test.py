@@ -0,0 +1,267 @@
+"""
+benchmarks/load_test.py
+────────────────────────────────────────────────────────────────────────────
+リプレイ取得元を使ったオフライン負荷試験（単一銘柄分析パイプライン / D 指数スクリーナー）
+
+  # フィクスチャ（benchmarks.fixtures）をリプレイ用ディレクトリに書き出す
+  python -m benchmarks.load_test export --out /tmp/replay
+
+  # 分析パイプライン: 200銘柄 × 2周、並列8、遅延 80±40ms、失敗率 2%
+  python -m benchmarks.load_test analysis --replay /tmp/replay --tickers 200 \\
+      --passes 2 --concurrency 8 --latency-ms 80 --jitter-ms 40 --failure-rate 0.02 \\
+      --cache shared
+
+  # スクリーナー（fetch_all_for_d_index → build_results_list）
+  python -m benchmarks.load_test screener --replay /tmp/replay --tickers 500
+
+  --cache shared : 全リクエストでステージキャッシュを共有（本番と同じ）
+  --cache none   : リクエストごとに空のキャッシュ（毎回取得）
+
+実データの記録は MARKET_DATA_SOURCE=record:<dir> でアプリを動かすか、
+modules.data_sources.RecordingSource を set_source() して取得処理を呼ぶ。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fixtures import Fixture, get_fixture, BENCHMARK_TICKERS
+
+from modules.data_sources import ReplaySource, use_source, _file_key
+from modules.pipeline import StageCache
+from modules.analysis_pipeline import build_analysis_pipeline
+from modules.pattern_db import load_pattern_db
+from modules.data_fetch import fetch_all_for_d_index, _D_BM_CANDIDATES
+from modules.d_logic import build_results_list
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# フィクスチャ → リプレイ形式
+# ═══════════════════════════════════════════════════════════════════════════
+
+_IRBANK_LABELS = {
+    "eps": "EPS（連）",
+    "bps": "BPS（連）",
+    "per_fwd": "PER予",
+    "roe": "ROE（連）",
+    "roa": "ROA（連）",
+    "equity_ratio": "株主資本比率（連）",
+}
+
+
+def _irbank_page(code: str, fund: Dict[str, Any]) -> str:
+    rows = "".join(
+        f"<dt>{label}</dt><dd>{fund[key]:.2f}</dd>"
+        for key, label in _IRBANK_LABELS.items()
+        if fund.get(key) is not None and fund[key] >= 0
+    )
+    return f"<html><head><title>BENCH {code}【{code}】</title></head><body><dl>{rows}</dl></body></html>"
+
+
+def _info(symbol: str, fund: Dict[str, Any], close: float) -> Dict[str, Any]:
+    pct = lambda k: None if fund.get(k) is None else fund[k] / 100.0
+    return {
+        "symbol": symbol,
+        "shortName": f"BENCH {symbol}",
+        "sector": fund.get("sector") or "",
+        "industry": fund.get("industry") or "",
+        "trailingEps": fund.get("eps"),
+        "bookValue": fund.get("bps"),
+        "forwardPE": fund.get("per_fwd"),
+        "returnOnEquity": pct("roe"),
+        "returnOnAssets": pct("roa"),
+        "operatingMargins": pct("operating_margin"),
+        "debtToEquity": fund.get("de_ratio"),
+        "enterpriseToEbitda": fund.get("ev_ebitda"),
+        "dividendYield": pct("dividend_yield"),
+        "currentPrice": close,
+    }
+
+
+def export_replay(fx: Fixture, root: str) -> str:
+    """フィクスチャを ReplaySource のディレクトリ構成で書き出す。"""
+    for sub in ("price", "info", "irbank", "alpha"):
+        os.makedirs(os.path.join(root, sub), exist_ok=True)
+
+    for symbol, fund in fx.fundamentals.items():
+        df = fx.ohlcv[symbol]
+        key = _file_key(symbol)
+        df.to_csv(os.path.join(root, "price", f"{key}.csv"), index_label="Date")
+        with open(os.path.join(root, "info", f"{key}.json"), "w", encoding="utf-8") as f:
+            json.dump(_info(symbol, fund, float(df["Close"].iloc[-1])), f, ensure_ascii=False)
+        if symbol.upper().endswith(".T"):
+            code = symbol[:-2]
+            with open(os.path.join(root, "irbank", f"{_file_key(code)}.html"), "w", encoding="utf-8") as f:
+                f.write(_irbank_page(code, fund))
+
+    # 単一銘柄分析（get_benchmark_data）と D 指数（_D_BM_CANDIDATES 先頭）の両方のシンボルで置く
+    for market, df in fx.benchmarks.items():
+        symbols = {BENCHMARK_TICKERS.get(market, market), *_D_BM_CANDIDATES.get(market, [])[:1]}
+        for bm in symbols:
+            df.to_csv(os.path.join(root, "price", f"{_file_key(bm)}.csv"), index_label="Date")
+    return root
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 集計
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _latency_summary(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {}
+    arr = np.asarray(latencies) * 1000
+    return {
+        "count": int(arr.size),
+        "mean_ms": round(float(arr.mean()), 1),
+        "p50_ms": round(float(np.percentile(arr, 50)), 1),
+        "p90_ms": round(float(np.percentile(arr, 90)), 1),
+        "p99_ms": round(float(np.percentile(arr, 99)), 1),
+        "max_ms": round(float(arr.max()), 1),
+    }
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# シナリオ
+# ═══════════════════════════════════════════════════════════════════════════
+
+def run_analysis_load(
+    source: ReplaySource,
+    tickers: List[str],
+    passes: int = 1,
+    concurrency: int = 4,
+    cache: str = "shared",
+    stage_workers: int = 4,
+) -> Dict[str, Any]:
+    """tickers を passes 周、concurrency 並列で分析パイプラインに流す。"""
+    db = load_pattern_db()
+    # 既定の上限（DEFAULT_STAGE_CACHE_ENTRIES）だと大きな銘柄集合の2周目が当たらないので、全銘柄分を持たせる
+    shared = StageCache(max_entries=4 * len(tickers) + 16)
+
+    def _one(ticker: str) -> Dict[str, Any]:
+        pipeline = build_analysis_pipeline(
+            max_workers=stage_workers,
+            cache=shared if cache == "shared" else StageCache(),
+        )
+        t0 = time.perf_counter()
+        try:
+            run = pipeline.run({"ticker": ticker, "pattern_db": db})
+            return {"ok": True, "latency": time.perf_counter() - t0, "cache_hits": len(run.cache_hits)}
+        except Exception as exc:
+            return {"ok": False, "latency": time.perf_counter() - t0, "error": type(exc).__name__}
+
+    jobs = [t for _ in range(passes) for t in tickers]
+    t0 = time.perf_counter()
+    with use_source(source), ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(_one, jobs))
+    wall = time.perf_counter() - t0
+
+    ok = [r for r in results if r["ok"]]
+    errors: Dict[str, int] = {}
+    for r in results:
+        if not r["ok"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    return {
+        "scenario": "analysis",
+        "requests": len(jobs),
+        "ok": len(ok),
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(jobs) / wall, 2) if wall else None,
+        "latency": _latency_summary([r["latency"] for r in ok]),
+        "stage_cache_hits": sum(r["cache_hits"] for r in ok),
+        "source_calls": dict(source.calls),
+    }
+
+
+def run_screener_load(source: ReplaySource, tickers: List[str], start: str, end: str) -> Dict[str, Any]:
+    """D 指数スクリーナー（取得 → 一括スコア）を1回流す。"""
+    entries = [(t[:-2], "TSE") if t.upper().endswith(".T") else (t, "NYSE") for t in tickers]
+    with use_source(source):
+        t0 = time.perf_counter()
+        ticker_meta, price_data, bm_data, _ = fetch_all_for_d_index(entries, start, end)
+        fetched = time.perf_counter()
+        ticker_meta = {k: v for k, v in ticker_meta.items() if k in price_data and v["market"] in bm_data}
+        price_data = {k: price_data[k] for k in ticker_meta}
+        results, _, _ = build_results_list(price_data, ticker_meta, bm_data)
+        done = time.perf_counter()
+    return {
+        "scenario": "screener",
+        "tickers": len(tickers),
+        "scored": len(results),
+        "fetch_s": round(fetched - t0, 3),
+        "score_s": round(done - fetched, 3),
+        "source_calls": dict(source.calls),
+    }
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# CLI
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _replay_source(args) -> ReplaySource:
+    return ReplaySource(
+        args.replay,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        failure_rate=args.failure_rate,
+        seed=args.seed,
+    )
+
+
+def _tickers(root: str, n: int) -> List[str]:
+    names = sorted(f[:-5] for f in os.listdir(os.path.join(root, "info")) if f.endswith(".json"))
+    if not names:
+        raise SystemExit(f"{root} に記録済み銘柄がありません。")
+    return [names[i % len(names)] for i in range(n)]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="リプレイ取得元によるオフライン負荷試験")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    exp = sub.add_parser("export", help="フィクスチャをリプレイ形式で書き出す")
+    exp.add_argument("--fixture", default=None)
+    exp.add_argument("--out", required=True)
+
+    for name in ("analysis", "screener"):
+        p = sub.add_parser(name)
+        p.add_argument("--replay", required=True)
+        p.add_argument("--tickers", type=int, default=50)
+        p.add_argument("--latency-ms", type=float, default=0.0)
+        p.add_argument("--jitter-ms", type=float, default=0.0)
+        p.add_argument("--failure-rate", type=float, default=0.0)
+        p.add_argument("--seed", type=int, default=0)
+        if name == "analysis":
+            p.add_argument("--passes", type=int, default=1)
+            p.add_argument("--concurrency", type=int, default=4)
+            p.add_argument("--stage-workers", type=int, default=4)
+            p.add_argument("--cache", choices=("shared", "none"), default="shared")
+        else:
+            p.add_argument("--start", default="2020-01-01")
+            p.add_argument("--end", default=pd.Timestamp.today().strftime("%Y-%m-%d"))
+
+    args = parser.parse_args(argv)
+    if args.cmd == "export":
+        print(f"saved: {export_replay(get_fixture(args.fixture), args.out)}")
+        return
+
+    source = _replay_source(args)
+    tickers = _tickers(args.replay, args.tickers)
+    if args.cmd == "analysis":
+        report = run_analysis_load(source, tickers, args.passes, args.concurrency,
+                                   args.cache, args.stage_workers)
+    else:
+        report = run_screener_load(source, tickers, args.start, args.end)
+    print(json.dumps(report, ensure_ascii=False, indent=1))
+
+
+if __name__ == "__main__":
+    main()
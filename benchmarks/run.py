@@ -0,0 +1,379 @@
+"""
+benchmarks/run.py
+────────────────────────────────────────────────────────────────────────────
+計算パスのオフラインベンチマーク
+
+  python -m benchmarks.run                       # 全ケース × 1/100/4000 銘柄 × 250/500/1000 日
+  python -m benchmarks.run --quick               # 1/100 銘柄 × 250 日だけ
+  python -m benchmarks.run --cases score_defense,compute_indicators --sizes 100
+  python -m benchmarks.run --compare             # 前回との差分を表示（記録はする）
+
+【結果の保存】
+  benchmarks/history.jsonl に1ケース1行で追記する（BENCH_HISTORY で変更可）。
+    run_id, timestamp, git_rev, python / numpy / pandas, fixture,
+    case, n_tickers, days, repeats, best_s, median_s, per_ticker_us
+  同じ (case, n_tickers, days) の前回値と比べて --threshold 以上遅くなった
+  ケースを回帰として表示する（--fail-on-regression で終了コード 1）。
+
+【ケース】
+  各ケースは setup(universe) → 計測対象の関数（引数なし）を返す。
+  入力の組み立てはすべて setup 側で行い、計測には含めない。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Callable, Tuple
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fixtures import get_fixture, load_universe, Fixture
+
+from modules.t_logic import prepare_technical_frame, compute_t_block
+from modules.d_logic import (
+    compute_raw_metrics,
+    compute_benchmark_raw,
+    score_defense,
+    build_results_list,
+)
+from modules.pattern_db import classify_ticker, load_pattern_db
+from modules.q_logic import score_quality, score_quality_batch
+from modules.v_logic import score_valuation, score_valuation_batch, build_valuation_inputs
+from modules.indicators import compute_indicators
+
+
+HISTORY_PATH = os.environ.get(
+    "BENCH_HISTORY", os.path.join(os.path.dirname(os.path.abspath(__file__)), "history.jsonl")
+)
+DEFAULT_SIZES = [1, 100, 4000]
+DEFAULT_DAYS = [250, 500, 1000]
+DEFAULT_REPEAT = 5
+MAX_CASE_SECONDS = 10.0        # 1ケースの合計がこれを超えたら repeat 途中でも打ち切る
+DEFAULT_THRESHOLD = 0.20       # 20% 以上遅くなったら回帰
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# ケース定義
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _f(fund: Dict[str, Any], key: str) -> Optional[float]:
+    v = fund.get(key)
+    return None if v is None else float(v)
+
+
+def _valuation(fund: Dict[str, Any], price: float) -> Dict[str, Optional[float]]:
+    return build_valuation_inputs(
+        price=price, eps=_f(fund, "eps"), bps=_f(fund, "bps"),
+        eps_fwd=_f(fund, "eps_fwd"), per_fwd=_f(fund, "per_fwd"),
+    )
+
+
+def _is_us(label: str) -> bool:
+    return not label.split("#")[0].upper().endswith(".T")
+
+
+def case_prepare_technical_frame(u):
+    frames = list(u["ohlcv"].values())
+    return lambda: [prepare_technical_frame(df, "Close") for df in frames]
+
+
+def case_compute_t_block(u):
+    args = [(df, float(df["High"].max()), float(df["Low"].min())) for df in u["ohlcv"].values()]
+    return lambda: [compute_t_block(df, "Close", hi, lo) for df, hi, lo in args]
+
+
+def case_compute_raw_metrics(u):
+    frames = list(u["ohlcv"].values())
+    return lambda: [compute_raw_metrics(df) for df in frames]
+
+
+def case_score_defense(u):
+    bm_raw = {m: compute_benchmark_raw(df) for m, df in u["benchmarks"].items()}
+    args = [(df, bm_raw.get("NYSE" if _is_us(t) else "TSE", next(iter(bm_raw.values()))))
+            for t, df in u["ohlcv"].items()]
+    return lambda: [score_defense(df, raw) for df, raw in args]
+
+
+def case_build_results_list(u):
+    meta = {}
+    for t in u["ohlcv"]:
+        market = "NYSE" if _is_us(t) else "TSE"
+        if market not in u["benchmarks"]:
+            market = next(iter(u["benchmarks"]))
+        meta[t] = {"market": market, "bm_label": market}
+    return lambda: build_results_list(u["ohlcv"], meta, u["benchmarks"])
+
+
+def case_classify_ticker(u):
+    db = load_pattern_db()
+    args = [(t.split("#")[0], f) for t, f in u["fundamentals"].items()]
+    return lambda: [
+        classify_ticker(t, db, roe=_f(f, "roe"), roa=_f(f, "roa"),
+                        equity_ratio=_f(f, "equity_ratio"),
+                        interest_coverage=_f(f, "interest_coverage"),
+                        operating_margin=_f(f, "operating_margin"))
+        for t, f in args
+    ]
+
+
+def case_score_quality(u):
+    args = [(f, _is_us(t)) for t, f in u["fundamentals"].items()]
+    return lambda: [
+        score_quality(_f(f, "roe"), _f(f, "roa"), _f(f, "equity_ratio"),
+                      operating_margin=_f(f, "operating_margin"), de_ratio=_f(f, "de_ratio"),
+                      interest_coverage=_f(f, "interest_coverage"),
+                      industry=f.get("industry") or "", sector=f.get("sector") or "", is_us=us)
+        for f, us in args
+    ]
+
+
+def case_score_quality_batch(u):
+    funds = list(u["fundamentals"].values())
+    cols = {k: np.array([_f(f, k) if _f(f, k) is not None else np.nan for f in funds])
+            for k in ("roe", "roa", "equity_ratio", "operating_margin", "de_ratio", "interest_coverage")}
+    industry = [f.get("industry") or "" for f in funds]
+    sector = [f.get("sector") or "" for f in funds]
+    is_us = np.array([_is_us(t) for t in u["fundamentals"]])
+    return lambda: score_quality_batch(industry=industry, sector=sector, is_us=is_us, **cols)
+
+
+def case_score_valuation(u):
+    args = []
+    for t, f in u["fundamentals"].items():
+        vi = _valuation(f, float(u["ohlcv"][t]["Close"].iloc[-1]))
+        args.append((vi["per"], vi["pbr"], _f(f, "dividend_yield"), _f(f, "ev_ebitda"), _is_us(t)))
+    return lambda: [score_valuation(per, pbr, dy, ev_ebitda=ev, is_us=us) for per, pbr, dy, ev, us in args]
+
+
+def case_score_valuation_batch(u):
+    rows = []
+    for t, f in u["fundamentals"].items():
+        vi = _valuation(f, float(u["ohlcv"][t]["Close"].iloc[-1]))
+        rows.append((vi["per"], vi["pbr"], _f(f, "dividend_yield"), _f(f, "ev_ebitda"), _is_us(t)))
+    per, pbr, dy, ev, us = (np.array([np.nan if v is None else v for v in col], dtype=float)
+                            for col in zip(*rows))
+    return lambda: score_valuation_batch(per, pbr, dy, ev, is_us=us.astype(bool))
+
+
+def case_compute_indicators(u):
+    db = load_pattern_db()
+    bm_raw = {m: compute_benchmark_raw(df) for m, df in u["benchmarks"].items()}
+    calls = []
+    for t, df in u["ohlcv"].items():
+        f = u["fundamentals"][t]
+        ft = classify_ticker(t.split("#")[0], db, roe=_f(f, "roe"), roa=_f(f, "roa"),
+                             equity_ratio=_f(f, "equity_ratio"),
+                             interest_coverage=_f(f, "interest_coverage"),
+                             operating_margin=_f(f, "operating_margin"))
+        raw = bm_raw.get("NYSE" if _is_us(t) else "TSE", next(iter(bm_raw.values())))
+        calls.append(dict(
+            df=df, close_col="Close",
+            high_52w=float(df["High"].iloc[-250:].max()), low_52w=float(df["Low"].iloc[-250:].min()),
+            eps=_f(f, "eps"), bps=_f(f, "bps"), eps_fwd=_f(f, "eps_fwd"), per_fwd=_f(f, "per_fwd"),
+            roe=_f(f, "roe"), roa=_f(f, "roa"), equity_ratio=_f(f, "equity_ratio"),
+            operating_margin=_f(f, "operating_margin"), de_ratio=_f(f, "de_ratio"),
+            interest_coverage=_f(f, "interest_coverage"),
+            dividend_yield=_f(f, "dividend_yield"), ev_ebitda=_f(f, "ev_ebitda"),
+            financial_type=ft, industry=f.get("industry") or "", sector=f.get("sector") or "",
+            is_us=_is_us(t), price_df=df[["Close", "Low", "Volume"]], bm_raw_vals=raw,
+        ))
+    return lambda: [compute_indicators(**kw) for kw in calls]
+
+
+CASES: Dict[str, Callable[[Dict[str, Any]], Callable[[], Any]]] = {
+    "prepare_technical_frame": case_prepare_technical_frame,
+    "compute_t_block":         case_compute_t_block,
+    "compute_raw_metrics":     case_compute_raw_metrics,
+    "score_defense":           case_score_defense,
+    "build_results_list":      case_build_results_list,
+    "classify_ticker":         case_classify_ticker,
+    "score_quality":           case_score_quality,
+    "score_quality_batch":     case_score_quality_batch,
+    "score_valuation":         case_score_valuation,
+    "score_valuation_batch":   case_score_valuation_batch,
+    "compute_indicators":      case_compute_indicators,
+}
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 計測
+# ═══════════════════════════════════════════════════════════════════════════
+
+def time_callable(fn: Callable[[], Any], repeat: int = DEFAULT_REPEAT) -> List[float]:
+    """fn を repeat 回計測する。合計が MAX_CASE_SECONDS を超えたら打ち切る。"""
+    samples: List[float] = []
+    while len(samples) < max(repeat, 1):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+        if sum(samples) >= MAX_CASE_SECONDS:
+            break
+    return samples
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def _environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpu_count": str(os.cpu_count() or ""),
+    }
+
+
+def run_suite(
+    cases: List[str],
+    sizes: List[int],
+    days_list: List[int],
+    fx: Fixture,
+    repeat: int = DEFAULT_REPEAT,
+    log: Callable[[str], None] = print,
+) -> List[Dict[str, Any]]:
+    run_id = uuid.uuid4().hex[:12]
+    stamp = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    meta = {"run_id": run_id, "timestamp": stamp, "git_rev": _git_rev(), "fixture": fx.name, **_environment()}
+
+    records = []
+    for days in days_list:
+        for n in sizes:
+            universe = load_universe(fx, n, days)
+            for name in cases:
+                fn = CASES[name](universe)
+                samples = time_callable(fn, repeat)
+                best = min(samples)
+                rec = {
+                    **meta,
+                    "case": name,
+                    "n_tickers": n,
+                    "days": universe["history_days"],
+                    "repeats": len(samples),
+                    "best_s": round(best, 6),
+                    "median_s": round(statistics.median(samples), 6),
+                    "per_ticker_us": round(best / n * 1e6, 2),
+                }
+                records.append(rec)
+                log(f"{name:<26} n={n:<5} days={rec['days']:<5} "
+                    f"best={best * 1000:10.2f} ms  per_ticker={rec['per_ticker_us']:10.1f} us")
+    return records
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 履歴
+# ═══════════════════════════════════════════════════════════════════════════
+
+def append_history(records: List[Dict[str, Any]], path: str = HISTORY_PATH) -> None:
+    with open(path, "a", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+
+def load_history(path: str = HISTORY_PATH) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _key(rec: Dict[str, Any]) -> Tuple[str, int, int, str]:
+    return rec["case"], rec["n_tickers"], rec["days"], rec.get("fixture", "")
+
+
+def compare_with_history(
+    records: List[Dict[str, Any]],
+    history: List[Dict[str, Any]],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> List[Dict[str, Any]]:
+    """各ケースを同じキーの直近の履歴（今回の run を除く）と比べる。"""
+    run_ids = {r["run_id"] for r in records}
+    previous: Dict[Tuple, Dict[str, Any]] = {}
+    for rec in history:
+        if rec.get("run_id") not in run_ids:
+            previous[_key(rec)] = rec
+
+    rows = []
+    for rec in records:
+        prev = previous.get(_key(rec))
+        if prev is None or not prev.get("best_s"):
+            continue
+        ratio = rec["best_s"] / prev["best_s"]
+        rows.append({
+            "case": rec["case"], "n_tickers": rec["n_tickers"], "days": rec["days"],
+            "prev_rev": prev.get("git_rev", ""), "prev_s": prev["best_s"], "now_s": rec["best_s"],
+            "ratio": round(ratio, 3), "regression": ratio > 1.0 + threshold,
+        })
+    return rows
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# CLI
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _int_list(text: str) -> List[int]:
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="計算パスのオフラインベンチマーク")
+    parser.add_argument("--cases", default=",".join(CASES))
+    parser.add_argument("--sizes", type=_int_list, default=DEFAULT_SIZES)
+    parser.add_argument("--days", type=_int_list, default=DEFAULT_DAYS)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--quick", action="store_true", help="1/100 銘柄 × 250 日だけ")
+    parser.add_argument("--fixture", default=None)
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"未知のケース: {unknown}（選択肢: {', '.join(CASES)}）")
+    sizes, days_list = (([1, 100], [250]) if args.quick else (args.sizes, args.days))
+
+    fx = get_fixture(args.fixture)
+    print(f"fixture: {fx.name}（{len(fx.fundamentals)} 銘柄）")
+    records = run_suite(cases, sizes, days_list, fx, repeat=args.repeat)
+
+    history = load_history(args.history) if args.compare else []
+    if not args.no_save:
+        append_history(records, args.history)
+        print(f"saved: {args.history}")
+
+    if args.compare:
+        rows = compare_with_history(records, history, args.threshold)
+        regressions = [r for r in rows if r["regression"]]
+        for r in rows:
+            mark = "REGRESSION" if r["regression"] else ""
+            print(f"{r['case']:<26} n={r['n_tickers']:<5} days={r['days']:<5} "
+                  f"{r['prev_s'] * 1000:10.2f} → {r['now_s'] * 1000:10.2f} ms  x{r['ratio']:.2f} {mark}")
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
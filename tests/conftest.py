@@ -0,0 +1,7 @@
+import os
+import sys
+
+# app/ のモジュールは "from modules.x import y" で読み込む（streamlit run app/main.py と同じ）
+_APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+if _APP_DIR not in sys.path:
+    sys.path.insert(0, _APP_DIR)
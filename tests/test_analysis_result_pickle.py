@@ -0,0 +1,34 @@
+"""結果レコードの pickle（共有キャッシュでデプロイをまたいでも読めること）。"""
+
+import pickle
+
+import pytest
+
+from modules.analysis_result import AnalysisResult, TechResult, TResult
+
+
+def test_round_trip_keeps_every_field():
+    result = AnalysisResult(
+        "7203.T", {}, TechResult(t=TResult(close=1.0), extras={"a": 1}), {}, None, analysis_id="x"
+    )
+    assert pickle.loads(pickle.dumps(result, protocol=5)) == result
+
+
+def test_state_tolerates_added_and_removed_fields():
+    state = TResult(close=1.0, rsi=40.0).__getstate__()
+    del state["rsi"]            # 後から増えたフィールド
+    state["removed_field"] = 1  # 前のデプロイにだけあったフィールド
+    record = TResult.__new__(TResult)
+    record.__setstate__(state)
+    assert record.close == 1.0
+    assert record.rsi is None
+    assert TechResult(t=record)["rsi"] is None
+
+    result = AnalysisResult.__new__(AnalysisResult)
+    result.__setstate__({"ticker": "7203.T"})
+    assert result.timings == {} and result["tech"] is None
+
+
+def test_positional_state_is_rejected():
+    with pytest.raises(pickle.UnpicklingError):
+        TResult.__new__(TResult).__setstate__((1.0, 2.0))
@@ -0,0 +1,42 @@
+"""日米混在パネル（営業日の和集合）での T スコア計算。"""
+
+import numpy as np
+import pandas as pd
+
+from modules.backtest import price_panel_from_frames, replay_t_scores
+from modules.t_logic import compute_t_score_panel
+
+
+def _walk(dates: pd.DatetimeIndex, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 1000 * np.exp(np.cumsum(rng.normal(0, 0.015, len(dates))))
+    return pd.DataFrame({"Close": close, "High": close * 1.01, "Low": close * 0.99}, index=dates)
+
+
+def _mixed_panel():
+    days = pd.bdate_range("2022-01-03", periods=400)
+    jp_days = days.delete(np.arange(3, len(days), 7))     # 日本だけの休場日
+    us_days = days.delete(np.arange(5, len(days), 11))    # 米国だけの休場日
+    frames = {"7203.T": _walk(jp_days, 1), "AAPL": _walk(us_days, 2)}
+    return frames, price_panel_from_frames(frames)
+
+
+def test_mixed_calendar_scores_each_ticker_on_its_own_days():
+    frames, panel = _mixed_panel()
+    assert panel["close"].isna().any().all()
+
+    t_score = compute_t_score_panel(panel["close"], panel["high"], panel["low"])["t_score"]
+
+    for ticker, df in frames.items():
+        alone = compute_t_score_panel(df[["Close"]], df[["High"]], df[["Low"]])["t_score"]["Close"]
+        mixed = t_score[ticker]
+        assert mixed.notna().sum() == alone.notna().sum() > 250
+        pd.testing.assert_series_equal(mixed.reindex(df.index), alone, check_names=False)
+        assert mixed[panel["close"][ticker].isna()].isna().all()
+
+
+def test_mixed_calendar_replay_matches_full_panel():
+    _, panel = _mixed_panel()
+    full = compute_t_score_panel(panel["close"], panel["high"], panel["low"])["t_score"]
+    replayed = replay_t_scores(panel["close"], panel["high"], panel["low"], chunk_days=60)
+    pd.testing.assert_frame_equal(replayed, full)
@@ -0,0 +1,36 @@
+"""参照データバンドル: CSV を編集したセクションはバンドルではなく CSV から読む。"""
+
+import shutil
+
+import pytest
+
+from modules import ref_data
+
+
+@pytest.fixture
+def scratch_data(tmp_path, monkeypatch):
+    data_dir = tmp_path / "data"
+    shutil.copytree(ref_data.DATA_DIR, data_dir, ignore=shutil.ignore_patterns("ref_bundle.bin"))
+    bundle_path = str(data_dir / "ref_bundle.bin")
+    monkeypatch.setattr(ref_data, "DATA_DIR", str(data_dir))
+    monkeypatch.setattr(ref_data, "BUNDLE_PATH", bundle_path)
+    ref_data.build_bundle(bundle_path)
+    ref_data.reset()
+    yield data_dir
+    ref_data.reset()
+
+
+def test_edited_csv_overrides_stale_bundle_section(scratch_data):
+    assert ref_data.get("tse_master")["1401.T"]["industry"] == "Engineering & Construction"
+    assert "stale" not in ref_data.source_mode()
+
+    master = scratch_data / ref_data.SOURCES["tse_master"]
+    text = master.read_text(encoding="utf-8-sig")
+    master.write_text(text.replace("Engineering & Construction", "Edited Industry", 1), encoding="utf-8-sig")
+    ref_data.reset()
+
+    assert ref_data.get("tse_master")["1401.T"]["industry"] == "Edited Industry"
+    assert ref_data.source_mode().endswith("stale=tse_master")
+    assert ref_data.stale_sources(ref_data.BUNDLE_PATH) == ["tse_master"]
+    # 索引も編集後の値から作り直される
+    assert "Edited Industry" in ref_data.get("tse_resolution")
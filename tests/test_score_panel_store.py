@@ -0,0 +1,62 @@
+"""スコアパネルの永続化（SQLite、(ticker, as_of) で upsert）。"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.score_panel import SUBSCORE_COLS, import_csv_panel, load_panel, upsert_panel
+
+
+def _row(ticker: str, day: int, value: float) -> dict:
+    row = {"ticker": ticker, "as_of": pd.Timestamp("2024-01-01") + pd.Timedelta(days=day)}
+    row.update({col: value for col in SUBSCORE_COLS})
+    row["v4"] = np.nan
+    return row
+
+
+def test_concurrent_upserts_keep_every_row(tmp_path):
+    path = str(tmp_path / "panel.db")
+    errors = []
+
+    def worker(n: int) -> None:
+        try:
+            for i in range(15):
+                upsert_panel([_row(f"T{n}", i, float(i))], path)
+        except Exception as exc:   # pragma: no cover - 失敗時の報告用
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    panel = load_panel(path)
+    assert len(panel) == 90
+    assert panel["v4"].isna().all()
+
+
+def test_upsert_replaces_by_key_and_keeps_extra_columns(tmp_path):
+    path = str(tmp_path / "panel.db")
+    upsert_panel([_row("A", 0, 1.0), _row("B", 0, 2.0)], path)
+    upsert_panel(pd.DataFrame([{**_row("A", 0, 5.0), "fwd_20": 0.1}]), path)
+
+    panel = load_panel(path).set_index("ticker")
+    assert len(panel) == 2
+    assert panel.loc["A", "q1"] == 5.0
+    assert panel.loc["A", "fwd_20"] == pytest.approx(0.1)
+    assert panel.loc["B", "q1"] == 2.0
+
+
+def test_legacy_csv_panel_is_rejected_and_importable(tmp_path):
+    csv_path = str(tmp_path / "panel.csv")
+    pd.DataFrame([_row("A", 0, 1.0)]).to_csv(csv_path, index=False)
+    with pytest.raises(ValueError):
+        load_panel(csv_path)
+
+    path = str(tmp_path / "panel.db")
+    assert import_csv_panel(csv_path, path) == 1
+    assert load_panel(path)["q1"].tolist() == [1.0]
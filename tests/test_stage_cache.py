@@ -0,0 +1,37 @@
+"""StageCache の上限（set 時の期限切れ削除と LRU）。"""
+
+import time
+
+from modules.pipeline import SharedStageCache, StageCache
+from modules.shared_cache import SharedCache
+
+
+def test_set_drops_expired_entries():
+    cache = StageCache()
+    cache.set("old", {"v": 1}, ttl=0.01)
+    cache.set("keep", {"v": 2})
+    time.sleep(0.02)
+    cache.set("new", {"v": 3}, ttl=60)
+    assert len(cache) == 2
+    assert cache.get("keep", 60) == {"v": 2}
+
+
+def test_lru_bound_keeps_recently_used():
+    cache = StageCache(max_entries=3)
+    for key in "abc":
+        cache.set(key, {"v": key}, ttl=60)
+    assert cache.get("a", 60) == {"v": "a"}
+    cache.set("d", {"v": "d"}, ttl=60)
+    assert len(cache) == 3
+    assert cache.get("b", 60) is None
+    assert cache.get("a", 60) == {"v": "a"}
+
+
+def test_shared_l1_is_bounded(tmp_path):
+    store = SharedCache(str(tmp_path / "cache.db"))
+    for n in range(5):
+        store.set(SharedStageCache._store_key(("price", n)), {"v": n}, ttl=60)
+    cache = SharedStageCache(store, max_entries=2)
+    for n in range(5):
+        assert cache.get(("price", n), 60) == {"v": n}
+    assert len(cache) == 2
@@ -0,0 +1,55 @@
+"""V スコア: 欠損（None / NaN）の扱いがスカラー版とバッチ版で一致すること。"""
+
+import math
+
+import numpy as np
+import pytest
+
+from modules.v_logic import score_valuation, score_valuation_batch
+
+NAN = float("nan")
+
+CASES = [
+    # per, pbr, dividend_yield, ev_ebitda, sector_v_score
+    (NAN, NAN, NAN, NAN, None),
+    (None, None, None, None, None),
+    (12.0, 1.1, NAN, 9.0, None),
+    (12.0, NAN, 2.5, NAN, 60.0),
+    (NAN, 0.9, 0.0, -3.0, None),
+    (25.0, 2.5, 3.5, 14.0, 40.0),
+    (12.0, 1.0, 2.0, 8.0, NAN),
+]
+
+
+@pytest.mark.parametrize("is_us", [False, True])
+def test_scalar_and_batch_agree_on_missing_inputs(is_us):
+    batch = score_valuation_batch(
+        [c[0] for c in CASES],
+        [c[1] for c in CASES],
+        [c[2] for c in CASES],
+        ev_ebitda=[c[3] for c in CASES],
+        sector_v_score=[NAN if c[4] is None else c[4] for c in CASES],
+        is_us=is_us,
+    )
+    for i, (per, pbr, dy, ev, sector) in enumerate(CASES):
+        scalar = score_valuation(per, pbr, dy, ev_ebitda=ev, sector_v_score=sector, is_us=is_us)
+        for key in ("v_score", "v1", "v2", "v3"):
+            assert scalar[key] == batch[key][i], (i, key)
+        assert scalar["has_sector"] == bool(batch["has_sector"][i])
+
+
+def test_nan_dividend_and_ev_ebitda_score_neutral():
+    result = score_valuation(NAN, NAN, NAN, ev_ebitda=NAN)
+    assert result["v1"] == 0.0
+    assert result["v2"] == 50.0
+    assert result["v3"] == 50.0
+    assert not math.isnan(result["v_score"])
+    assert np.isfinite(score_valuation_batch([NAN], [NAN], [NAN])["v_score"]).all()
+
+
+def test_nan_sector_score_reweights_without_v4():
+    for sector in (NAN, float("inf")):
+        result = score_valuation(12, 1, 2, ev_ebitda=8, sector_v_score=sector)
+        assert result == score_valuation(12, 1, 2, ev_ebitda=8)
+        assert result["has_sector"] is False
+        assert result["v4"] is None